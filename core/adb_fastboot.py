@@ -1,6 +1,7 @@
 import subprocess
-import re
 import shutil
+from core.shell_session import shell_for
+from core.fastboot_client import is_network_serial, getvar_all, parse_variables
 
 def check_tools():
     tools = ["adb", "fastboot"]
@@ -27,6 +28,9 @@ def get_devices():
             elif "sideload" in line:
                 serial = line.split()[0]
                 devices.append({"type": "SIDELOAD", "serial": serial})
+            elif "recovery" in line:
+                serial = line.split()[0]
+                devices.append({"type": "RECOVERY", "serial": serial})
     except: pass
     
     # Scan Fastboot
@@ -42,76 +46,41 @@ def get_devices():
 def get_adb_info(serial):
     info = {"Model": "N/A", "Build": "N/A", "Root": "No"}
     try:
-        # Get Model
-        model_proc = subprocess.run(["adb", "-s", serial, "shell", "getprop", "ro.product.model"], capture_output=True, text=True)
-        info["Model"] = model_proc.stdout.strip()
-        
-        # Get Build
-        build_proc = subprocess.run(["adb", "-s", serial, "shell", "getprop", "ro.build.display.id"], capture_output=True, text=True)
-        info["Build"] = build_proc.stdout.strip()
+        # Pipelined on the device's persistent shell: one round trip for all three
+        model, build, shell_id = shell_for(serial).run_many(["getprop ro.product.model", "getprop ro.build.display.id", "id"])
+        if model.ok: info["Model"] = model.output.strip()
+        if build.ok: info["Build"] = build.output.strip()
+        if "uid=0(root)" in shell_id.output:
+            info["Root"] = "Yes (System)"
         
-        # Check Root (Specifically via SU to detect Magisk)
-        root_proc = subprocess.run(["adb", "-s", serial, "shell", "su", "-c", "id"], capture_output=True, text=True, timeout=3)
-        if "uid=0(root)" in root_proc.stdout:
+        # Check Root (Specifically via SU to detect Magisk); a pending grant prompt times out
+        su_id = shell_for(serial).run("su -c id", timeout=3)
+        if "uid=0(root)" in su_id.output:
             info["Root"] = "Yes (Magisk)"
-        else:
-            # Fallback check for unsecure adb
-            id_proc = subprocess.run(["adb", "-s", serial, "shell", "id"], capture_output=True, text=True, timeout=2)
-            if "uid=0(root)" in id_proc.stdout:
-                info["Root"] = "Yes (System)"
     except: pass
     return info
 
-def get_adb_metrics(serial):
-    metrics = {"Battery": "N/A", "Temp": "N/A", "Storage": "N/A"}
-    try:
-        # Battery & Temp
-        batt_proc = subprocess.run(["adb", "-s", serial, "shell", "dumpsys", "battery"], capture_output=True, text=True)
-        batt_out = batt_proc.stdout
-        level = re.search(r"level:\s*(\d+)", batt_out)
-        temp = re.search(r"temperature:\s*(\d+)", batt_out)
-        if level: metrics["Battery"] = f"{level.group(1)}%"
-        if temp: metrics["Temp"] = f"{int(temp.group(1))/10}°C"
-        
-        # Storage (Internal)
-        storage_proc = subprocess.run(["adb", "-s", serial, "shell", "df", "/data"], capture_output=True, text=True)
-        lines = storage_proc.stdout.splitlines()
-        if len(lines) > 1:
-            parts = lines[1].split()
-            if len(parts) >= 5:
-                metrics["Storage"] = f"{parts[4]} used" # e.g. 45%
-    except: pass
-    return metrics
+def get_fastboot_vars(serial, timeout=5, log=None, progress=None, report=None):
+    """ ``getvar all`` as a dict; network devices are asked in-process, USB ones through the fastboot binary """
+    if is_network_serial(serial): return getvar_all(serial)
+    proc = subprocess.run(["fastboot", "-s", serial, "getvar", "all"], capture_output=True, text=True, timeout=timeout)
+    return parse_variables(proc.stderr.splitlines())
 
 def get_fastboot_info(serial):
     info = {"Product": "N/A", "Unlocked": "N/A"}
     try:
-        proc = subprocess.run(["fastboot", "-s", serial, "getvar", "all"], capture_output=True, text=True, timeout=3)
-        output = proc.stderr
-        
-        product_match = re.search(r"product:\s*(.*)", output)
-        if product_match: info["Product"] = product_match.group(1).strip()
-        
-        unlocked_match = re.search(r"unlocked:\s*(.*)", output)
-        if unlocked_match: info["Unlocked"] = unlocked_match.group(1).strip()
+        variables = get_fastboot_vars(serial, timeout=3)
+        if variables.get("product"): info["Product"] = variables["product"]
+        if variables.get("unlocked"): info["Unlocked"] = variables["unlocked"]
     except: pass
     return info
 
 def fetch_partitions_from_device(serial):
-    cmd = ["fastboot", "-s", serial, "getvar", "all"]
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-        output = proc.stderr
-        
         found = set()
-        pattern1 = re.compile(r"partition-(?:size|type):([^:]+):")
-        pattern2 = re.compile(r"\(bootloader\)\s*partition-.*:([^:]+)")
-        
-        for line in output.splitlines():
-            match1 = pattern1.search(line)
-            if match1: found.add(match1.group(1).strip())
-            match2 = pattern2.search(line)
-            if match2: found.add(match2.group(1).strip())
+        for key in get_fastboot_vars(serial):
+            if key.startswith(("partition-size:", "partition-type:")):
+                found.add(key.split(":", 1)[1].strip())
         
         # Categorization Logic
         categories = {
@@ -0,0 +1,325 @@
+import os
+import stat
+import time
+import queue
+import struct
+import posixpath
+import threading
+from collections import deque
+from core.adb_transport import AdbConnection, AdbError
+
+SYNC_DATA_MAX = 64 * 1024
+DEFAULT_FILE_MODE = 0o644
+PIPELINE_WINDOW = 8
+
+class SyncError(Exception):
+    pass
+
+def _pack(msg_id, arg):
+    return msg_id + struct.pack("<I", arg)
+
+class SyncConnection:
+    """ The ``sync:`` service (STAT/LIST/SEND/RECV) over a single adb stream.
+
+    Note: v1 STAT/LIST report sizes and mtimes as 32-bit values, so sizes
+    of files over 4 GiB are compared modulo 2**32.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    @classmethod
+    def open(cls, serial):
+        return cls(AdbConnection.open(serial, "sync:"))
+
+    def _request(self, msg_id, path):
+        data = path.encode("utf-8")
+        self.conn.send(_pack(msg_id, len(data)) + data)
+
+    def _read_header(self):
+        header = self.conn.recv_exact(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    def _raise_fail(self, length):
+        raise SyncError(self.conn.recv_exact(length).decode("utf-8", errors="replace"))
+
+    def stat(self, path):
+        self._request(b"STAT", path)
+        msg_id, mode, size, mtime = struct.unpack("<4sIII", self.conn.recv_exact(16))
+        if msg_id != b"STAT": raise SyncError(f"Unexpected STAT reply {msg_id!r}")
+        return {"mode": mode, "size": size, "mtime": mtime, "exists": mode != 0}
+
+    def iter_list(self, path):
+        """ Yields ``{name, mode, size, mtime}`` entries as they arrive from the device """
+        self._request(b"LIST", path)
+        while True:
+            msg_id, mode, size, mtime, name_len = struct.unpack("<4sIIII", self.conn.recv_exact(20))
+            if msg_id == b"DONE": return
+            if msg_id != b"DENT": raise SyncError(f"Unexpected LIST reply {msg_id!r}")
+            name = self.conn.recv_exact(name_len).decode("utf-8", errors="replace")
+            if name in (".", ".."): continue
+            yield {"name": name, "mode": mode, "size": size, "mtime": mtime, "is_dir": stat.S_ISDIR(mode)}
+
+    def walk(self, root):
+        """ Yields ``(relative_path, entry)`` for every file below ``root`` """
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            for entry in list(self.iter_list(posixpath.join(root, rel_dir) if rel_dir else root)):
+                rel = posixpath.join(rel_dir, entry["name"]) if rel_dir else entry["name"]
+                if entry["is_dir"]:
+                    pending.append(rel)
+                elif stat.S_ISREG(entry["mode"]):
+                    yield rel, entry
+
+    def start_send(self, local_path, remote_path, mode=DEFAULT_FILE_MODE):
+        """ Streams one file; the OKAY/FAIL ack is read later by ``read_send_ack`` so sends can be pipelined """
+        self._request(b"SEND", f"{remote_path},{mode}")
+        sent = 0
+        with open(local_path, "rb") as f:
+            while True:
+                chunk = f.read(SYNC_DATA_MAX)
+                if not chunk: break
+                self.conn.send(_pack(b"DATA", len(chunk)) + chunk)
+                sent += len(chunk)
+        self.conn.send(_pack(b"DONE", int(os.path.getmtime(local_path))))
+        return sent
+
+    def read_send_ack(self):
+        msg_id, length = self._read_header()
+        if msg_id == b"OKAY": return
+        if msg_id == b"FAIL": self._raise_fail(length)
+        raise SyncError(f"Unexpected SEND reply {msg_id!r}")
+
+    def request_recv(self, remote_path):
+        self._request(b"RECV", remote_path)
+
+    def read_recv(self, local_path):
+        """ Reads one RECV response into ``local_path`` (written via a temp file) """
+        tmp_path = local_path + ".part"
+        received = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    msg_id, length = self._read_header()
+                    if msg_id == b"DONE": break
+                    if msg_id == b"FAIL": self._raise_fail(length)
+                    if msg_id != b"DATA": raise SyncError(f"Unexpected RECV reply {msg_id!r}")
+                    remaining = length
+                    while remaining:
+                        chunk = self.conn.recv(min(remaining, SYNC_DATA_MAX))
+                        if not chunk: raise SyncError("Connection closed during transfer")
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                    received += length
+            os.replace(tmp_path, local_path)
+        except Exception:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        return received
+
+    def close(self):
+        try: self.conn.send(_pack(b"QUIT", 0))
+        except (OSError, AdbError): pass
+        self.conn.close()
+
+def is_unchanged(local_size, local_mtime, remote):
+    """ Size/mtime comparison used to skip transfers in both directions """
+    return (remote is not None and remote["size"] == local_size & 0xFFFFFFFF
+            and remote["mtime"] == int(local_mtime))
+
+def plan_push(local_paths, remote_dir, remote_index):
+    """ Expands local files/folders into push jobs; ``remote_index`` maps remote path -> entry """
+    jobs, skipped = [], []
+    for path in local_paths:
+        if os.path.isdir(path):
+            base = os.path.dirname(os.path.abspath(path))
+            files = [os.path.join(r, f) for r, _, fs in os.walk(path) for f in fs]
+        else:
+            base, files = os.path.dirname(os.path.abspath(path)), [path]
+        for local in files:
+            rel = os.path.relpath(os.path.abspath(local), base).replace(os.sep, "/")
+            remote = posixpath.join(remote_dir, rel)
+            st = os.stat(local)
+            job = {"local": local, "remote": remote, "size": st.st_size}
+            if is_unchanged(st.st_size, st.st_mtime, remote_index.get(remote)):
+                skipped.append(job)
+            else:
+                jobs.append(job)
+    return jobs, skipped
+
+def plan_pull(remote_entries, local_dir):
+    """ ``remote_entries`` is a list of ``(remote_path, relative_path, entry)`` """
+    jobs, skipped = [], []
+    for remote, rel, entry in remote_entries:
+        local = os.path.join(local_dir, *rel.split("/"))
+        job = {"local": local, "remote": remote, "size": entry["size"], "mtime": entry["mtime"]}
+        if os.path.exists(local):
+            st = os.stat(local)
+            if is_unchanged(st.st_size, st.st_mtime, entry):
+                skipped.append(job)
+                continue
+        jobs.append(job)
+    return jobs, skipped
+
+class TransferManager:
+    """ Runs push or pull jobs over several parallel sync connections to one device.
+
+    Each connection keeps up to ``window`` requests in flight (sends whose
+    acks are still unread, or queued RECVs), hiding per-file round trips.
+    """
+    def __init__(self, serial, direction, jobs, connections=4, window=PIPELINE_WINDOW, open_sync=None, cancel_event=None):
+        self.serial = serial
+        self.direction = direction
+        self.jobs = list(jobs)
+        self.connections = max(1, min(connections, len(self.jobs) or 1))
+        self.window = max(1, window)
+        self.open_sync = open_sync or SyncConnection.open
+        self.cancel_event = cancel_event or threading.Event()
+        self.lock = threading.Lock()
+        self.bytes_done = 0
+        self.files_done = 0
+        self.failed = 0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _finish(self, job, ok, status, start, report, progress, total_bytes):
+        with self.lock:
+            self.files_done += 1
+            if ok: self.bytes_done += job["size"]
+            else: self.failed += 1
+            bytes_done = self.bytes_done
+        if report:
+            report({"path": job["remote"], "ok": ok, "status": status, "size": job["size"],
+                    "seconds": round(time.monotonic() - job.get("started", start), 2)})
+        if progress: progress(bytes_done // 1024, max(total_bytes // 1024, 1))
+
+    def _restart(self, sync, inflight, jobs):
+        # adbd ends the sync session after a FAIL, so pipelined requests
+        # behind the failed one are requeued onto a fresh connection
+        for job in inflight: jobs.put(job)
+        inflight.clear()
+        sync.close()
+        return self.open_sync(self.serial)
+
+    def _push_worker(self, jobs, start, report, progress, total_bytes):
+        sync = self.open_sync(self.serial)
+        inflight = deque()
+        try:
+            while True:
+                job = None
+                if not self.cancel_event.is_set():
+                    try: job = jobs.get_nowait()
+                    except queue.Empty: pass
+                if job is None and not inflight: return
+                if job is not None:
+                    job["started"] = time.monotonic()
+                    sync.start_send(job["local"], job["remote"])
+                    inflight.append(job)
+                if len(inflight) >= self.window or (job is None and inflight):
+                    done = inflight.popleft()
+                    try:
+                        sync.read_send_ack()
+                        self._finish(done, True, "Pushed", start, report, progress, total_bytes)
+                    except SyncError as e:
+                        self._finish(done, False, str(e), start, report, progress, total_bytes)
+                        sync = self._restart(sync, inflight, jobs)
+        finally:
+            sync.close()
+
+    def _pull_worker(self, jobs, start, report, progress, total_bytes):
+        sync = self.open_sync(self.serial)
+        inflight = deque()
+        try:
+            while True:
+                while len(inflight) < self.window and not self.cancel_event.is_set():
+                    try: job = jobs.get_nowait()
+                    except queue.Empty: break
+                    os.makedirs(os.path.dirname(job["local"]) or ".", exist_ok=True)
+                    sync.request_recv(job["remote"])
+                    inflight.append(job)
+                if not inflight: return
+                job = inflight.popleft()
+                job["started"] = time.monotonic()
+                try:
+                    sync.read_recv(job["local"])
+                    if job.get("mtime"): os.utime(job["local"], (job["mtime"], job["mtime"]))
+                    self._finish(job, True, "Pulled", start, report, progress, total_bytes)
+                except SyncError as e:
+                    self._finish(job, False, str(e), start, report, progress, total_bytes)
+                    sync = self._restart(sync, inflight, jobs)
+        finally:
+            sync.close()
+
+    def run(self, log=None, progress=None, report=None):
+        start = time.monotonic()
+        total_bytes = sum(job["size"] for job in self.jobs)
+        jobs = queue.Queue()
+        for job in self.jobs: jobs.put(job)
+        target = self._push_worker if self.direction == "push" else self._pull_worker
+        errors = []
+
+        def guarded():
+            try: target(jobs, start, report, progress, total_bytes)
+            except (OSError, AdbError, SyncError) as e: errors.append(str(e))
+
+        threads = [threading.Thread(target=guarded, daemon=True) for _ in range(self.connections)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        for err in errors:
+            if log: log(f"Error: sync connection failed: {err}")
+
+        elapsed = max(time.monotonic() - start, 1e-6)
+        stats = {"files": self.files_done, "failed": self.failed, "bytes": self.bytes_done,
+                 "elapsed": elapsed, "mbps": self.bytes_done / elapsed / (1024 * 1024)}
+        if log:
+            log(f"{self.direction.capitalize()} finished: {stats['files'] - stats['failed']} file(s), "
+                f"{stats['bytes'] / (1024 * 1024):.1f} MB in {elapsed:.1f}s ({stats['mbps']:.1f} MB/s, "
+                f"{self.connections} connection(s)), {stats['failed']} failed")
+        return stats
+
+def list_remote(serial, path, log=None, progress=None, report=None):
+    """ Streams a directory listing; each entry is passed to ``report`` as it arrives """
+    sync = SyncConnection.open(serial)
+    try:
+        entries = []
+        for entry in sync.iter_list(path):
+            entries.append(entry)
+            if report: report(entry)
+        return entries
+    finally:
+        sync.close()
+
+def push_paths(serial, local_paths, remote_dir, connections=4, log=None, progress=None, report=None, cancel_event=None):
+    sync = SyncConnection.open(serial)
+    try:
+        remote_index = {}
+        if sync.stat(remote_dir)["exists"]:
+            remote_index = {posixpath.join(remote_dir, rel): entry for rel, entry in sync.walk(remote_dir)}
+    finally:
+        sync.close()
+    jobs, skipped = plan_push(local_paths, remote_dir, remote_index)
+    if log: log(f"Push: {len(jobs)} file(s) to send, {len(skipped)} unchanged skipped")
+    manager = TransferManager(serial, "push", jobs, connections=connections, cancel_event=cancel_event)
+    return manager.run(log=log, progress=progress, report=report)
+
+def pull_paths(serial, remote_paths, local_dir, connections=4, log=None, progress=None, report=None, cancel_event=None):
+    sync = SyncConnection.open(serial)
+    entries = []
+    try:
+        for remote in remote_paths:
+            info = sync.stat(remote)
+            if not info["exists"]:
+                if log: log(f"Error: {remote} does not exist")
+                continue
+            if stat.S_ISDIR(info["mode"]):
+                base = posixpath.basename(remote.rstrip("/"))
+                entries.extend((posixpath.join(remote, rel), posixpath.join(base, rel), entry) for rel, entry in sync.walk(remote))
+            else:
+                entries.append((remote, posixpath.basename(remote), info))
+    finally:
+        sync.close()
+    jobs, skipped = plan_pull(entries, local_dir)
+    if log: log(f"Pull: {len(jobs)} file(s) to fetch, {len(skipped)} unchanged skipped")
+    manager = TransferManager(serial, "pull", jobs, connections=connections, cancel_event=cancel_event)
+    return manager.run(log=log, progress=progress, report=report)
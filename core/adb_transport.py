@@ -0,0 +1,105 @@
+import socket
+import subprocess
+
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = 5037
+
+class AdbError(Exception):
+    pass
+
+def recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk: raise AdbError("Connection closed by device")
+        buf.extend(chunk)
+    return bytes(buf)
+
+def _encode_request(request):
+    payload = request.encode("utf-8")
+    return f"{len(payload):04x}".encode("ascii") + payload
+
+class AdbConnection:
+    """ One stream to the adb server (smart socket protocol).
+
+    ``AdbConnection.open(serial, service)`` switches the stream to the
+    device and starts ``service`` on it (``shell:``, ``sync:``,
+    ``exec:``, ``sideload-host:`` ...); afterwards the socket carries the
+    raw service stream. Anything with ``sendall``/``recv`` can stand in
+    for the socket, which is how the protocol code is exercised without a
+    device.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+
+    @classmethod
+    def connect(cls, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT, timeout=10):
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+        except ConnectionRefusedError:
+            # Same behaviour as the adb client: spawn the server on demand
+            subprocess.run(["adb", "start-server"], capture_output=True)
+            sock = socket.create_connection((host, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(sock)
+
+    @classmethod
+    def open(cls, serial, service, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT, timeout=10):
+        conn = cls.connect(host, port, timeout)
+        try:
+            conn.request(f"host:transport:{serial}" if serial else "host:transport-any")
+            conn.request(service)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def request(self, request):
+        self.sock.sendall(_encode_request(request))
+        self.read_status()
+
+    def read_status(self):
+        status = recv_exact(self.sock, 4)
+        if status == b"OKAY": return
+        if status == b"FAIL":
+            raise AdbError(self.read_length_prefixed().decode("utf-8", errors="replace"))
+        raise AdbError(f"Unexpected adb server reply {status!r}")
+
+    def read_length_prefixed(self):
+        length = int(recv_exact(self.sock, 4), 16)
+        return recv_exact(self.sock, length)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def recv(self, size):
+        return self.sock.recv(size)
+
+    def recv_exact(self, size):
+        return recv_exact(self.sock, size)
+
+    def recv_all(self):
+        chunks = []
+        while True:
+            chunk = self.sock.recv(65536)
+            if not chunk: return b"".join(chunks)
+            chunks.append(chunk)
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        try: self.sock.close()
+        except OSError: pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def host_query(request, host=ADB_SERVER_HOST, port=ADB_SERVER_PORT):
+    """ Runs a ``host:`` service (e.g. ``host:devices``) and returns its text payload """
+    with AdbConnection.connect(host, port) as conn:
+        conn.request(request)
+        return conn.read_length_prefixed().decode("utf-8", errors="replace")
@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import struct
+import zipfile
+import threading
+import subprocess
+
+# Android binary XML (AXML) chunk types
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+UTF8_FLAG = 0x100
+
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+
+# android:* attribute resource IDs, used when attribute names are stripped
+ATTR_IDS = {
+    0x0101021b: "versionCode",
+    0x0101021c: "versionName",
+    0x01010576: "versionCodeMajor",
+}
+
+class ApkParseError(Exception):
+    pass
+
+class _StringPool:
+    """ Lazily decodes strings from an AXML string pool chunk """
+    def __init__(self, data, offset):
+        _, header_size, _, count, _, flags, strings_start, _ = struct.unpack_from("<HHIIIIII", data, offset)
+        self.data = data
+        self.utf8 = bool(flags & UTF8_FLAG)
+        self.offsets = struct.unpack_from(f"<{count}I", data, offset + header_size)
+        self.base = offset + strings_start
+        self.cache = {}
+
+    def get(self, index):
+        if index < 0 or index >= len(self.offsets): return None
+        if index in self.cache: return self.cache[index]
+        pos = self.base + self.offsets[index]
+        data = self.data
+        if self.utf8:
+            # UTF-16 length then UTF-8 byte length, each 1 or 2 bytes
+            pos += 2 if data[pos] & 0x80 else 1
+            length = data[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[pos + 1]
+                pos += 2
+            else:
+                pos += 1
+            value = data[pos:pos + length].decode("utf-8", errors="replace")
+        else:
+            length = struct.unpack_from("<H", data, pos)[0]
+            pos += 2
+            if length & 0x8000:
+                length = ((length & 0x7FFF) << 16) | struct.unpack_from("<H", data, pos)[0]
+                pos += 2
+            value = data[pos:pos + length * 2].decode("utf-16-le", errors="replace")
+        self.cache[index] = value
+        return value
+
+def parse_manifest_attrs(data):
+    """ Returns the attributes of the root ``<manifest>`` element of a binary AndroidManifest.xml """
+    if len(data) < 8: raise ApkParseError("Manifest too short")
+    chunk_type, header_size, _ = struct.unpack_from("<HHI", data, 0)
+    if chunk_type != RES_XML_TYPE: raise ApkParseError("Not a binary XML manifest")
+
+    pool, res_ids = None, ()
+    pos = header_size
+    while pos + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, pos)
+        if chunk_size < 8: raise ApkParseError("Corrupt chunk")
+        if chunk_type == RES_STRING_POOL_TYPE:
+            pool = _StringPool(data, pos)
+        elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+            res_ids = struct.unpack_from(f"<{(chunk_size - header_size) // 4}I", data, pos + header_size)
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+            if pool is None: raise ApkParseError("Missing string pool")
+            ext = pos + header_size
+            _, name_idx, attr_start, attr_size, attr_count = struct.unpack_from("<IIHHH", data, ext)
+            if pool.get(name_idx) != "manifest": raise ApkParseError("Root element is not <manifest>")
+            attrs = {}
+            for i in range(attr_count):
+                a = ext + attr_start + i * attr_size
+                _, name_idx, raw_idx, _, _, data_type, value = struct.unpack_from("<IIIHBBI", data, a)
+                name = ATTR_IDS.get(res_ids[name_idx]) if name_idx < len(res_ids) else None
+                name = name or pool.get(name_idx)
+                if not name: continue
+                if data_type == TYPE_STRING:
+                    attrs[name] = pool.get(value)
+                elif data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+                    attrs[name] = value
+                elif raw_idx != 0xFFFFFFFF:
+                    attrs[name] = pool.get(raw_idx)
+            return attrs
+        pos += chunk_size
+    raise ApkParseError("No <manifest> element found")
+
+def inspect_apk(path):
+    """ Reads package identity from an APK without extracting it or calling aapt """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            data = zf.read("AndroidManifest.xml")
+    except (zipfile.BadZipFile, KeyError, OSError) as e:
+        raise ApkParseError(f"Unreadable APK: {str(e)}")
+    try:
+        attrs = parse_manifest_attrs(data)
+    except struct.error:
+        raise ApkParseError("Truncated manifest")
+    version_code = attrs.get("versionCode")
+    if isinstance(version_code, str):
+        version_code = int(version_code) if version_code.isdigit() else None
+    major = attrs.get("versionCodeMajor")
+    if version_code is not None and isinstance(major, int) and major:
+        version_code |= major << 32
+    return {
+        "package": attrs.get("package"),
+        "version_code": version_code,
+        "version_name": attrs.get("versionName") if isinstance(attrs.get("versionName"), str) else None,
+        "split": attrs.get("split"),
+    }
+
+PM_LINE = re.compile(r"^package:(\S+)\s+versionCode:(\d+)")
+
+def fetch_device_packages(serial):
+    proc = subprocess.run(["adb", "-s", serial, "shell", "pm", "list", "packages", "--show-versioncode"],
+                          capture_output=True, text=True, timeout=30)
+    packages = {}
+    for line in proc.stdout.splitlines():
+        match = PM_LINE.match(line.strip())
+        if match: packages[match.group(1)] = int(match.group(2))
+    return packages
+
+class DevicePackageCache:
+    """ Per-device ``package -> versionCode`` map fetched once per ``ttl`` seconds """
+    def __init__(self, ttl=300, fetcher=fetch_device_packages):
+        self.ttl = ttl
+        self.fetcher = fetcher
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, serial):
+        with self.lock:
+            entry = self.entries.get(serial)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+        try:
+            packages = self.fetcher(serial)
+        except Exception:
+            packages = {}
+        with self.lock:
+            self.entries[serial] = (time.monotonic(), packages)
+        return packages
+
+    def update(self, serial, package, version_code):
+        with self.lock:
+            if serial in self.entries and package and version_code is not None:
+                self.entries[serial][1][package] = version_code
+
+    def invalidate(self, serial=None):
+        with self.lock:
+            if serial: self.entries.pop(serial, None)
+            else: self.entries.clear()
+
+def installed_version_blocks(info, packages):
+    """ Returns the installed versionCode if it makes installing ``info`` redundant, else None """
+    if not info or not info.get("package") or info.get("version_code") is None: return None
+    installed = packages.get(info["package"])
+    if installed is not None and installed >= info["version_code"]:
+        return installed
+    return None
+
+def check_install(serial, path, package_cache, log=None, progress=None, report=None):
+    """ ``(info, installed_version_code)`` for installing ``path`` on ``serial``.
+
+    The versionCode is None unless the device already has this version or
+    a newer one; ``info`` is None when the APK could not be parsed.
+    """
+    try:
+        info = inspect_apk(path)
+    except ApkParseError as e:
+        if log: log(f"Error: {os.path.basename(path)}: {str(e)}")
+        return None, None
+    if not info["package"]: return info, None
+    return info, installed_version_blocks(info, package_cache.get(serial))
@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import queue
+import threading
+import subprocess
+from core.apk_info import inspect_apk, installed_version_blocks, ApkParseError
+
+SPLIT_PREFIXES = ("split_", "config.")
+FAILURE_PATTERN = re.compile(r"Failure \[([^\]]+)\]")
+
+def is_split_apk(file_name):
+    return file_name.lower().startswith(SPLIT_PREFIXES)
+
+def collect_apks(paths):
+    """ Expands files and folders into a sorted list of ``.apk`` paths """
+    apks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                apks.extend(os.path.join(root, f) for f in files if f.lower().endswith(".apk"))
+        elif path.lower().endswith(".apk") and os.path.isfile(path):
+            apks.append(path)
+    return sorted(set(apks))
+
+def group_apks(apks):
+    """ Groups split APKs with their base so each group becomes one install session.
+
+    Within a folder, ``split_*.apk`` / ``config.*.apk`` files belong to
+    ``base.apk`` or, failing that, to the only non-split APK in the folder.
+    Returns a list of ``{"name", "files", "error"}`` dicts.
+    """
+    by_dir = {}
+    for apk in apks:
+        by_dir.setdefault(os.path.dirname(apk), []).append(apk)
+
+    groups = []
+    for folder, files in sorted(by_dir.items()):
+        splits = [f for f in files if is_split_apk(os.path.basename(f))]
+        bases = [f for f in files if f not in splits]
+        if splits:
+            base = next((f for f in bases if os.path.basename(f).lower() == "base.apk"), None)
+            if base is None and len(bases) == 1: base = bases[0]
+            if base is None:
+                name = os.path.basename(folder) or folder
+                groups.append({"name": name, "files": splits, "error": "Split APKs without a base.apk"})
+            else:
+                bases.remove(base)
+                name = os.path.basename(folder) if os.path.basename(base).lower() == "base.apk" else os.path.basename(base)
+                groups.append({"name": name, "files": [base] + splits, "error": None})
+        for base in bases:
+            groups.append({"name": os.path.basename(base), "files": [base], "error": None})
+    return groups
+
+def build_install_cmd(serial, files, reinstall=True):
+    cmd = ["adb", "-s", serial, "install-multiple" if len(files) > 1 else "install"]
+    if reinstall: cmd.append("-r")
+    return cmd + list(files)
+
+def annotate_groups(groups):
+    """ Attaches package identity parsed from each group's base APK (``info`` key) """
+    for group in groups:
+        try:
+            group["info"] = inspect_apk(group["files"][0])
+        except ApkParseError:
+            group["info"] = None
+    return groups
+
+def describe_group(group):
+    info = group.get("info")
+    if not info or not info.get("package"): return group["name"]
+    version = info.get("version_name") or info.get("version_code")
+    return f"{info['package']} ({version})" if version else info["package"]
+
+def install_group(serial, group, timeout=600):
+    start = time.monotonic()
+    result = {"serial": serial, "name": describe_group(group), "files": len(group["files"]), "ok": False, "status": ""}
+    if group.get("error"):
+        result["status"] = group["error"]
+    else:
+        try:
+            proc = subprocess.run(build_install_cmd(serial, group["files"]), capture_output=True, text=True, timeout=timeout)
+            output = proc.stdout + proc.stderr
+            failure = FAILURE_PATTERN.search(output)
+            if proc.returncode == 0 and "Success" in output:
+                result["ok"], result["status"] = True, "Success"
+            elif failure:
+                result["status"] = failure.group(1)
+            else:
+                lines = [l for l in output.splitlines() if l.strip()]
+                result["status"] = lines[-1].strip() if lines else f"Exit code {proc.returncode}"
+        except subprocess.TimeoutExpired:
+            result["status"] = "Timed out"
+        except Exception as e:
+            result["status"] = f"Error: {str(e)}"
+    result["seconds"] = round(time.monotonic() - start, 2)
+    return result
+
+class BulkInstaller:
+    """ Installs every APK group on every device.
+
+    Each device gets its own job queue drained by ``per_device`` worker
+    threads, so devices progress independently and no single device is
+    flooded with concurrent sessions. With a ``package_cache``, groups whose
+    package is already installed at the same or a newer versionCode are
+    skipped without touching the device.
+    """
+    def __init__(self, serials, groups, per_device=2, installer=install_group, package_cache=None):
+        self.serials = list(serials)
+        self.groups = list(groups)
+        self.per_device = max(1, per_device)
+        self.installer = installer
+        self.package_cache = package_cache
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def install_or_skip(self, serial, group):
+        info = group.get("info")
+        if self.package_cache and info and not group.get("error"):
+            installed = installed_version_blocks(info, self.package_cache.get(serial))
+            if installed is not None:
+                return {"serial": serial, "name": describe_group(group), "files": len(group["files"]),
+                        "ok": True, "skipped": True, "status": f"Skipped (installed: {installed})", "seconds": 0.0}
+        result = self.installer(serial, group)
+        if result["ok"] and self.package_cache and info:
+            self.package_cache.update(serial, info.get("package"), info.get("version_code"))
+        return result
+
+    def run(self, log=None, progress=None, report=None):
+        total = len(self.serials) * len(self.groups)
+        results = []
+        lock = threading.Lock()
+        annotate_groups(self.groups)
+
+        def worker(serial, jobs):
+            while not self.cancel_event.is_set():
+                try: group = jobs.get_nowait()
+                except queue.Empty: return
+                result = self.install_or_skip(serial, group)
+                with lock:
+                    results.append(result)
+                    done = len(results)
+                if report: report(result)
+                if progress: progress(done, total)
+
+        threads = []
+        for serial in self.serials:
+            jobs = queue.Queue()
+            for group in self.groups: jobs.put(group)
+            for _ in range(min(self.per_device, len(self.groups))):
+                t = threading.Thread(target=worker, args=(serial, jobs), daemon=True)
+                t.start()
+                threads.append(t)
+        if log: log(f"Bulk install: {len(self.groups)} package(s) on {len(self.serials)} device(s), {len(threads)} worker(s)")
+        for t in threads: t.join()
+
+        failed = sum(1 for r in results if not r["ok"])
+        skipped = sum(1 for r in results if r.get("skipped"))
+        if log:
+            state = "cancelled" if self.cancel_event.is_set() else "finished"
+            log(f"Bulk install {state}: {len(results) - failed - skipped} installed, {skipped} skipped, {failed} failed")
+        return results
@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import time
+import datetime
+from core.shell_session import shell
+from core.telemetry import split_sections, parse_proc_stat
+
+DEFAULT_FRAME_BUDGET_MS = 1000 / 60
+PACKAGE_NAME = re.compile(r"^[A-Za-z0-9_.]+$")
+
+class ProfileError(Exception):
+    pass
+
+def profile_script(package):
+    # gfxinfo, total jiffies and the app's /proc entries in one read per tick
+    return "; ".join([
+        "echo @@gfx", f"dumpsys gfxinfo {package} framestats",
+        "echo @@stat", "head -1 /proc/stat",
+        "echo @@proc", f"for p in $(pidof {package}); do cat /proc/$p/stat; grep VmRSS /proc/$p/status; done",
+    ])
+
+def parse_framestats(lines):
+    """ ``[(intended_vsync_ns, duration_ns)]`` for every valid frame in the PROFILEDATA blocks.
+
+    ``framestats`` prints a CSV table per window; the first row is the
+    header and rows with a non-zero Flags column are incomplete or
+    layout-only frames that Android itself excludes from jank stats.
+    """
+    frames = []
+    columns = None
+    in_block = False
+    for line in lines:
+        line = line.strip()
+        if line == "---PROFILEDATA---":
+            in_block, columns = not in_block, None
+            continue
+        if not in_block or not line: continue
+        cells = line.rstrip(",").split(",")
+        if columns is None:
+            columns = {name: i for i, name in enumerate(cells)}
+            continue
+        try:
+            if int(cells[columns["Flags"]]) != 0: continue
+            start = int(cells[columns["IntendedVsync"]])
+            end = int(cells[columns["FrameCompleted"]])
+        except (KeyError, ValueError, IndexError):
+            continue
+        if end > start: frames.append((start, end - start))
+    return frames
+
+def parse_proc_entries(lines):
+    """ Sums utime+stime (jiffies) and VmRSS (kB) over all processes of the package """
+    jiffies, rss_kb, pids = 0, 0, 0
+    for line in lines:
+        if line.startswith("VmRSS:"):
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit(): rss_kb += int(parts[1])
+            continue
+        # comm (field 2) may contain spaces, so split after its closing paren
+        close = line.rfind(")")
+        if close < 0: continue
+        fields = line[close + 2:].split()
+        if len(fields) > 12 and fields[11].isdigit() and fields[12].isdigit():
+            jiffies += int(fields[11]) + int(fields[12])
+            pids += 1
+    return {"jiffies": jiffies, "rss_kb": rss_kb, "processes": pids}
+
+def percentile(values, pct):
+    """ Nearest-rank percentile of an already sorted list """
+    if not values: return None
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+def estimate_frame_budget(frames):
+    """ Refresh interval from the smallest gap between intended vsyncs (handles 90/120 Hz panels) """
+    starts = sorted(start for start, _ in frames)
+    gaps = [b - a for a, b in zip(starts, starts[1:]) if b > a]
+    if not gaps: return DEFAULT_FRAME_BUDGET_MS
+    return min(gaps) / 1e6
+
+def summarize(frame_ms, cpu_samples, rss_samples, budget_ms):
+    ordered = sorted(frame_ms)
+    janky = sum(1 for ms in frame_ms if ms > budget_ms)
+    return {
+        "frames": len(frame_ms),
+        "frame_budget_ms": round(budget_ms, 2),
+        "p50_ms": percentile(ordered, 50),
+        "p90_ms": percentile(ordered, 90),
+        "p99_ms": percentile(ordered, 99),
+        "janky_ratio": janky / len(frame_ms) if frame_ms else None,
+        "cpu_avg_pct": sum(cpu_samples) / len(cpu_samples) if cpu_samples else None,
+        "cpu_max_pct": max(cpu_samples) if cpu_samples else None,
+        "rss_avg_kb": sum(rss_samples) // len(rss_samples) if rss_samples else None,
+        "rss_max_kb": max(rss_samples) if rss_samples else None,
+    }
+
+def _default_read(serial, package):
+    return shell(serial, profile_script(package)).output
+
+def _build_fingerprint(serial):
+    return shell(serial, "getprop ro.build.fingerprint").output.strip()
+
+def profile_app(serial, package, interval=1.0, duration=60, sessions_dir=None, cancel_event=None,
+                read=_default_read, fingerprint=_build_fingerprint, log=None, progress=None, report=None):
+    """ Samples frame timings, CPU and RSS of ``package`` until ``duration`` or cancel, and stores the session.
+
+    Frames are de-duplicated across ticks by their intended vsync, since
+    ``framestats`` repeats the last ~2 s of frames on every call. CPU is
+    the package's share of all jiffies (100% = every core busy). Reports a
+    running summary every tick and returns the saved session dict.
+    """
+    if not PACKAGE_NAME.match(package): raise ProfileError(f"Invalid package name: {package}")
+    build = fingerprint(serial) if fingerprint else ""
+    started = time.time()
+    seen = set()
+    frames, samples = [], []
+    previous = None
+    if log: log(f"Profiling {package} on {serial} every {interval:.1f}s for up to {duration}s")
+    while time.time() - started < duration:
+        tick = time.time()
+        sections = split_sections(read(serial, package))
+        new_frames = [f for f in parse_framestats(sections.get("gfx", [])) if f[0] not in seen]
+        seen.update(start for start, _ in new_frames)
+        frames.extend(new_frames)
+        total = parse_proc_stat(sections.get("stat", [])).get("cpu", (0, 0))[1]
+        proc = parse_proc_entries(sections.get("proc", []))
+        sample = {"t": round(tick - started, 2), "frames": len(new_frames), "rss_kb": proc["rss_kb"], "cpu_pct": None}
+        if proc["processes"] == 0:
+            sample["rss_kb"] = None
+            if log and (not samples or samples[-1]["rss_kb"] is not None): log(f"{package} is not running")
+        elif previous and total > previous[1] and proc["jiffies"] >= previous[0]:
+            sample["cpu_pct"] = 100.0 * (proc["jiffies"] - previous[0]) / (total - previous[1])
+        previous = (proc["jiffies"], total) if proc["processes"] else None
+        samples.append(sample)
+        if progress: progress(int(min(tick - started, duration)), int(duration))
+        if report:
+            report({"sample": sample, "summary": _summary(frames, samples)})
+        remaining = max(0.0, interval - (time.time() - tick))
+        if cancel_event is not None:
+            if cancel_event.wait(remaining): break
+        else:
+            time.sleep(remaining)
+
+    session = {
+        "package": package,
+        "serial": serial,
+        "build": build,
+        "started": datetime.datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "duration": round(time.time() - started, 1),
+        "interval": interval,
+        "summary": _summary(frames, samples),
+        "samples": samples,
+        "frame_ms": [round(d / 1e6, 3) for _, d in frames],
+    }
+    if sessions_dir: session["path"] = save_session(session, sessions_dir)
+    summary = session["summary"]
+    if log:
+        if summary["frames"]:
+            log(f"Profile of {package}: {summary['frames']} frames, p50 {summary['p50_ms']:.1f} ms, p90 {summary['p90_ms']:.1f} ms, "
+                f"p99 {summary['p99_ms']:.1f} ms, {summary['janky_ratio'] * 100:.1f}% janky")
+        else:
+            log(f"Profile of {package}: no frames rendered (is the app in the foreground?)")
+    return session
+
+def _summary(frames, samples):
+    budget = estimate_frame_budget(frames)
+    return summarize([d / 1e6 for _, d in frames],
+                     [s["cpu_pct"] for s in samples if s["cpu_pct"] is not None],
+                     [s["rss_kb"] for s in samples if s["rss_kb"] is not None], budget)
+
+def save_session(session, sessions_dir):
+    folder = os.path.join(sessions_dir, session["package"])
+    os.makedirs(folder, exist_ok=True)
+    stamp = session["started"].replace(":", "").replace("-", "")
+    path = os.path.join(folder, f"{stamp}_{session['serial'].replace(':', '_')}.json")
+    with open(path, "w") as f:
+        json.dump(session, f)
+    return path
+
+def list_sessions(sessions_dir, package):
+    """ Stored sessions of ``package`` (without raw samples), newest first """
+    folder = os.path.join(sessions_dir, package)
+    if not os.path.isdir(folder): return []
+    sessions = []
+    for name in sorted(os.listdir(folder), reverse=True):
+        if not name.endswith(".json"): continue
+        try:
+            with open(os.path.join(folder, name), "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        sessions.append({k: data.get(k) for k in ("package", "serial", "build", "started", "duration", "summary")})
+    return sessions
+
+def foreground_package(serial):
+    """ Package of the resumed activity, or None """
+    text = shell(serial, "dumpsys activity activities | grep -m1 -E 'mResumedActivity|topResumedActivity'").output
+    match = re.search(r"\s([A-Za-z0-9_.]+)/", text)
+    return match.group(1) if match else None
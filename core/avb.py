@@ -0,0 +1,292 @@
+import os
+import re
+import struct
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.boot_image import AVB_FOOTER_MAGIC, AVB_FOOTER_SIZE
+from core.super_image import ImageReader, SuperImageError
+
+# external/avb/libavb (avb_vbmeta_image.h, avb_footer.h, avb_*_descriptor.h); all big-endian
+AVB_MAGIC = b"AVB0"
+VBMETA_HEADER = struct.Struct(">4s2L2QL11Q2L48s80x")
+FOOTER = struct.Struct(">4s2L3Q28x")
+DESCRIPTOR = struct.Struct(">QQ")
+HASHTREE_DESCRIPTOR = struct.Struct(">LQQQLLLQQ32sLLLL60x")
+HASH_DESCRIPTOR = struct.Struct(">Q32sLLLL60x")
+CHAIN_DESCRIPTOR = struct.Struct(">LLLL60x")
+TAG_PROPERTY, TAG_HASHTREE, TAG_HASH, TAG_CMDLINE, TAG_CHAIN = range(5)
+
+# Level-0 hashtree work is split into slices of this many data blocks (64 MiB of 4 KiB blocks)
+BLOCKS_PER_TASK = 16384
+HASH_CHUNK = 4 * 1024 * 1024
+SLOT_SUFFIX = re.compile(r"_[ab]$")
+
+class AvbError(Exception):
+    pass
+
+def _cstr(raw):
+    return bytes(raw).decode("utf-8", errors="replace")
+
+def _parse_descriptors(data):
+    descriptors, pos = [], 0
+    while pos + DESCRIPTOR.size <= len(data):
+        tag, length = DESCRIPTOR.unpack_from(data, pos)
+        body = data[pos + DESCRIPTOR.size:pos + DESCRIPTOR.size + length]
+        pos += DESCRIPTOR.size + length
+        if tag == TAG_HASH:
+            image_size, algorithm, name_len, salt_len, digest_len, flags = HASH_DESCRIPTOR.unpack_from(body)
+            fields = body[HASH_DESCRIPTOR.size:]
+            descriptors.append({"type": "hash", "partition": _cstr(fields[:name_len]), "image_size": image_size,
+                                "algorithm": _cstr(algorithm.rstrip(b"\0")), "salt": bytes(fields[name_len:name_len + salt_len]),
+                                "digest": bytes(fields[name_len + salt_len:name_len + salt_len + digest_len])})
+        elif tag == TAG_HASHTREE:
+            (_, image_size, tree_offset, tree_size, data_block_size, hash_block_size, _, _, _, algorithm,
+             name_len, salt_len, digest_len, flags) = HASHTREE_DESCRIPTOR.unpack_from(body)
+            fields = body[HASHTREE_DESCRIPTOR.size:]
+            descriptors.append({"type": "hashtree", "partition": _cstr(fields[:name_len]), "image_size": image_size,
+                                "tree_offset": tree_offset, "tree_size": tree_size,
+                                "data_block_size": data_block_size, "hash_block_size": hash_block_size,
+                                "algorithm": _cstr(algorithm.rstrip(b"\0")), "salt": bytes(fields[name_len:name_len + salt_len]),
+                                "digest": bytes(fields[name_len + salt_len:name_len + salt_len + digest_len])})
+        elif tag == TAG_CHAIN:
+            location, name_len, key_len, flags = CHAIN_DESCRIPTOR.unpack_from(body)
+            fields = body[CHAIN_DESCRIPTOR.size:]
+            descriptors.append({"type": "chain", "partition": _cstr(fields[:name_len]), "rollback_index_location": location,
+                                "public_key": bytes(fields[name_len:name_len + key_len])})
+    return descriptors
+
+def parse_vbmeta(data):
+    """ Header fields, public key and descriptors of one vbmeta blob """
+    if len(data) < VBMETA_HEADER.size or bytes(data[:4]) != AVB_MAGIC: raise AvbError("No vbmeta header")
+    (_, major, minor, auth_size, aux_size, algorithm, _, _, _, _, key_offset, key_size, _, _,
+     desc_offset, desc_size, rollback_index, flags, _, release) = VBMETA_HEADER.unpack_from(data)
+    aux = data[VBMETA_HEADER.size + auth_size:VBMETA_HEADER.size + auth_size + aux_size]
+    if len(aux) < aux_size or desc_offset + desc_size > aux_size or key_offset + key_size > aux_size:
+        raise AvbError("Truncated vbmeta")
+    return {"version": f"{major}.{minor}", "algorithm": algorithm, "flags": flags, "rollback_index": rollback_index,
+            "release": _cstr(release.split(b"\0", 1)[0]), "public_key": bytes(aux[key_offset:key_offset + key_size]),
+            "descriptors": _parse_descriptors(aux[desc_offset:desc_offset + desc_size])}
+
+def read_avb(path):
+    """ The vbmeta of a vbmeta image or of an image with an AVB footer (raw or sparse), else None """
+    try:
+        reader = ImageReader(path)
+    except SuperImageError:
+        return None
+    try:
+        if reader.size >= VBMETA_HEADER.size and reader.read(0, 4) == AVB_MAGIC:
+            head = VBMETA_HEADER.unpack(reader.read(0, VBMETA_HEADER.size))
+            size = min(reader.size, VBMETA_HEADER.size + head[3] + head[4])
+            return dict(parse_vbmeta(reader.read(0, size)), footer=None)
+        if reader.size < AVB_FOOTER_SIZE: return None
+        raw = reader.read(reader.size - AVB_FOOTER_SIZE, AVB_FOOTER_SIZE)
+        if raw[:4] != AVB_FOOTER_MAGIC: return None
+        _, _, _, original_size, vbmeta_offset, vbmeta_size = FOOTER.unpack(raw)
+        if vbmeta_offset + vbmeta_size > reader.size: raise AvbError("AVB footer points past the end of the image")
+        footer = {"original_image_size": original_size, "vbmeta_offset": vbmeta_offset, "vbmeta_size": vbmeta_size}
+        return dict(parse_vbmeta(reader.read(vbmeta_offset, vbmeta_size)), footer=footer)
+    finally:
+        reader.close()
+
+def _image_size(path):
+    """ Unsparsed size, which is what descriptors measure """
+    reader = ImageReader(path)
+    size = reader.size
+    reader.close()
+    return size
+
+def _zero_fill(hasher, count):
+    block = bytes(min(count, HASH_CHUNK))
+    while count > 0:
+        hasher.update(block[:count])
+        count -= len(block)
+
+def _hash_image(path, image_size, algorithm, salt):
+    """ Process-pool task: salted digest of the first ``image_size`` bytes, as a hash descriptor stores it """
+    hasher = hashlib.new(algorithm, salt)
+    reader = ImageReader(path)
+    try:
+        for piece in reader.iter_range(0, image_size, HASH_CHUNK):
+            if isinstance(piece, int): _zero_fill(hasher, piece)
+            else: hasher.update(piece)
+        piece = None
+    finally:
+        reader.close()
+    return hasher.digest()
+
+def _digest_padding(algorithm):
+    size = hashlib.new(algorithm).digest_size
+    return bytes((1 << (size - 1).bit_length()) - size)
+
+def _hash_blocks(data, block_size, salted, padding):
+    """ One padded digest per ``block_size`` block; a short last block is hashed zero-padded """
+    out = bytearray()
+    for i in range(0, len(data), block_size):
+        h = salted.copy()
+        h.update(data[i:i + block_size])
+        if len(data) - i < block_size: h.update(bytes(block_size - (len(data) - i)))
+        out += h.digest()
+        out += padding
+    return out
+
+def _hashtree_level0(path, offset, length, block_size, algorithm, salt):
+    """ Process-pool task: the level-0 digests of ``length`` bytes at ``offset`` (a multiple of the block size) """
+    salted, padding = hashlib.new(algorithm, salt), _digest_padding(algorithm)
+    zero = _hash_blocks(bytes(block_size), block_size, salted, padding)
+    out, carry = bytearray(), b""
+    reader = ImageReader(path)
+    try:
+        for piece in reader.iter_range(offset, length, block_size * 256):
+            if isinstance(piece, int):
+                # Don't-care runs hash to the same digest over and over
+                if not carry and piece % block_size == 0:
+                    out += zero * (piece // block_size)
+                    continue
+                piece = bytes(piece)
+            if carry:
+                piece, carry = carry + bytes(piece), b""
+            whole = len(piece) - len(piece) % block_size
+            out += _hash_blocks(piece[:whole], block_size, salted, padding)
+            carry = bytes(piece[whole:])
+        piece = None
+    finally:
+        reader.close()
+    if carry: out += _hash_blocks(carry, block_size, salted, padding)
+    return bytes(out)
+
+def hashtree_root(level0, block_size, algorithm, salt):
+    """ Builds the upper tree levels from the level-0 digests and returns the root digest (as avbtool does) """
+    salted, padding = hashlib.new(algorithm, salt), _digest_padding(algorithm)
+    level = bytes(level0) + bytes(-len(level0) % block_size)
+    while len(level) > block_size:
+        level = _hash_blocks(level, block_size, salted, padding)
+        level += bytes(-len(level) % block_size)
+    root = salted.copy()
+    root.update(level)
+    return root.digest()
+
+def partition_base(partition):
+    return SLOT_SUFFIX.sub("", partition)
+
+def collect_expectations(images):
+    """ Maps partition names to the descriptor that will be enforced for them.
+
+    ``images`` are ``(partition, avb)`` pairs from ``read_avb``. Descriptors
+    in standalone vbmeta images win over the ones an image carries in its
+    own footer; chain descriptors are kept separately by partition.
+    """
+    expected, chains = {}, {}
+    for partition, avb in sorted(images, key=lambda item: item[1]["footer"] is None):
+        source = partition_base(partition)
+        for desc in avb["descriptors"]:
+            if desc["type"] == "chain":
+                chains[desc["partition"]] = (desc, source)
+            elif desc["type"] in ("hash", "hashtree"):
+                # A footer only speaks for its own partition
+                if avb["footer"] is not None and desc["partition"] != source: continue
+                expected[desc["partition"]] = (desc, source)
+    return expected, chains
+
+def verify_images(rows, workers=None, cache=None, log=None, progress=None, report=None):
+    """ Checks queued images against the vbmeta descriptors that come with them.
+
+    ``rows`` are ``(row, partition, path)``. Hash descriptors are digested
+    whole and hashtree level 0 is split into block slices, all in one
+    process pool reading through mmap. Reports one verdict per row:
+    ``{"row", "partition", "state", "detail"}`` where ``state`` is
+    ``"ok"``, ``"mismatch"``, ``"unchecked"`` or ``"error"``. ``cache``
+    (a dict) remembers data verdicts by path, size and mtime.
+    """
+    verdicts, images, avbs = {}, [], {}
+    def finish(row, partition, state, detail):
+        verdicts[row] = {"row": row, "partition": partition, "state": state, "detail": detail}
+        if report: report(verdicts[row])
+
+    for row, partition, path in rows:
+        if not os.path.isfile(path):
+            finish(row, partition, "unchecked", "not a local image; staged at flash time")
+            continue
+        try:
+            avb = read_avb(path)
+        except (AvbError, SuperImageError, OSError, struct.error) as e:
+            finish(row, partition, "error", f"unreadable AVB data: {e}")
+            continue
+        if avb:
+            avbs[row] = avb
+            images.append((partition, avb))
+    expected, chains = collect_expectations(images)
+
+    jobs = []
+    for row, partition, path in rows:
+        if row in verdicts: continue
+        base, avb = partition_base(partition), avbs.get(row)
+        if base in chains:
+            desc, source = chains[base]
+            if avb is None: finish(row, partition, "mismatch", f"{source} chains {base}, but the image has no vbmeta")
+            elif avb["public_key"] != desc["public_key"]: finish(row, partition, "mismatch", f"signed with a different key than {source} expects")
+            elif base not in expected: finish(row, partition, "ok", f"chained from {source}, key matches")
+            if row in verdicts: continue
+        if base not in expected:
+            if avb and avb["footer"] is None: finish(row, partition, "ok", f"vbmeta image, {len(avb['descriptors'])} descriptor(s)")
+            else: finish(row, partition, "unchecked", "no AVB descriptor for this partition")
+            continue
+        desc, source = expected[base]
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns, desc["type"], desc["digest"])
+        if cache is not None and key in cache:
+            state, detail = cache[key]
+            finish(row, partition, state, detail + " (cached)")
+            continue
+        jobs.append((row, partition, path, desc, source, key))
+
+    total = sum(desc["image_size"] for *_, desc, _, _ in jobs)
+    done = 0
+    if jobs and log: log(f"Verifying {len(jobs)} image(s) against their vbmeta ({total / 1024 ** 2:.0f} MiB)...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures, pending = {}, {}
+        for job in jobs:
+            row, partition, path, desc, source, key = job
+            try:
+                size = _image_size(path)
+            except (OSError, SuperImageError) as e:
+                finish(row, partition, "error", str(e))
+                continue
+            if size < desc["image_size"]:
+                finish(row, partition, "mismatch", f"image is {size} bytes, {source} expects {desc['image_size']}")
+                continue
+            if desc["type"] == "hash":
+                futures[pool.submit(_hash_image, path, desc["image_size"], desc["algorithm"], desc["salt"])] = (row, 0, desc["image_size"])
+                pending[row] = [job, {0: None}]
+                continue
+            block_size = desc["data_block_size"]
+            span = BLOCKS_PER_TASK * block_size
+            pending[row] = [job, {}]
+            for offset in range(0, desc["image_size"], span):
+                length = min(span, desc["image_size"] - offset)
+                futures[pool.submit(_hashtree_level0, path, offset, length, block_size, desc["algorithm"], desc["salt"])] = (row, offset, length)
+                pending[row][1][offset] = None
+
+        for fut in as_completed(futures):
+            row, offset, length = futures[fut]
+            done += length
+            if progress: progress(done // 1024 ** 2, max(total // 1024 ** 2, 1))
+            if row not in pending: continue
+            (_, partition, path, desc, source, key), parts = pending[row]
+            try:
+                parts[offset] = fut.result()
+            except Exception as e:
+                del pending[row]
+                finish(row, partition, "error", str(e))
+                continue
+            if any(part is None for part in parts.values()): continue
+            del pending[row]
+            if desc["type"] == "hash":
+                digest = parts[0]
+            else:
+                level0 = b"".join(parts[o] for o in sorted(parts))
+                digest = hashtree_root(level0, desc["hash_block_size"], desc["algorithm"], desc["salt"])
+            kind = "hashtree root" if desc["type"] == "hashtree" else "digest"
+            state, detail = ("ok", f"{kind} matches {source}") if digest == desc["digest"] else ("mismatch", f"{kind} differs from {source}")
+            if cache is not None: cache[key] = (state, detail)
+            finish(row, partition, state, detail)
+    return [verdicts[row] for row, _, _ in rows if row in verdicts]
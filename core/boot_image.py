@@ -0,0 +1,288 @@
+import os
+import mmap
+import shutil
+import struct
+import hashlib
+
+BOOT_MAGIC = b"ANDROID!"
+VENDOR_BOOT_MAGIC = b"VNDRBOOT"
+AVB_FOOTER_MAGIC = b"AVBf"
+AVB_FOOTER_SIZE = 64
+V3_PAGE_SIZE = 4096
+WRITE_CHUNK = 4 * 1024 * 1024
+
+# system/tools/mkbootimg/include/bootimg/bootimg.h
+BOOT_V0 = struct.Struct("<8s10I16s512s32s1024s")
+BOOT_V1_EXTRA = struct.Struct("<IQI")
+BOOT_V2_EXTRA = struct.Struct("<IQ")
+BOOT_V3 = struct.Struct("<8s4I4II1536s")
+BOOT_V4_EXTRA = struct.Struct("<I")
+VENDOR_V3 = struct.Struct("<8sIIIII2048sI16sIIQ")
+VENDOR_V4_EXTRA = struct.Struct("<IIII")
+VENDOR_RAMDISK_ENTRY = struct.Struct("<III32s64s")
+
+RAMDISK_FORMATS = ((b"\x1f\x8b", "gzip"), (b"\x02\x21\x4c\x18", "lz4-legacy"), (b"\x04\x22\x4d\x18", "lz4"),
+                   (b"\xfd7zXZ", "xz"), (b"\x5d\x00\x00", "lzma"), (b"070701", "cpio"), (b"BZh", "bzip2"))
+
+class BootImageError(Exception):
+    pass
+
+def align(value, page):
+    return (value + page - 1) // page * page
+
+def _cstr(raw):
+    return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+def ramdisk_format(data):
+    if len(data) == 0: return "none"
+    head = bytes(data[:8])
+    for magic, name in RAMDISK_FORMATS:
+        if head.startswith(magic): return name
+    return "unknown"
+
+def decode_os_version(value):
+    """ ``(version, patch level)`` from the packed os_version field, e.g. ``("14.0.0", "2024-05")`` """
+    if not value: return None, None
+    version, level = value >> 11, value & 0x7FF
+    return f"{version >> 14}.{(version >> 7) & 0x7F}.{version & 0x7F}", f"{(level >> 4) + 2000}-{level & 0xF:02d}"
+
+class BootImage:
+    """ A boot, init_boot, recovery or vendor_boot image, read in place through an mmap.
+
+    ``components`` lists ``{"name", "offset", "size"}`` in file order;
+    ``component(name)`` returns a memoryview into the map, so the kernel
+    and ramdisk are never copied. Everything after the last component
+    (typically an AVB footer and its vbmeta) is the ``tail``.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise BootImageError(f"{os.path.basename(path)} is empty")
+        self.view = memoryview(self.map)
+        try:
+            self._parse()
+        except (struct.error, BootImageError) as e:
+            self.close()
+            raise BootImageError(f"{os.path.basename(path)}: {str(e)}")
+
+    def _parse(self):
+        magic = bytes(self.view[:8])
+        self.os_version = None
+        if magic == VENDOR_BOOT_MAGIC:
+            self.kind = "vendor_boot"
+            self._parse_vendor()
+        elif magic == BOOT_MAGIC:
+            self.kind = "boot"
+            self.header_version = struct.unpack_from("<I", self.view, 40)[0]
+            if self.header_version in (3, 4): self._parse_v3()
+            else: self._parse_v0()
+        else:
+            raise BootImageError("not an Android boot image")
+        self.body_end = align(max(c["offset"] + c["size"] for c in self.components), self.page_size)
+        if self.body_end > len(self.view): raise BootImageError("truncated image")
+        self.avb_footer = len(self.view) >= AVB_FOOTER_SIZE and bytes(self.view[-AVB_FOOTER_SIZE:-AVB_FOOTER_SIZE + 4]) == AVB_FOOTER_MAGIC
+
+    def _layout(self, sizes, start):
+        self.components, offset = [], start
+        for name, size in sizes:
+            self.components.append({"name": name, "offset": offset, "size": size})
+            offset += align(size, self.page_size)
+
+    def _parse_v0(self):
+        fields = BOOT_V0.unpack_from(self.view)
+        (_, kernel_size, _, ramdisk_size, _, second_size, _, _, self.page_size, version, os_version,
+         self.name, cmdline, self.id, extra_cmdline) = fields
+        if self.page_size not in (2048, 4096, 8192, 16384): raise BootImageError(f"bad page size {self.page_size}")
+        self.os_version = os_version
+        self.cmdline = _cstr(cmdline) + _cstr(extra_cmdline)
+        sizes = [("kernel", kernel_size), ("ramdisk", ramdisk_size), ("second", second_size)]
+        if version > 2:
+            # Legacy vendor images used this field for the size of an appended device tree
+            sizes.append(("dt", version))
+            self.header_version = version = 0
+        if version >= 1:
+            dtbo_size, _, self.header_size = BOOT_V1_EXTRA.unpack_from(self.view, BOOT_V0.size)
+            sizes.append(("recovery_dtbo", dtbo_size))
+        if version >= 2:
+            dtb_size, _ = BOOT_V2_EXTRA.unpack_from(self.view, BOOT_V0.size + BOOT_V1_EXTRA.size)
+            sizes.append(("dtb", dtb_size))
+        self._layout(sizes, self.page_size)
+
+    def _parse_v3(self):
+        _, kernel_size, ramdisk_size, os_version, self.header_size, *_, version, cmdline = BOOT_V3.unpack_from(self.view)
+        if version > 4: raise BootImageError(f"unsupported header version {version}")
+        self.page_size = V3_PAGE_SIZE
+        self.os_version = os_version
+        self.cmdline = _cstr(cmdline)
+        sizes = [("kernel", kernel_size), ("ramdisk", ramdisk_size)]
+        if version == 4: sizes.append(("signature", BOOT_V4_EXTRA.unpack_from(self.view, BOOT_V3.size)[0]))
+        self._layout(sizes, V3_PAGE_SIZE)
+
+    def _parse_vendor(self):
+        (_, self.header_version, self.page_size, _, _, ramdisk_size, cmdline, _, name, self.header_size,
+         dtb_size, _) = VENDOR_V3.unpack_from(self.view)
+        if self.header_version not in (3, 4): raise BootImageError(f"unsupported vendor_boot version {self.header_version}")
+        self.name = name
+        self.cmdline = _cstr(cmdline)
+        sizes = [("ramdisk", ramdisk_size), ("dtb", dtb_size)]
+        self.ramdisk_table = []
+        if self.header_version == 4:
+            table_size, entries, entry_size, bootconfig_size = VENDOR_V4_EXTRA.unpack_from(self.view, VENDOR_V3.size)
+            sizes += [("ramdisk_table", table_size), ("bootconfig", bootconfig_size)]
+        self._layout(sizes, align(self.header_size, self.page_size))
+        if self.header_version == 4:
+            table = self.component("ramdisk_table")
+            for i in range(entries):
+                size, offset, kind, name, _ = VENDOR_RAMDISK_ENTRY.unpack_from(table, i * entry_size)
+                self.ramdisk_table.append({"name": _cstr(name), "size": size, "offset": offset, "type": kind})
+
+    def component(self, name):
+        for c in self.components:
+            if c["name"] == name: return self.view[c["offset"]:c["offset"] + c["size"]]
+        raise BootImageError(f"no {name} in this image")
+
+    @property
+    def tail(self):
+        return self.view[self.body_end:]
+
+    def suggested_partition(self):
+        if self.kind == "vendor_boot": return "vendor_boot"
+        sizes = {c["name"]: c["size"] for c in self.components}
+        # Android 13+ GKI devices keep the generic ramdisk in init_boot: a v4 header with no kernel
+        if self.header_version >= 4 and sizes.get("kernel") == 0 and sizes.get("ramdisk"): return "init_boot"
+        return "boot"
+
+    def info(self):
+        version, patch = decode_os_version(self.os_version)
+        return {"kind": self.kind, "header_version": self.header_version, "page_size": self.page_size,
+                "components": [dict(c) for c in self.components], "cmdline": self.cmdline,
+                "ramdisk_format": ramdisk_format(self.component("ramdisk")), "os_version": version,
+                "os_patch_level": patch, "avb_footer": self.avb_footer, "partition": self.suggested_partition(),
+                "ramdisk_table": list(getattr(self, "ramdisk_table", []))}
+
+    def close(self):
+        self.view.release()
+        try: self.map.close()
+        except BufferError: pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_boot_info(path, log=None, progress=None, report=None):
+    with BootImage(path) as image:
+        return image.info()
+
+def _encode_cmdline(cmdline, size):
+    raw = cmdline.encode("utf-8")
+    if len(raw) >= size: raise BootImageError(f"cmdline is longer than {size - 1} bytes")
+    return raw
+
+def _build_header(image, sizes, cmdline, components):
+    """ The original header page with sizes, cmdline (and the v0-2 id) updated """
+    header = bytearray(image.view[:image.components[0]["offset"]])
+    if image.kind == "vendor_boot":
+        struct.pack_into("<I", header, 24, sizes["ramdisk"])
+        if cmdline is not None:
+            header[28:28 + 2048] = _encode_cmdline(cmdline, 2048).ljust(2048, b"\0")
+        if image.header_version == 4 and image.ramdisk_table:
+            if len(image.ramdisk_table) != 1 and sizes["ramdisk"] != image.component("ramdisk").nbytes:
+                raise BootImageError("vendor_boot has several ramdisk fragments; replacing them as one is not supported")
+        return header
+    if image.header_version >= 3:
+        struct.pack_into("<I", header, 12, sizes["ramdisk"])
+        if cmdline is not None:
+            header[44:44 + 1536] = _encode_cmdline(cmdline, 1536).ljust(1536, b"\0")
+        return header
+    struct.pack_into("<I", header, 16, sizes["ramdisk"])
+    if cmdline is not None:
+        raw = _encode_cmdline(cmdline, 512 + 1024)
+        header[64:64 + 512] = raw[:511].ljust(512, b"\0")
+        header[608:608 + 1024] = raw[511:].ljust(1024, b"\0")
+    if image.header_version >= 1:
+        # recovery_dtbo_offset is absolute in the file
+        dtbo = next(c for c in components if c["name"] == "recovery_dtbo")
+        struct.pack_into("<Q", header, BOOT_V0.size + 4, dtbo["offset"] if dtbo["size"] else 0)
+    # mkbootimg's id: SHA-1 over each component followed by its size
+    digest = hashlib.sha1()
+    for c in components:
+        digest.update(c["data"])
+        digest.update(struct.pack("<I", c["size"]))
+    header[576:576 + 32] = digest.digest().ljust(32, b"\0")
+    return header
+
+def repack_boot_image(path, out_path, ramdisk=None, cmdline=None, log=None, progress=None, report=None):
+    """ Writes ``out_path``: ``path`` with its ramdisk replaced (file path) and/or a new cmdline.
+
+    The output starts as a kernel-side copy of the original; afterwards
+    only the header and the regions whose content or position changed
+    are written. An AVB footer stays in place when the new body still
+    ends before it; its hash no longer matches, which an unlocked
+    bootloader tolerates. If the body grows past it, the footer is
+    dropped. Returns ``{"path", "written", "size", "partition"}``.
+    """
+    if os.path.abspath(path) == os.path.abspath(out_path): raise BootImageError("Write the patched image to a new file")
+    new_file = new_map = None
+    with BootImage(path) as image:
+        try:
+            if ramdisk:
+                new_file = open(ramdisk, "rb")
+                new_size = os.fstat(new_file.fileno()).st_size
+                new_map = mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ) if new_size else b""
+            components, offset = [], image.components[0]["offset"]
+            for c in image.components:
+                data = memoryview(new_map) if ramdisk and c["name"] == "ramdisk" else image.component(c["name"])
+                components.append({"name": c["name"], "offset": offset, "size": data.nbytes, "data": data,
+                                   "changed": data.nbytes != c["size"] or offset != c["offset"] or (ramdisk and c["name"] == "ramdisk")})
+                offset += align(data.nbytes, image.page_size)
+            if image.kind == "vendor_boot" and ramdisk and image.header_version == 4 and image.ramdisk_table:
+                # Single fragment: its table entry follows the new size
+                table = next(c for c in components if c["name"] == "ramdisk_table")
+                patched = bytearray(table["data"])
+                struct.pack_into("<I", patched, 0, components[0]["size"])
+                table.update(data=memoryview(patched), changed=True)
+            sizes = {c["name"]: c["size"] for c in components}
+            header = _build_header(image, sizes, cmdline, components)
+            body_end = offset
+            keep_tail = image.tail.nbytes > 0 and body_end <= image.body_end
+            if image.tail.nbytes and not keep_tail and log:
+                log("Patched image grew past the original body; the AVB footer was dropped")
+
+            shutil.copyfile(path, out_path)
+            written, total = 0, sum(c["size"] for c in components if c["changed"])
+            with open(out_path, "r+b") as out:
+                out.write(header)
+                written += len(header)
+                for c in components:
+                    if not c["changed"]: continue
+                    out.seek(c["offset"])
+                    for start in range(0, c["size"], WRITE_CHUNK):
+                        out.write(c["data"][start:start + WRITE_CHUNK])
+                    padding = align(c["size"], image.page_size) - c["size"]
+                    out.write(bytes(padding))
+                    written += c["size"] + padding
+                    if progress: progress(written, total + len(header))
+                if keep_tail:
+                    # Clear what is left of the old body; the tail stays at its old offset
+                    out.seek(body_end)
+                    out.write(bytes(image.body_end - body_end))
+                    written += image.body_end - body_end
+                else:
+                    out.truncate(body_end)
+            for c in components: c["data"].release()
+            partition = image.suggested_partition()
+        finally:
+            if isinstance(new_map, mmap.mmap):
+                try: new_map.close()
+                except BufferError: pass
+            if new_file: new_file.close()
+    size = os.path.getsize(out_path)
+    if log: log(f"Repacked {os.path.basename(out_path)}: wrote {written / 1024:.0f} KB of {size / 1024:.0f} KB")
+    return {"path": out_path, "written": written, "size": size, "partition": partition}
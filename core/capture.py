@@ -0,0 +1,160 @@
+import os
+import time
+import socket
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PySide6.QtGui import QImage
+from core.adb_transport import AdbConnection
+
+# frameworks/base/cmds/screencap: width, height, PixelFormat (+ dataspace since Android 9), then pixels
+RAW_HEADER = struct.Struct("<III")
+PIXEL_FORMATS = {1: (4, QImage.Format_RGBX8888), 2: (4, QImage.Format_RGBX8888), 3: (3, QImage.Format_RGB888),
+                 4: (2, QImage.Format_RGB16), 5: (4, QImage.Format_RGB32)}
+# Qt writer name and quality (-1 = the writer's default)
+IMAGE_FORMATS = {"png": ("PNG", -1), "webp": ("WEBP", 90)}
+RECV_CHUNK = 256 * 1024
+SCREENRECORD_LIMIT_S = 180
+
+class CaptureError(Exception):
+    pass
+
+def safe_name(serial):
+    return "".join(c if c.isalnum() else "_" for c in serial)
+
+def parse_raw_screencap(data):
+    """ ``(width, height, bytes per pixel, Qt format, pixel offset)`` of a raw ``screencap`` dump """
+    if len(data) < RAW_HEADER.size: raise CaptureError("Empty screencap output (is the screen secure or off?)")
+    width, height, pixel_format = RAW_HEADER.unpack_from(data)
+    if pixel_format not in PIXEL_FORMATS: raise CaptureError(f"Unsupported pixel format {pixel_format}")
+    bpp, qt_format = PIXEL_FORMATS[pixel_format]
+    size = width * height * bpp
+    for offset in (16, 12):
+        if len(data) - offset == size: return width, height, bpp, qt_format, offset
+    if len(data) >= 16 + size: return width, height, bpp, qt_format, 16
+    raise CaptureError(f"Truncated screencap ({len(data)} bytes for {width}x{height})")
+
+def grab_raw(serial, open_stream=AdbConnection.open):
+    """ One raw frame over ``exec:`` (what `adb exec-out screencap` does); the device skips its PNG encode """
+    with open_stream(serial, "exec:screencap") as conn:
+        return conn.recv_all()
+
+def encode_frame(data, path, image_format="png"):
+    """ Process-pool task: writes a raw screencap dump as PNG or WebP and returns the file size """
+    width, height, bpp, qt_format, offset = parse_raw_screencap(data)
+    writer, quality = IMAGE_FORMATS[image_format]
+    image = QImage(data[offset:offset + width * height * bpp], width, height, width * bpp, qt_format)
+    if not image.save(path, writer, quality): raise CaptureError(f"Could not write {os.path.basename(path)}")
+    return os.path.getsize(path)
+
+def capture_screens(serials, out_dir, count=1, interval=0.0, image_format="png", workers=None,
+                    cancel_event=None, grab=grab_raw, log=None, progress=None, report=None):
+    """ Timed burst of ``count`` frames per device, all devices at once.
+
+    One thread per device pulls raw frames on a fixed schedule
+    (``interval`` seconds apart); encoding runs in a process pool so it
+    never delays the next grab. At most two frames per worker wait to be
+    encoded, which bounds memory on long bursts. Reports
+    ``{"serial", "index", "path", "size"}`` per saved frame (``error``
+    instead of ``path`` when a grab fails) and returns the saved paths.
+    """
+    if image_format not in IMAGE_FORMATS: raise ValueError(f"Unknown image format {image_format}")
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 2
+    pending = threading.BoundedSemaphore(workers * 2)
+    lock = threading.Lock()
+    saved, total = [], count * len(serials)
+    done = [0]
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+
+    def finished(item):
+        with lock:
+            done[0] += 1
+            if item.get("path"): saved.append(item["path"])
+            if report: report(item)
+            if progress: progress(done[0], total)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def on_encoded(fut, item):
+            pending.release()
+            try:
+                item["size"] = fut.result()
+            except Exception as e:
+                item.update(path=None, error=str(e))
+            finished(item)
+
+        def burst(serial):
+            start = time.monotonic()
+            for index in range(count):
+                delay = start + index * interval - time.monotonic()
+                if delay > 0:
+                    if cancel_event is not None: cancel_event.wait(delay)
+                    else: time.sleep(delay)
+                if cancel_event is not None and cancel_event.is_set(): return
+                item = {"serial": serial, "index": index, "path": None, "size": 0}
+                try:
+                    data = grab(serial)
+                except Exception as e:
+                    item["error"] = str(e)
+                    if log: log(f"{serial}: screenshot {index + 1} failed: {str(e)}")
+                    finished(item)
+                    continue
+                item["path"] = os.path.join(out_dir, f"{safe_name(serial)}_{stamp}_{index + 1:03d}.{image_format}")
+                pending.acquire()
+                pool.submit(encode_frame, data, item["path"], image_format).add_done_callback(lambda fut, item=item: on_encoded(fut, item))
+
+        with ThreadPoolExecutor(max_workers=max(1, len(serials))) as grabbers:
+            list(grabbers.map(burst, serials))
+    if log: log(f"Saved {len(saved)} screenshot(s) to {out_dir}")
+    return sorted(saved)
+
+def record_screen(serial, out_path, duration=SCREENRECORD_LIMIT_S, bit_rate=None, size=None, cancel_event=None,
+                  open_stream=AdbConnection.open, log=None, progress=None, report=None):
+    """ Streams ``screenrecord``'s raw H.264 straight into ``out_path``; nothing is written on the device.
+
+    Stops after ``duration`` seconds (the device enforces the same
+    limit) or when ``cancel_event`` is set, which closes the stream and
+    ends screenrecord. Returns ``{"serial", "path", "bytes", "seconds"}``.
+    """
+    command = f"screenrecord --output-format=h264 --time-limit {int(duration)}"
+    if bit_rate: command += f" --bit-rate {int(bit_rate)}"
+    if size: command += f" --size {size}"
+    written, start = 0, time.monotonic()
+    with open_stream(serial, f"exec:{command} -") as conn, open(out_path, "wb") as out:
+        # Short timeouts so a cancel is noticed even while the screen is static and nothing is sent
+        conn.settimeout(0.5)
+        while cancel_event is None or not cancel_event.is_set():
+            try:
+                chunk = conn.recv(RECV_CHUNK)
+            except socket.timeout:
+                chunk = None
+            if chunk == b"": break
+            if chunk:
+                out.write(chunk)
+                written += len(chunk)
+            elapsed = time.monotonic() - start
+            if progress: progress(int(min(elapsed, duration)), int(duration))
+            if elapsed > duration + 5: break
+    result = {"serial": serial, "path": out_path, "bytes": written, "seconds": round(time.monotonic() - start, 1)}
+    if written == 0:
+        os.remove(out_path)
+        raise CaptureError(f"{serial}: screenrecord produced no data (unsupported on this device?)")
+    if log: log(f"{serial}: recorded {written / 1024 ** 2:.1f} MiB in {result['seconds']} s -> {out_path}")
+    if report: report(result)
+    return result
+
+def record_screens(serials, out_dir, duration=SCREENRECORD_LIMIT_S, bit_rate=None, cancel_event=None,
+                   record=record_screen, log=None, progress=None, report=None):
+    """ ``record_screen`` on every device in parallel; a failing device does not stop the others """
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    def one(serial):
+        path = os.path.join(out_dir, f"{safe_name(serial)}_{stamp}.h264")
+        try:
+            return record(serial, path, duration, bit_rate, cancel_event=cancel_event, log=log, report=report,
+                          progress=progress if len(serials) == 1 else None)
+        except Exception as e:
+            if log: log(f"Error: {serial}: {str(e)}")
+            return None
+    with ThreadPoolExecutor(max_workers=max(1, len(serials))) as pool:
+        return [r for r in pool.map(one, serials) if r]
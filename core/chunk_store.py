@@ -0,0 +1,242 @@
+import os
+import zlib
+import struct
+import hashlib
+import threading
+
+# Content-defined chunking: a cut is made right after an anchor byte pair
+# found between MIN_CHUNK and MAX_CHUNK bytes into the chunk. Anchors are
+# located with bytes.find (C speed), and because cut points depend only on
+# the content, an insertion shifts at most the chunks around it.
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+ANCHOR = b"\x9e\x37"
+
+PACK_LIMIT = 1024 * 1024 * 1024
+INDEX_NAME = "index.bin"
+# digest, pack number, offset, stored length, raw length, flags
+INDEX_RECORD = struct.Struct("<32sIQIIB")
+FLAG_ZLIB = 1
+
+# One instance per store root, shared by every backup writing into it
+_stores = {}
+_stores_lock = threading.Lock()
+
+class ChunkStoreError(Exception):
+    pass
+
+def find_cut(buf, start=0):
+    """ Returns the end offset of the chunk starting at ``start``, or None if ``buf`` needs more data """
+    lo, hi = start + MIN_CHUNK, start + MAX_CHUNK
+    if len(buf) < hi: return None
+    i = buf.find(ANCHOR, lo, hi)
+    return i + len(ANCHOR) if i >= 0 else hi
+
+def iter_chunks(buf, final=False):
+    """ Splits ``buf`` into content-defined chunks; yields ``(start, end)`` and, unless ``final``, keeps the undecided tail """
+    start = 0
+    while True:
+        end = find_cut(buf, start)
+        if end is None: break
+        yield start, end
+        start = end
+    if final:
+        while start < len(buf):
+            i = buf.find(ANCHOR, start + MIN_CHUNK)
+            end = min(i + len(ANCHOR) if i >= 0 else len(buf), start + MAX_CHUNK)
+            yield start, end
+            start = end
+
+class ChunkStore:
+    """ Append-only, content-addressed store of image chunks.
+
+    Chunks are zlib-compressed into pack files under ``packs/`` and located
+    through ``index.bin``, a log of fixed-size records that is loaded into
+    a dict on open. Each unique chunk is written once no matter how many
+    devices or backup runs reference it. Safe to share between threads;
+    open it with ``open_store`` so that concurrent backups into the same
+    folder share one instance (and one index) instead of racing each other.
+    """
+    def __init__(self, root, level=1):
+        self.root = root
+        self.key = None
+        self.users = 1
+        self.level = level
+        self.pack_dir = os.path.join(root, "packs")
+        os.makedirs(self.pack_dir, exist_ok=True)
+        self.index = {}
+        self.lock = threading.Lock()
+        self.readers = {}
+        self.pack_file = None
+        self.index_file = None
+        self._load_index()
+
+    def _pack_path(self, number):
+        return os.path.join(self.pack_dir, f"pack-{number:05d}.dat")
+
+    def _load_index(self):
+        path = os.path.join(self.root, INDEX_NAME)
+        self.pack_number = 0
+        pack_sizes = {}
+        valid = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            for offset in range(0, len(data) - INDEX_RECORD.size + 1, INDEX_RECORD.size):
+                digest, pack, pos, stored, raw, flags = INDEX_RECORD.unpack_from(data, offset)
+                if pack not in pack_sizes:
+                    pack_path = self._pack_path(pack)
+                    pack_sizes[pack] = os.path.getsize(pack_path) if os.path.exists(pack_path) else 0
+                # A record whose chunk never reached the pack (crash mid-write) ends the usable log
+                if pos + stored > pack_sizes[pack]: break
+                self.index[digest] = (pack, pos, stored, raw, flags)
+                self.pack_number = max(self.pack_number, pack)
+                valid = offset + INDEX_RECORD.size
+            if valid != len(data):
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+
+    def __contains__(self, digest):
+        return digest in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def put(self, data):
+        """ Stores ``data`` unless already present; returns ``(digest, newly_stored_bytes)`` """
+        digest = hashlib.sha256(data).digest()
+        if digest in self.index: return digest, 0
+        packed = zlib.compress(data, self.level)
+        flags = FLAG_ZLIB
+        if len(packed) >= len(data):
+            packed, flags = bytes(data), 0
+        with self.lock:
+            # Another thread may have stored the same chunk while we compressed
+            if digest in self.index: return digest, 0
+            # The file size, not tell(): an "ab" handle's position is only updated by its own writes
+            if self.pack_file is None or os.fstat(self.pack_file.fileno()).st_size + len(packed) > PACK_LIMIT:
+                self._roll_pack()
+            pos = os.fstat(self.pack_file.fileno()).st_size
+            self.pack_file.write(packed)
+            self.pack_file.flush()
+            self.index_file.write(INDEX_RECORD.pack(digest, self.pack_number, pos, len(packed), len(data), flags))
+            self.index_file.flush()
+            self.index[digest] = (self.pack_number, pos, len(packed), len(data), flags)
+        return digest, len(packed)
+
+    def _roll_pack(self):
+        if self.pack_file is not None:
+            self.pack_file.close()
+            self.pack_number += 1
+        elif os.path.exists(self._pack_path(self.pack_number)) and os.path.getsize(self._pack_path(self.pack_number)) >= PACK_LIMIT:
+            self.pack_number += 1
+        self.pack_file = open(self._pack_path(self.pack_number), "ab")
+        if self.index_file is None:
+            self.index_file = open(os.path.join(self.root, INDEX_NAME), "ab")
+
+    def get(self, digest):
+        entry = self.index.get(digest)
+        if entry is None: raise ChunkStoreError(f"Chunk {digest.hex()} is missing from the store")
+        pack, pos, stored, raw, flags = entry
+        with self.lock:
+            if self.pack_file is not None: self.pack_file.flush()
+            f = self.readers.get(pack)
+            if f is None:
+                f = self.readers[pack] = open(self._pack_path(pack), "rb")
+            f.seek(pos)
+            packed = f.read(stored)
+        data = zlib.decompress(packed) if flags & FLAG_ZLIB else packed
+        if len(data) != raw: raise ChunkStoreError(f"Chunk {digest.hex()} is corrupt")
+        return data
+
+    def stats(self):
+        stored = sum(e[2] for e in self.index.values())
+        raw = sum(e[3] for e in self.index.values())
+        return {"chunks": len(self.index), "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self):
+        """ Releases one user; the files are closed when the last one is done """
+        with _stores_lock:
+            self.users -= 1
+            if self.users > 0: return
+            if _stores.get(self.key) is self: del _stores[self.key]
+        with self.lock:
+            for f in [self.pack_file, self.index_file, *self.readers.values()]:
+                if f is not None: f.close()
+            self.pack_file = self.index_file = None
+            self.readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_store(root, level=1):
+    """ The shared ``ChunkStore`` of ``root``; each call must be paired with a ``close`` """
+    key = os.path.realpath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is not None:
+            store.users += 1
+            return store
+        store = _stores[key] = ChunkStore(root, level)
+        store.key = key
+        return store
+
+class ChunkImageSink:
+    """ Splits a raw image stream into chunks in ``store`` and writes the chunk list as ``<name>.chunks``.
+
+    Same interface as the gzip sink of partition backups; the recipe is one
+    ``<sha256> <length>`` line per chunk, in image order.
+    """
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.recipe = open(path, "w")
+        self.buffer = bytearray()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.stored = 0
+        self.chunks = 0
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        self.buffer.extend(chunk)
+        self._emit(final=False)
+
+    def _emit(self, final):
+        consumed = 0
+        for start, end in iter_chunks(self.buffer, final):
+            digest, stored = self.store.put(bytes(self.buffer[start:end]))
+            self.recipe.write(f"{digest.hex()} {end - start}\n")
+            self.stored += stored
+            self.chunks += 1
+            consumed = end
+        del self.buffer[:consumed]
+
+    def close(self):
+        self._emit(final=True)
+        self.recipe.close()
+        return {"file": os.path.basename(self.path), "size": self.size, "sha256": self.sha256.hexdigest(),
+                "stored": self.stored, "chunks": self.chunks}
+
+    def abort(self):
+        # Chunks already in the store stay; they are valid and may be shared
+        self.recipe.close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+def read_recipe(path):
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 2: raise ChunkStoreError(f"Malformed recipe line in {os.path.basename(path)}: {line.strip()!r}")
+            yield bytes.fromhex(parts[0]), int(parts[1])
+
+def iter_image(store, recipe_path):
+    """ Reassembles an image from ``store`` as a stream of chunks """
+    for digest, length in read_recipe(recipe_path):
+        data = store.get(digest)
+        if len(data) != length: raise ChunkStoreError(f"Chunk {digest.hex()} has the wrong length")
+        yield data
@@ -1,7 +1,19 @@
+import itertools
 import subprocess
 from PySide6.QtCore import QThread, Signal
 
-class CommandThread(QThread):
+_job_ids = itertools.count(1)
+
+class JobThread(QThread):
+    """ A worker whose output is tagged with the device it works on and a job label """
+    serial = None
+    job = None
+
+    def tag(self, name, serial=None):
+        self.job, self.serial = f"{name}#{next(_job_ids)}", serial
+        return self
+
+class CommandThread(JobThread):
     output_signal = Signal(str)
     finished_signal = Signal(int)
 
@@ -25,3 +37,32 @@ class CommandThread(QThread):
         except Exception as e:
             self.output_signal.emit(f"Error: {str(e)}")
             self.finished_signal.emit(-1)
+
+class TaskThread(JobThread):
+    """ Runs a plain Python callable off the GUI thread.
+
+    The callable receives ``log``, ``progress`` and ``report`` keyword
+    callbacks which are forwarded as signals, so core functions stay Qt-free.
+    ``report`` carries per-item results (e.g. one row of a results table).
+    """
+    output_signal = Signal(str)
+    progress_signal = Signal(int, int)
+    item_signal = Signal(object)
+    result_signal = Signal(object)
+    finished_signal = Signal(int)
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            result = self.func(*self.args, log=self.output_signal.emit, progress=self.progress_signal.emit,
+                               report=self.item_signal.emit, **self.kwargs)
+            self.result_signal.emit(result)
+            self.finished_signal.emit(0)
+        except Exception as e:
+            self.output_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit(-1)
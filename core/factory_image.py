@@ -0,0 +1,111 @@
+import os
+import shutil
+import zipfile
+
+# Queue entries that live inside (possibly nested) zips are stored as
+# "outer.zip!/inner.zip!/boot.img" and only extracted right before flashing.
+REF_SEP = "!/"
+COPY_CHUNK = 4 * 1024 * 1024
+
+# flash-all.sh flashes these before the main images; super_empty.img is a
+# layout template for `fastboot update`, not a partition image
+FIRST_PREFIXES = ("bootloader", "radio")
+SKIP_IMAGES = {"super_empty.img"}
+
+def make_ref(path, *members):
+    return REF_SEP.join([path, *members])
+
+def is_ref(path):
+    return REF_SEP in path
+
+def parse_ref(ref):
+    parts = ref.split(REF_SEP)
+    return parts[0], parts[1:]
+
+def classify_zip(path):
+    """ Returns "ota" for payload.bin OTAs, "factory" for factory/fastboot packages, else None """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            names = zf.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return None
+    base_names = [os.path.basename(n).lower() for n in names]
+    if "payload.bin" in base_names: return "ota"
+    if any(n.endswith(".img") or (n.startswith("image-") and n.endswith(".zip")) for n in base_names):
+        return "factory"
+    return None
+
+def parse_android_info(text):
+    info = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("require ") and "=" in line:
+            key, val = line[len("require "):].split("=", 1)
+            info[key.strip()] = val.strip()
+    return info
+
+def partition_for(member):
+    name = os.path.basename(member).lower()
+    for prefix in FIRST_PREFIXES:
+        if name.startswith(prefix + "-") or name.startswith(prefix + "_"): return prefix
+    return os.path.splitext(name)[0]
+
+def _scan(zf, members, images, info):
+    for entry in zf.infolist():
+        if entry.is_dir(): continue
+        name = os.path.basename(entry.filename).lower()
+        if name == "android-info.txt":
+            info.update(parse_android_info(zf.read(entry).decode("utf-8", errors="replace")))
+        elif name.endswith(".img") and name not in SKIP_IMAGES:
+            images.append({"partition": partition_for(entry.filename), "members": members + [entry.filename], "size": entry.file_size})
+        elif name.endswith(".zip") and not members:
+            # Only the central directory of the nested zip is read here
+            with zf.open(entry) as inner_file, zipfile.ZipFile(inner_file) as inner:
+                _scan(inner, members + [entry.filename], images, info)
+
+def scan_factory_zip(path):
+    """ Builds a flash plan from the central directories of a factory zip without extracting it.
+
+    Returns ``{"info": android-info requirements, "images": [{"partition", "ref", "size"}]}``
+    with bootloader and radio images first, as flash-all.sh does.
+    """
+    images, info = [], {}
+    with zipfile.ZipFile(path) as zf:
+        _scan(zf, [], images, info)
+    images.sort(key=lambda img: (FIRST_PREFIXES.index(img["partition"]) if img["partition"] in FIRST_PREFIXES else len(FIRST_PREFIXES)))
+    for img in images:
+        img["ref"] = make_ref(path, *img.pop("members"))
+    return {"info": info, "images": images}
+
+def extract_ref(ref, cache_dir, log=None, progress=None, report=None):
+    """ Streams a single zip-contained image to ``cache_dir`` and returns its path """
+    path, members = parse_ref(ref)
+    os.makedirs(cache_dir, exist_ok=True)
+    out_path = os.path.join(cache_dir, os.path.basename(members[-1]))
+    with zipfile.ZipFile(path) as zf:
+        if len(members) == 1:
+            _copy_member(zf, members[0], out_path, progress)
+        else:
+            with zf.open(members[0]) as inner_file, zipfile.ZipFile(inner_file) as inner:
+                _copy_member(inner, members[1], out_path, progress)
+    if log: log(f"Staged {os.path.basename(out_path)} from {os.path.basename(path)}")
+    return out_path
+
+def _copy_member(zf, member, out_path, progress=None):
+    total = zf.getinfo(member).file_size
+    done = 0
+    with zf.open(member) as src, open(out_path, "wb") as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK)
+            if not chunk: break
+            dst.write(chunk)
+            done += len(chunk)
+            if progress: progress(done // 1024, max(total // 1024, 1))
+
+def remove_staged(path, cache_dir):
+    """ Deletes a staged image, refusing to touch anything outside ``cache_dir`` """
+    if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(cache_dir) and os.path.exists(path):
+        os.remove(path)
+
+def clear_cache(cache_dir):
+    if os.path.isdir(cache_dir): shutil.rmtree(cache_dir, ignore_errors=True)
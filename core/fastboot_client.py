@@ -0,0 +1,324 @@
+import os
+import mmap
+import socket
+import struct
+
+FASTBOOT_TCP_PORT = 5554
+TCP_HANDSHAKE = b"FB01"
+SEND_CHUNK = 1 << 20
+COMMAND_TIMEOUT = 30
+# Flashing or erasing a large partition keeps the device busy long after the data arrived
+WRITE_TIMEOUT = 600
+
+SPARSE_MAGIC = 0xED26FF3A
+SPARSE_HEADER = struct.Struct("<IHHHHIIII")
+CHUNK_HEADER = struct.Struct("<HHII")
+CHUNK_RAW, CHUNK_FILL, CHUNK_DONT_CARE, CHUNK_CRC32 = 0xCAC1, 0xCAC2, 0xCAC3, 0xCAC4
+BLOCK_SIZE = 4096
+
+class FastbootError(Exception):
+    pass
+
+class FastbootResponse:
+    """ Final reply to one command, with every INFO/TEXT line the device sent before it """
+    def __init__(self, status, message, info=None, data_size=None):
+        self.status = status
+        self.message = message
+        self.info = info or []
+        self.data_size = data_size
+
+    @property
+    def ok(self):
+        return self.status == "OKAY"
+
+    def __repr__(self):
+        return f"FastbootResponse({self.status}, {self.message!r}, info={len(self.info)})"
+
+class FastbootTransport:
+    """ Moves whole fastboot packets; the protocol code only needs these three calls """
+    def send(self, data):
+        raise NotImplementedError
+
+    def recv(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+class TcpTransport(FastbootTransport):
+    """ fastboot over TCP: a ``FB01`` handshake, then every packet carries an 8-byte big-endian length """
+    def __init__(self, host, port=FASTBOOT_TCP_PORT, timeout=COMMAND_TIMEOUT, sock=None):
+        self.sock = sock or socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            self.sock.sendall(TCP_HANDSHAKE)
+            reply = self._recv_exact(4)
+        except Exception:
+            self.close()
+            raise
+        if reply[:2] != b"FB" or not reply[2:].isdigit():
+            self.close()
+            raise FastbootError(f"Not a fastboot endpoint (handshake {reply!r})")
+
+    def _recv_exact(self, size):
+        buf = bytearray()
+        while len(buf) < size:
+            try:
+                chunk = self.sock.recv(size - len(buf))
+            except (socket.timeout, TimeoutError):
+                raise FastbootError("Timed out waiting for the device")
+            if not chunk: raise FastbootError("Connection closed by device")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def send(self, data):
+        self.sock.sendall(struct.pack(">Q", len(data)))
+        self.sock.sendall(data)
+
+    def recv(self):
+        length, = struct.unpack(">Q", self._recv_exact(8))
+        return self._recv_exact(length)
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        try: self.sock.close()
+        except OSError: pass
+
+def is_network_serial(serial):
+    return bool(serial) and serial.startswith("tcp:")
+
+def open_transport(serial, timeout=COMMAND_TIMEOUT):
+    """ Transport for a fastboot serial; ``tcp:host[:port]`` is the only kind handled in-process """
+    if not is_network_serial(serial):
+        raise FastbootError(f"No in-process transport for {serial} (USB devices go through the fastboot binary)")
+    host, _, port = serial[4:].rpartition(":") if serial.count(":") > 1 else (serial[4:], "", "")
+    return TcpTransport(host, int(port) if port else FASTBOOT_TCP_PORT, timeout=timeout)
+
+def parse_variables(lines):
+    """ ``{name: value}`` from ``getvar:all`` INFO lines or the fastboot binary's ``(bootloader)`` output.
+
+    Per-partition variables keep their partition in the key, e.g.
+    ``partition-size:boot_a``; the value is whatever follows the last colon.
+    """
+    variables = {}
+    for line in lines:
+        line = line.strip()
+        if line.startswith("(bootloader)"): line = line[len("(bootloader)"):].strip()
+        key, sep, value = line.rpartition(":")
+        if not sep or not key or " " in key.strip(): continue
+        variables[key.strip()] = value.strip()
+    return variables
+
+def parse_size(value):
+    return int(value, 0) if value.lower().startswith("0x") else int(value)
+
+class _Chunk:
+    __slots__ = ("kind", "start", "blocks", "data", "pad")
+
+    def __init__(self, kind, start, blocks, data=None, pad=0):
+        self.kind = kind
+        self.start = start
+        self.blocks = blocks
+        self.data = data
+        self.pad = pad
+
+    @property
+    def payload_size(self):
+        if self.kind == CHUNK_RAW: return self.blocks * BLOCK_SIZE
+        return 4 if self.kind == CHUNK_FILL else 0
+
+def _image_chunks(view):
+    """ ``(block_size, total_blocks, chunks)`` for a raw or Android sparse image, referencing ``view`` in place """
+    if len(view) >= SPARSE_HEADER.size and struct.unpack_from("<I", view)[0] == SPARSE_MAGIC:
+        magic, major, minor, hdr_size, chunk_hdr_size, blk_size, total_blocks, total_chunks, _ = SPARSE_HEADER.unpack_from(view)
+        if major != 1: raise FastbootError(f"Unsupported sparse image version {major}.{minor}")
+        if blk_size != BLOCK_SIZE: raise FastbootError(f"Unsupported sparse block size {blk_size}")
+        chunks, offset, block = [], hdr_size, 0
+        for _ in range(total_chunks):
+            kind, _, blocks, total_size = CHUNK_HEADER.unpack_from(view, offset)
+            body = offset + chunk_hdr_size
+            if kind == CHUNK_RAW:
+                chunks.append(_Chunk(kind, block, blocks, view[body:body + blocks * BLOCK_SIZE]))
+            elif kind == CHUNK_FILL:
+                chunks.append(_Chunk(kind, block, blocks, view[body:body + 4]))
+            elif kind not in (CHUNK_DONT_CARE, CHUNK_CRC32):
+                raise FastbootError(f"Corrupt sparse image (chunk type {kind:#x})")
+            offset += total_size
+            block += blocks
+        return blk_size, total_blocks, chunks
+    total_blocks = -(-len(view) // BLOCK_SIZE)
+    return BLOCK_SIZE, total_blocks, [_Chunk(CHUNK_RAW, 0, total_blocks, view, total_blocks * BLOCK_SIZE - len(view))]
+
+def split_sparse(view, limit):
+    """ Yields ``(size, pieces)`` downloads of at most ``limit`` bytes that together write the whole image.
+
+    Each download is a sparse image covering every block of the partition,
+    with the blocks it does not carry marked don't-care, which is how the
+    fastboot binary resparses oversized images. Pieces are memoryviews
+    into ``view`` plus small headers, so nothing large is copied.
+    """
+    _, total_blocks, chunks = _image_chunks(view)
+    # Room for the file header and a don't-care chunk before and after the group
+    budget = limit - SPARSE_HEADER.size - 2 * CHUNK_HEADER.size
+    if budget < 2 * CHUNK_HEADER.size + BLOCK_SIZE: raise FastbootError(f"max-download-size {limit} is too small")
+
+    def emit(group):
+        entries, block = [], 0
+        for chunk in group:
+            if chunk.start > block: entries.append(_Chunk(CHUNK_DONT_CARE, block, chunk.start - block))
+            entries.append(chunk)
+            block = chunk.start + chunk.blocks
+        if block < total_blocks: entries.append(_Chunk(CHUNK_DONT_CARE, block, total_blocks - block))
+        pieces = [SPARSE_HEADER.pack(SPARSE_MAGIC, 1, 0, SPARSE_HEADER.size, CHUNK_HEADER.size, BLOCK_SIZE,
+                                     total_blocks, len(entries), 0)]
+        for entry in entries:
+            pieces.append(CHUNK_HEADER.pack(entry.kind, 0, entry.blocks, CHUNK_HEADER.size + entry.payload_size))
+            if entry.data is not None: pieces.append(entry.data)
+            if entry.pad: pieces.append(bytes(entry.pad))
+        return sum(len(piece) for piece in pieces), pieces
+
+    group, used = [], 0
+    for chunk in chunks:
+        while True:
+            cost = 2 * CHUNK_HEADER.size + chunk.payload_size
+            if used + cost <= budget:
+                group.append(chunk)
+                used += cost
+                break
+            if chunk.kind == CHUNK_RAW:
+                fit = (budget - used - 2 * CHUNK_HEADER.size) // BLOCK_SIZE
+                if fit > 0:
+                    # Split a raw run at a block boundary; only the tail can carry padding
+                    cut = fit * BLOCK_SIZE
+                    group.append(_Chunk(CHUNK_RAW, chunk.start, fit, chunk.data[:cut]))
+                    chunk = _Chunk(CHUNK_RAW, chunk.start + fit, chunk.blocks - fit, chunk.data[cut:], chunk.pad)
+            if group: yield emit(group)
+            group, used = [], 0
+    if group or not chunks: yield emit(group)
+
+class FastbootClient:
+    """ fastboot protocol over any ``FastbootTransport``.
+
+    Every command returns a ``FastbootResponse``; a FAIL reply raises
+    ``FastbootError`` with the device's message. INFO lines are passed to
+    ``log`` as they arrive and kept on the response.
+    """
+    def __init__(self, transport):
+        self.transport = transport
+        self.max_download = None
+
+    @classmethod
+    def open(cls, serial, timeout=COMMAND_TIMEOUT):
+        return cls(open_transport(serial, timeout))
+
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_response(self, log=None):
+        info = []
+        while True:
+            packet = self.transport.recv()
+            status, message = packet[:4].decode("ascii", errors="replace"), packet[4:].decode("utf-8", errors="replace")
+            if status in ("INFO", "TEXT"):
+                info.append(message)
+                if log: log(f"(bootloader) {message}")
+            elif status == "OKAY":
+                return FastbootResponse(status, message, info)
+            elif status == "DATA":
+                return FastbootResponse(status, message, info, data_size=int(message, 16))
+            elif status == "FAIL":
+                raise FastbootError(message or "Command failed")
+            else:
+                raise FastbootError(f"Unexpected fastboot reply {packet[:16]!r}")
+
+    def command(self, command, timeout=COMMAND_TIMEOUT, log=None):
+        self.transport.settimeout(timeout)
+        self.transport.send(command.encode("utf-8"))
+        return self._read_response(log)
+
+    def getvar(self, name):
+        return self.command(f"getvar:{name}").message
+
+    def getvar_all(self, log=None):
+        return parse_variables(self.command("getvar:all", log=log).info)
+
+    def max_download_size(self):
+        if self.max_download is None:
+            try:
+                self.max_download = parse_size(self.getvar("max-download-size"))
+            except (FastbootError, ValueError):
+                # Same fallback as the fastboot binary for bootloaders that do not report it
+                self.max_download = 512 << 20
+        return self.max_download
+
+    def download(self, pieces, size, progress=None, sent_before=0, total=None):
+        """ Sends one download of ``size`` bytes made of ``pieces`` (bytes or memoryviews); progress is in KiB """
+        response = self.command(f"download:{size:08x}")
+        if response.status != "DATA": raise FastbootError(f"Device did not accept the download ({response.status})")
+        if response.data_size != size: raise FastbootError(f"Device wants {response.data_size} bytes, not {size}")
+        sent = 0
+        for piece in pieces:
+            view = memoryview(piece)
+            for start in range(0, len(view), SEND_CHUNK):
+                block = view[start:start + SEND_CHUNK]
+                self.transport.send(block)
+                sent += len(block)
+                # KiB: byte counts of multi-GiB images overflow the int the progress signal carries
+                if progress: progress((sent_before + sent) // 1024, max((total or size) // 1024, 1))
+        return self._read_response()
+
+    def flash(self, partition, path, log=None, progress=None):
+        """ Downloads ``path`` (raw or sparse) straight from an mmap and flashes it, resparsing when it is too large """
+        limit = self.max_download_size()
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0: raise FastbootError(f"{os.path.basename(path)} is empty")
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return self._flash_view(partition, memoryview(mm), limit, log, progress)
+        finally:
+            try: mm.close()
+            # A traceback can still hold views into the map; it is unmapped once they are gone
+            except BufferError: pass
+
+    def _flash_view(self, partition, view, limit, log, progress):
+        if len(view) <= limit:
+            downloads = [(len(view), [view])]
+        else:
+            downloads = list(split_sparse(view, limit))
+            if log: log(f"{partition}: sending {len(view)} bytes as {len(downloads)} sparse download(s) of up to {limit} bytes")
+        total = sum(length for length, _ in downloads)
+        sent = 0
+        for n, (length, pieces) in enumerate(downloads, 1):
+            self.download(pieces, length, progress, sent, total)
+            sent += length
+            response = self.command(f"flash:{partition}", timeout=WRITE_TIMEOUT, log=log)
+            if log and len(downloads) > 1: log(f"{partition}: part {n}/{len(downloads)} written")
+        return response
+
+    def erase(self, partition, log=None):
+        return self.command(f"erase:{partition}", timeout=WRITE_TIMEOUT, log=log)
+
+    def reboot(self, target=None, log=None):
+        """ ``target`` is None (system), ``"bootloader"``, ``"fastboot"`` (fastbootd) or ``"recovery"`` """
+        return self.command(f"reboot-{target}" if target else "reboot", log=log)
+
+def flash_partition(serial, partition, path, log=None, progress=None, report=None):
+    with FastbootClient.open(serial) as client:
+        response = client.flash(partition, path, log=log, progress=progress)
+    if log: log(f"Flashed {partition} ({response.message or 'OKAY'})")
+    return response
+
+def getvar_all(serial, log=None, progress=None, report=None):
+    with FastbootClient.open(serial) as client:
+        return client.getvar_all()
@@ -0,0 +1,115 @@
+import time
+import subprocess
+from core.adb_fastboot import get_devices, get_fastboot_vars
+from core.fastboot_client import FastbootClient, is_network_serial
+from core.factory_image import FIRST_PREFIXES
+
+BOOTLOADER = "bootloader"
+FASTBOOTD = "fastbootd"
+# A bootloader <-> fastbootd switch typically costs 20-60 s; used until real switches have been timed
+SWITCH_ESTIMATE_S = 40.0
+SWITCH_TIMEOUT_S = 180
+# flash-all.sh sleeps this long after each reboot-bootloader before talking to the device again
+REBOOT_SETTLE_S = 5
+
+def current_mode(variables):
+    return FASTBOOTD if variables.get("is-userspace") == "yes" else BOOTLOADER
+
+def required_mode(partition, variables):
+    """ fastbootd for logical partitions inside super, the bootloader for everything else (or unknown) """
+    slot = variables.get("current-slot", "").lstrip("_")
+    for name in (partition, f"{partition}_{slot}" if slot else None):
+        if name and variables.get(f"is-logical:{name}") == "yes": return FASTBOOTD
+    return BOOTLOADER
+
+def count_switches(modes, start):
+    switches, mode = 0, start
+    for needed in modes:
+        if needed != mode:
+            switches += 1
+            mode = needed
+    return switches
+
+def firmware_first(steps):
+    """ Bootloader and radio images first, then a reboot into the new bootloader before the rest (as flash-all.sh does) """
+    firmware = [s for s in steps if s["partition"] in FIRST_PREFIXES]
+    if not firmware or len(firmware) == len(steps): return steps
+    return firmware + [{"action": "switch", "mode": BOOTLOADER, "reboot": True}] + [s for s in steps if s["partition"] not in FIRST_PREFIXES]
+
+def build_plan(rows, variables):
+    """ Orders ``rows`` (``(row, partition, path)``) into the fewest mode switches.
+
+    Work for the mode the device is already in runs first, then one
+    switch and the rest; the table order is kept within each group.
+    Without device variables nothing is known, so the table order is
+    kept and no switches are planned. Either way new bootloader/radio
+    firmware is followed by a reboot (``"reboot": True``) before anything
+    else is flashed in the bootloader; those reboots are not counted as
+    switches.
+    """
+    if not variables:
+        steps = firmware_first([{"action": "flash", "row": row, "partition": p, "path": f, "mode": None} for row, p, f in rows])
+        return {"steps": steps, "switches": 0, "naive_switches": 0, "start": None}
+    start = current_mode(variables)
+    tagged = [(row, p, f, required_mode(p, variables)) for row, p, f in rows]
+    naive = count_switches([mode for *_, mode in tagged], start)
+    order = [start] + [mode for mode in (BOOTLOADER, FASTBOOTD) if mode != start]
+    steps, mode = [], start
+    for group_mode in order:
+        group = [t for t in tagged if t[3] == group_mode]
+        if not group: continue
+        if group_mode != mode:
+            steps.append({"action": "switch", "mode": group_mode})
+            mode = group_mode
+        group_steps = [{"action": "flash", "row": row, "partition": p, "path": f, "mode": m} for row, p, f, m in group]
+        steps += firmware_first(group_steps) if group_mode == BOOTLOADER else group_steps
+    switches = sum(1 for step in steps if step["action"] == "switch" and not step.get("reboot"))
+    return {"steps": steps, "switches": switches, "naive_switches": naive, "start": start}
+
+def describe_step(step):
+    if step["action"] == "switch":
+        target = "fastboot" if step["mode"] == FASTBOOTD else "bootloader"
+        if step.get("reboot"): return [f"fastboot reboot {target}", "(wait for the new bootloader)"]
+        return [f"fastboot reboot {target}", f"(wait for {step['mode']})"]
+    return [f"fastboot flash {step['partition']} \"{step['path']}\"" + (f"  [{step['mode']}]" if step["mode"] else "")]
+
+def savings(plan, switch_durations=()):
+    """ ``(estimated_s, actual_s)`` saved against flashing in table order; actual uses measured switch times """
+    avoided = plan["naive_switches"] - plan["switches"]
+    actual = avoided * (sum(switch_durations) / len(switch_durations)) if switch_durations else None
+    return avoided * SWITCH_ESTIMATE_S, actual
+
+def reboot_to(serial, mode):
+    target = "fastboot" if mode == FASTBOOTD else "bootloader"
+    if is_network_serial(serial):
+        with FastbootClient.open(serial) as client:
+            client.reboot(target)
+        return
+    proc = subprocess.run(["fastboot", "-s", serial, "reboot", target], capture_output=True, text=True, timeout=60)
+    if proc.returncode != 0: raise RuntimeError(proc.stderr.strip() or f"reboot {target} failed")
+
+def wait_for_mode(serial, mode, timeout=SWITCH_TIMEOUT_S, interval=2.0, read_vars=get_fastboot_vars, list_devices=get_devices):
+    """ Blocks until ``serial`` answers fastboot in ``mode``; returns the seconds waited """
+    start = time.time()
+    while time.time() - start < timeout:
+        # A USB serial must be listed first: fastboot would otherwise sit in "< waiting for device >"
+        listed = is_network_serial(serial) or any(d["serial"] == serial and d["type"] == "FASTBOOT" for d in list_devices())
+        if listed:
+            try:
+                if current_mode(read_vars(serial)) == mode: return time.time() - start
+            except Exception:
+                pass
+        time.sleep(interval)
+    raise TimeoutError(f"{serial} did not come back in {mode} within {timeout} s")
+
+def switch_mode(serial, mode, log=None, progress=None, report=None):
+    """ Reboots into ``mode`` and waits for the device; returns the switch's wall time """
+    start = time.time()
+    if log: log(f"Switching {serial} to {mode}...")
+    reboot_to(serial, mode)
+    # Otherwise a reboot within the same mode could be "done" before the device even went away
+    time.sleep(REBOOT_SETTLE_S)
+    wait_for_mode(serial, mode)
+    elapsed = time.time() - start
+    if log: log(f"{serial} is in {mode} ({elapsed:.1f} s)")
+    return elapsed
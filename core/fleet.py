@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.adb_fastboot import get_devices
+from core.shell_session import shell
+
+HOT_CELSIUS = 45.0
+
+def read_identity(serial):
+    """ ``(model, root state)``; root is "adb root" when adbd runs as uid 0, "su" when an su binary is installed """
+    lines = shell(serial, "getprop ro.product.model; id -u; command -v su").output.splitlines()
+    model = lines[0].strip() if lines else ""
+    uid = lines[1].strip() if len(lines) > 1 else ""
+    if uid == "0": return model, "adb root"
+    return model, "su" if any(line.strip() for line in lines[2:]) else "no root"
+
+class FleetPoller:
+    """ Polls every attached device in parallel; one telemetry read per ADB device per round.
+
+    ``poll`` reports one status dict per device as soon as it is ready and
+    returns the list of serials seen, so the view can drop devices that
+    went away. Model names and root state are read once per serial.
+    """
+    def __init__(self, collector, workers=8, list_devices=get_devices, identity_reader=read_identity):
+        self.collector = collector
+        self.workers = workers
+        self.list_devices = list_devices
+        self.identity_reader = identity_reader
+        self.identities = {}
+
+    def status(self, device):
+        serial, state = device["serial"], device["type"]
+        model, root = self.identities.get(serial, ("", None))
+        status = {"serial": serial, "state": state, "model": model, "root": root, "error": None}
+        if state != "ADB": return status
+        try:
+            if serial not in self.identities:
+                self.identities[serial] = status["model"], status["root"] = self.identity_reader(serial)
+            sample = self.collector.collect(serial)
+        except Exception as e:
+            status["error"] = str(e)
+            return status
+        status.update({
+            "battery_pct": sample["battery_pct"],
+            "battery_temp_c": sample["battery_temp_c"],
+            "cpu_pct": sample["cpu_pct"].get("cpu"),
+            "thermal_max_c": max(sample["thermal_c"].values()) if sample["thermal_c"] else None,
+            "mem_used_pct": sample["memory"].get("used_pct"),
+            "storage_pct": sample["storage_pct"],
+        })
+        return status
+
+    def poll(self, log=None, progress=None, report=None):
+        devices = self.list_devices()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(devices) or 1))) as pool:
+            futures = [pool.submit(self.status, device) for device in devices]
+            for done, fut in enumerate(as_completed(futures), 1):
+                if report: report(fut.result())
+                if progress: progress(done, len(devices))
+        return [device["serial"] for device in devices]
+
+def is_hot(status):
+    temps = [status.get("thermal_max_c"), status.get("battery_temp_c")]
+    return any(t is not None and t >= HOT_CELSIUS for t in temps)
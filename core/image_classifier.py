@@ -0,0 +1,144 @@
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.payload import PAYLOAD_MAGIC
+from core.fastboot_client import SPARSE_MAGIC, SPARSE_HEADER, CHUNK_HEADER, CHUNK_RAW, CHUNK_FILL, CHUNK_CRC32
+from core.super_image import PARTITION_RESERVED_BYTES, GEOMETRY_MAGIC
+from core.boot_image import BOOT_MAGIC, VENDOR_BOOT_MAGIC
+
+# Enough for the ext4/erofs/f2fs superblocks at 1 KiB and the liblp geometry at 4 KiB
+SNIFF_SIZE = 8192
+SPARSE_CHUNK_WALK = 16
+
+EXT4_MAGIC_OFFSET, EXT4_MAGIC, EXT4_LABEL_OFFSET = 1024 + 56, 0xEF53, 1024 + 120
+EROFS_MAGIC = 0xE0F5E1E2
+F2FS_MAGIC = 0xF2F52010
+DTBO_MAGIC = 0xD7B7AB1E
+MTK_MAGIC = 0x58881688
+BOOTLOADER_MAGICS = (b"BOOTLDR!", b"\x7fELF")
+# Partition names a plain filename may be trusted for
+PARTITION_NAME = re.compile(r"^[a-z][a-z0-9_]{1,31}$")
+
+def _sparse_read(f, header, raw_offset, size):
+    """ Reads ``size`` bytes at ``raw_offset`` of the unsparsed image by walking the first chunk headers """
+    _, _, _, hdr_size, chunk_hdr_size, blk_size, _, total_chunks, _ = header
+    offset, position = hdr_size, 0
+    for _ in range(min(total_chunks, SPARSE_CHUNK_WALK)):
+        f.seek(offset)
+        raw = f.read(CHUNK_HEADER.size)
+        if len(raw) < CHUNK_HEADER.size: break
+        kind, _, blocks, total_size = CHUNK_HEADER.unpack(raw)
+        length = 0 if kind == CHUNK_CRC32 else blocks * blk_size
+        if position <= raw_offset < position + length:
+            inner = raw_offset - position
+            if kind == CHUNK_RAW:
+                f.seek(offset + chunk_hdr_size + inner)
+                return f.read(min(size, length - inner))
+            if kind == CHUNK_FILL:
+                f.seek(offset + chunk_hdr_size)
+                pattern = f.read(4)
+                return (pattern[inner % 4:] + pattern[:inner % 4]) * (size // 4 + 1)
+            return bytes(min(size, length - inner))
+        position += length
+        offset += total_size
+    return b""
+
+def _filesystem(data):
+    """ ``(kind, volume label)`` for an ext4, erofs or f2fs superblock in the first 2 KiB """
+    if len(data) >= EXT4_LABEL_OFFSET + 16 and struct.unpack_from("<H", data, EXT4_MAGIC_OFFSET)[0] == EXT4_MAGIC:
+        return "ext4", data[EXT4_LABEL_OFFSET:EXT4_LABEL_OFFSET + 16].split(b"\0", 1)[0].decode("ascii", errors="replace")
+    if len(data) >= 1024 + 80 and struct.unpack_from("<I", data, 1024)[0] == EROFS_MAGIC:
+        return "erofs", data[1024 + 64:1024 + 80].split(b"\0", 1)[0].decode("ascii", errors="replace")
+    if len(data) >= 1028 and struct.unpack_from("<I", data, 1024)[0] == F2FS_MAGIC:
+        return "f2fs", ""
+    return None, ""
+
+def name_from_filename(path):
+    """ The filename stem when it looks like a partition name (``system.img``), else None """
+    stem = os.path.basename(path).lower()
+    for ext in (".img", ".bin", ".mbn", ".elf"):
+        if stem.endswith(ext): stem = stem[:-len(ext)]
+    return stem if PARTITION_NAME.match(stem) else None
+
+def _label_partition(label):
+    label = label.strip("/").lower()
+    # AOSP labels the system image "/" and the others by mount point
+    if label == "": return None
+    return label if PARTITION_NAME.match(label) else None
+
+def _boot_partition(data, path):
+    version = struct.unpack_from("<I", data, 40)[0] if len(data) >= 44 else 0
+    kernel_size = struct.unpack_from("<I", data, 8)[0] if len(data) >= 12 else 0
+    if version == 4 and kernel_size == 0: return "init_boot", f"boot image v{version}, ramdisk only"
+    # recovery and boot share the format; only the name tells them apart
+    if "recovery" in os.path.basename(path).lower(): return "recovery", f"boot image v{version if version <= 4 else 0}"
+    return "boot", f"boot image v{version if version <= 4 else 0}"
+
+def classify_image(path):
+    """ Sniffs the first few KB of ``path``.
+
+    Returns ``{"path", "kind", "partition", "source", "detail"}`` where
+    ``source`` says where the partition came from: ``"content"`` (magic
+    or volume label), ``"filename"`` (a plain partition-like name on an
+    otherwise recognised or unknown image) or None when no sensible
+    partition could be suggested.
+    """
+    result = {"path": path, "kind": "unknown", "partition": None, "source": None, "detail": ""}
+    try:
+        with open(path, "rb") as f:
+            data = f.read(SNIFF_SIZE)
+            sparse_header = None
+            if len(data) >= SPARSE_HEADER.size and struct.unpack_from("<I", data)[0] == SPARSE_MAGIC:
+                sparse_header = SPARSE_HEADER.unpack_from(data)
+                inner = _sparse_read(f, sparse_header, 0, 2048)
+                geometry = _sparse_read(f, sparse_header, PARTITION_RESERVED_BYTES, 4)
+    except OSError as e:
+        result["detail"] = str(e)
+        return result
+
+    def found(kind, partition, detail, source="content"):
+        if partition is None and kind != "payload" and name_from_filename(path):
+            partition, source = name_from_filename(path), "filename"
+        result.update(kind=kind, partition=partition, source=source if partition else None, detail=detail)
+        return result
+
+    if sparse_header is not None:
+        if geometry[:4] == struct.pack("<I", GEOMETRY_MAGIC): return found("super", "super", "sparse super image (dynamic partitions)")
+        fs, label = _filesystem(inner.ljust(2048, b"\0"))
+        if fs: return found(fs, _label_partition(label), f"sparse {fs} image" + (f" labelled {label}" if label else ""))
+        return found("sparse", None, "sparse image")
+
+    magic = data[:8]
+    if data[:4] == PAYLOAD_MAGIC: return found("payload", None, "A/B OTA payload")
+    if magic == BOOT_MAGIC:
+        partition, detail = _boot_partition(data, path)
+        return found("boot", partition, detail)
+    if magic == VENDOR_BOOT_MAGIC: return found("vendor_boot", "vendor_boot", "vendor_boot image")
+    if data[:4] == b"AVB0":
+        # vbmeta_system / vbmeta_vendor share the format; only a plain filename can tell them apart
+        name = name_from_filename(path)
+        return found("vbmeta", name if name and name.startswith("vbmeta") else "vbmeta", "AVB vbmeta image")
+    if len(data) >= 4 and struct.unpack_from(">I", data)[0] == DTBO_MAGIC: return found("dtbo", "dtbo", "device tree overlay table")
+    if len(data) >= 40 and struct.unpack_from("<I", data)[0] == MTK_MAGIC:
+        name = data[8:40].split(b"\0", 1)[0].decode("ascii", errors="replace").lower()
+        return found("bootloader", name if PARTITION_NAME.match(name) else None, f"MediaTek image ({name})")
+    if len(data) >= PARTITION_RESERVED_BYTES + 4 and data[PARTITION_RESERVED_BYTES:PARTITION_RESERVED_BYTES + 4] == struct.pack("<I", GEOMETRY_MAGIC):
+        return found("super", "super", "super image (dynamic partitions)")
+    fs, label = _filesystem(data)
+    if fs: return found(fs, _label_partition(label), f"{fs} image" + (f" labelled {label}" if label else ""))
+    if any(data.startswith(m) for m in BOOTLOADER_MAGICS):
+        return found("bootloader", None if data.startswith(b"\x7fELF") else "bootloader", "bootloader / firmware blob")
+    return found("unknown", None, "unrecognised content")
+
+def classify_images(paths, workers=8, log=None, progress=None, report=None):
+    """ Classifies many files in parallel, reporting each result as soon as it is ready """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths) or 1))) as pool:
+        futures = [pool.submit(classify_image, path) for path in paths]
+        for done, fut in enumerate(as_completed(futures), 1):
+            result = fut.result()
+            results.append(result)
+            if report: report(result)
+            if progress: progress(done, len(paths))
+    return results
@@ -0,0 +1,123 @@
+import csv
+import time
+import bisect
+import datetime
+from array import array
+
+# (bucket seconds, capacity): raw samples for the last hour at the 5 s
+# dashboard tick, then min/max buckets for a day and for a week. Memory per
+# series is fixed at a few tens of KB however long the session runs.
+TIERS = ((0, 720), (60, 1440), (900, 672))
+WINDOWS = {"1 h": 3600, "24 h": 86400, "7 d": 604800}
+
+class RingBuffer:
+    """ Fixed-size ``array`` ring; append and overwrite-last are O(1) and never allocate """
+    def __init__(self, capacity, typecode="d"):
+        self.capacity = capacity
+        self.data = array(typecode, [0]) * capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity: self.count += 1
+
+    @property
+    def last(self):
+        return self.data[(self.head - 1) % self.capacity]
+
+    @last.setter
+    def last(self, value):
+        self.data[(self.head - 1) % self.capacity] = value
+
+    def values(self):
+        """ Oldest-first copy of the contents """
+        if self.count < self.capacity: return self.data[:self.count]
+        return self.data[self.head:] + self.data[:self.head]
+
+class MinMaxTier:
+    """ One resolution level: ``(bucket start, min, max)`` rings. Bucket 0 keeps every sample. """
+    def __init__(self, bucket, capacity):
+        self.bucket = bucket
+        self.times = RingBuffer(capacity)
+        self.mins = RingBuffer(capacity)
+        self.maxs = RingBuffer(capacity)
+
+    def add(self, timestamp, value):
+        start = timestamp - timestamp % self.bucket if self.bucket else timestamp
+        if self.bucket and len(self.times) and self.times.last == start:
+            if value < self.mins.last: self.mins.last = value
+            if value > self.maxs.last: self.maxs.last = value
+            return
+        self.times.append(start)
+        self.mins.append(value)
+        self.maxs.append(value)
+
+    def span(self):
+        return self.times.capacity * (self.bucket or 5)
+
+    def since(self, cutoff):
+        times, mins, maxs = self.times.values(), self.mins.values(), self.maxs.values()
+        i = bisect.bisect_left(times, cutoff)
+        return times[i:], mins[i:], maxs[i:]
+
+class MetricSeries:
+    def __init__(self, tiers=TIERS):
+        self.tiers = [MinMaxTier(bucket, capacity) for bucket, capacity in tiers]
+
+    def add(self, timestamp, value):
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def window(self, seconds, now=None):
+        """ ``(times, mins, maxs)`` for the last ``seconds``, from the finest tier that covers them """
+        now = time.time() if now is None else now
+        tier = next((t for t in self.tiers if t.span() >= seconds), self.tiers[-1])
+        return tier.since(now - seconds)
+
+class MetricsStore:
+    """ Per-device metric history, keyed by serial then metric name """
+    def __init__(self, tiers=TIERS):
+        self.tiers = tiers
+        self.devices = {}
+
+    def record(self, serial, values, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        series = self.devices.setdefault(serial, {})
+        for name, value in values.items():
+            if value is None: continue
+            if name not in series: series[name] = MetricSeries(self.tiers)
+            series[name].add(timestamp, float(value))
+
+    def window(self, serial, name, seconds, now=None):
+        series = self.devices.get(serial, {}).get(name)
+        if series is None: return array("d"), array("d"), array("d")
+        return series.window(seconds, now)
+
+    def export_csv(self, serial, path, seconds, now=None):
+        """ Writes ``timestamp, metric, min, max`` rows for every metric of ``serial``; returns the row count """
+        rows = 0
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "metric", "min", "max"])
+            for name in sorted(self.devices.get(serial, {})):
+                times, mins, maxs = self.window(serial, name, seconds, now)
+                for t, lo, hi in zip(times, mins, maxs):
+                    writer.writerow([datetime.datetime.fromtimestamp(t).isoformat(timespec="seconds"), name, lo, hi])
+                    rows += 1
+        return rows
+
+def decimate(mins, maxs, columns):
+    """ Min/max decimation to at most ``columns`` points, so short spikes survive any zoom level """
+    n = len(mins)
+    if n <= columns: return list(mins), list(maxs)
+    out_min, out_max = [], []
+    for c in range(columns):
+        lo, hi = c * n // columns, (c + 1) * n // columns
+        out_min.append(min(mins[lo:hi]))
+        out_max.append(max(maxs[lo:hi]))
+    return out_min, out_max
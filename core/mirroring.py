@@ -0,0 +1,253 @@
+import os
+import sys
+import time
+import shutil
+import threading
+import subprocess
+from core.adb_transport import host_query
+from core.shell_session import shell_for
+from core.wireless import parse_device_states
+
+# What each mode asks for when the host has room; max_size 0 means the device's native size
+MODES = {
+    "standard": {"bit_rate": 8.0, "max_fps": 60, "max_size": 0, "flags": []},
+    "gaming": {"bit_rate": 16.0, "max_fps": 60, "max_size": 0, "flags": []},
+    "dex": {"bit_rate": 16.0, "max_fps": 60, "max_size": 0, "wake": True,
+            "flags": ["--turn-screen-off", "--stay-awake", "--disable-screensaver", "--power-off-on-close"]},
+}
+# Software decoding of one H.264/H.265 stream costs roughly a core per ~120 Mpx/s
+DECODE_MPX_PER_CORE = 120.0
+DEFAULT_BANDWIDTH_MBPS = 200.0
+# Cost model for "native": a 1080x2400 panel, pixels ~= long side^2 * 0.45
+NATIVE_SIZE = 2400
+ASPECT = 0.45
+SIZE_LADDER = (1920, 1600, 1280, 1024, 800, 640)
+MIN_FPS = 24
+MIN_BIT_RATE = 1.0
+# scrcpy exit codes: 0 window closed, 1 start failure, 2 device disconnected
+EXIT_DISCONNECTED = 2
+MAX_RESTARTS = 5
+RESTART_WINDOW_S = 300.0
+RESTART_DELAY_S = 2.0
+LOG_TAIL = 400
+
+def host_budget(cores=None, bandwidth_mbps=DEFAULT_BANDWIDTH_MBPS):
+    """ Decode (Mpx/s) and link (Mbps) budget for all sessions; one core is left for the app itself """
+    cores = cores or os.cpu_count() or 2
+    return {"decode_mpx": max(1, cores - 1) * DECODE_MPX_PER_CORE, "bandwidth_mbps": float(bandwidth_mbps)}
+
+def _megapixels(size):
+    return (size or NATIVE_SIZE) ** 2 * ASPECT / 1e6
+
+def _water_fill(demands, capacity):
+    """ Max-min fair shares: small demands are met in full, the rest split what is left evenly """
+    shares, remaining = {}, capacity
+    ordered = sorted(demands.items(), key=lambda item: item[1])
+    for i, (key, demand) in enumerate(ordered):
+        shares[key] = min(demand, remaining / (len(ordered) - i))
+        remaining -= shares[key]
+    return shares
+
+def _fit_decode(max_fps, max_size, mpx):
+    """ Frame rate and size that fit ``mpx`` Mpx/s: fps drops to MIN_FPS first, then the size steps down """
+    if _megapixels(max_size) * max_fps <= mpx: return max_fps, max_size
+    fps = int(mpx / _megapixels(max_size))
+    if fps >= MIN_FPS: return fps, max_size
+    current = max_size or NATIVE_SIZE
+    for size in SIZE_LADDER:
+        if size < current and _megapixels(size) * MIN_FPS <= mpx:
+            return min(max_fps, int(mpx / _megapixels(size))), size
+    return MIN_FPS, SIZE_LADDER[-1]
+
+def allocate(sessions, budget):
+    """ Per-session ``{"bit_rate", "max_fps", "max_size"}`` from ``{serial: mode}`` and a ``host_budget``.
+
+    Bitrate and decode cost are shared max-min fairly, so a standard
+    mirror keeps its full 8 Mbps while gaming/DeX sessions split the rest.
+    """
+    wants = {serial: MODES[mode] for serial, mode in sessions.items()}
+    bandwidth = _water_fill({s: w["bit_rate"] for s, w in wants.items()}, budget["bandwidth_mbps"])
+    decode = _water_fill({s: _megapixels(w["max_size"]) * w["max_fps"] for s, w in wants.items()}, budget["decode_mpx"])
+    limits = {}
+    for serial, want in wants.items():
+        fps, size = _fit_decode(want["max_fps"], want["max_size"], decode[serial])
+        limits[serial] = {"bit_rate": round(max(MIN_BIT_RATE, bandwidth[serial]), 1), "max_fps": fps, "max_size": size}
+    return limits
+
+def _exceeds(current, allowed):
+    size = lambda limits: limits["max_size"] or NATIVE_SIZE
+    return (current["bit_rate"] > allowed["bit_rate"] or current["max_fps"] > allowed["max_fps"]
+            or size(current) > size(allowed))
+
+def describe_limits(limits):
+    size = f"{limits['max_size']}px" if limits["max_size"] else "native"
+    return f"{limits['bit_rate']:g} Mbps, {limits['max_fps']} fps, {size}"
+
+def build_command(scrcpy, serial, mode, limits, audio=False):
+    cmd = [scrcpy, "-s", serial, "--always-on-top", "--window-title", f"{serial} ({mode})",
+           "--max-fps", str(limits["max_fps"]), "--video-bit-rate", f"{int(limits['bit_rate'] * 1000)}K"]
+    if limits["max_size"]: cmd += ["--max-size", str(limits["max_size"])]
+    if not audio: cmd.append("--no-audio")
+    return cmd + MODES[mode]["flags"]
+
+def wake_device(serial):
+    shell_for(serial).run("input keyevent KEYCODE_WAKE && wm dismiss-keyguard", timeout=10)
+
+def _popen(cmd, log_path):
+    with open(log_path, "wb") as err:
+        if sys.platform == "win32":
+            return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=err, creationflags=subprocess.CREATE_NO_WINDOW)
+        return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=err, start_new_session=True)
+
+def _log_tail(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - LOG_TAIL))
+            lines = f.read().decode("utf-8", errors="replace").strip().splitlines()
+        return lines[-1] if lines else ""
+    except OSError:
+        return ""
+
+class MirrorManager:
+    """ scrcpy sessions for many devices, sized to share the host.
+
+    Every start or stop re-runs ``allocate`` over the active sessions;
+    running sessions whose limits shrink are relaunched with the new
+    ones. ``run`` watches the child processes: a window closed by the
+    user ends its session, a disconnected device is relaunched when it is
+    listed again and a crash is relaunched up to MAX_RESTARTS times per
+    RESTART_WINDOW_S. ``report`` receives a status dict per change.
+    """
+    def __init__(self, log_dir, budget=None, scrcpy=None, launch=_popen, wake=wake_device,
+                 list_states=lambda: parse_device_states(host_query("host:devices"))):
+        self.log_dir = log_dir
+        self.budget = budget or host_budget()
+        self.scrcpy = scrcpy
+        self.launch = launch
+        self.wake = wake
+        self.list_states = list_states
+        self.sessions = {}
+        self.lock = threading.RLock()
+
+    def _status(self, session):
+        proc = session["proc"]
+        return {"serial": session["serial"], "mode": session["mode"], "state": session["state"],
+                "limits": dict(session["limits"]), "pid": proc.pid if proc else None,
+                "restarts": len(session["restarts"]), "error": session["error"]}
+
+    def statuses(self):
+        with self.lock:
+            return [self._status(s) for s in self.sessions.values()]
+
+    def _log_path(self, serial):
+        os.makedirs(self.log_dir, exist_ok=True)
+        return os.path.join(self.log_dir, "scrcpy_" + "".join(c if c.isalnum() else "_" for c in serial) + ".log")
+
+    def _spawn(self, session, log):
+        if MODES[session["mode"]].get("wake"):
+            try: self.wake(session["serial"])
+            except Exception as e:
+                if log: log(f"{session['serial']}: wake failed: {str(e)}")
+        scrcpy = self.scrcpy or shutil.which("scrcpy")
+        if not scrcpy: raise FileNotFoundError("scrcpy executable not found in system PATH")
+        cmd = build_command(scrcpy, session["serial"], session["mode"], session["limits"], session["audio"])
+        session["proc"] = self.launch(cmd, self._log_path(session["serial"]))
+        session.update(state="running", error=None, started=time.time())
+        if log: log(f"Mirroring {session['serial']} ({session['mode']}): {describe_limits(session['limits'])}")
+
+    def _terminate(self, session):
+        proc, session["proc"] = session["proc"], None
+        if proc is None or proc.poll() is not None: return
+        proc.terminate()
+        try: proc.wait(timeout=5)
+        except subprocess.TimeoutExpired: proc.kill()
+
+    def _reallocate(self, log, report):
+        """ Applies a fresh allocation; running sessions are only relaunched when they must give something back """
+        active = {s: session for s, session in self.sessions.items() if session["state"] != "failed"}
+        limits = allocate({s: session["mode"] for s, session in active.items()}, self.budget)
+        for serial, session in active.items():
+            if session["state"] != "running":
+                session["limits"] = limits[serial]
+            elif _exceeds(session["limits"], limits[serial]):
+                session["limits"] = limits[serial]
+                if log: log(f"{serial}: relaunching with {describe_limits(limits[serial])}")
+                self._terminate(session)
+                self._launch_reported(session, log, report)
+
+    def _launch_reported(self, session, log, report):
+        try:
+            self._spawn(session, log)
+        except Exception as e:
+            session.update(state="failed", error=str(e), proc=None)
+            if log: log(f"Error: could not mirror {session['serial']}: {str(e)}")
+        if report: report(self._status(session))
+
+    def start(self, serials, mode, audio=False, log=None, progress=None, report=None):
+        if mode not in MODES: raise ValueError(f"Unknown mirroring mode {mode}")
+        with self.lock:
+            fresh = []
+            for serial in serials:
+                session = self.sessions.get(serial)
+                if session and session["state"] in ("running", "waiting") and session["mode"] == mode: continue
+                if session: self._terminate(session)
+                self.sessions[serial] = {"serial": serial, "mode": mode, "audio": audio, "limits": {}, "proc": None,
+                                         "state": "starting", "restarts": [], "error": None, "next_retry": 0.0}
+                fresh.append(self.sessions[serial])
+            self._reallocate(log, report)
+            for done, session in enumerate(fresh, 1):
+                self._launch_reported(session, log, report)
+                if progress: progress(done, len(fresh))
+        return self.statuses()
+
+    def stop(self, serials=None, log=None, progress=None, report=None):
+        with self.lock:
+            for serial in list(serials if serials is not None else self.sessions):
+                session = self.sessions.pop(serial, None)
+                if session is None: continue
+                self._terminate(session)
+                session["state"] = "stopped"
+                if report: report(self._status(session))
+            if self.sessions: self._reallocate(log, report)
+
+    def poll(self, log=None, report=None):
+        """ One pass over the child processes; relaunches what crashed or came back """
+        now = time.time()
+        states = None
+        with self.lock:
+            for serial, session in list(self.sessions.items()):
+                proc = session["proc"]
+                if session["state"] == "running" and proc is not None and proc.poll() is not None:
+                    code, session["proc"] = proc.returncode, None
+                    if code == 0:
+                        # Closed by the user: end the session instead of fighting them
+                        del self.sessions[serial]
+                        session["state"] = "closed"
+                        if log: log(f"{serial}: mirror window closed")
+                        if report: report(self._status(session))
+                        continue
+                    session["error"] = _log_tail(self._log_path(serial)) or f"scrcpy exited with code {code}"
+                    session["restarts"] = [t for t in session["restarts"] if now - t < RESTART_WINDOW_S]
+                    if code != EXIT_DISCONNECTED and len(session["restarts"]) >= MAX_RESTARTS:
+                        session["state"] = "failed"
+                        if log: log(f"{serial}: mirroring keeps crashing, giving up ({session['error']})")
+                    else:
+                        session.update(state="waiting", next_retry=now + RESTART_DELAY_S)
+                        if log: log(f"{serial}: scrcpy exited ({session['error']}); relaunching")
+                    if report: report(self._status(session))
+                if session["state"] == "waiting" and now >= session["next_retry"]:
+                    if states is None:
+                        try: states = self.list_states()
+                        except Exception: states = {}
+                    if states.get(serial) != "device": continue
+                    session["restarts"].append(now)
+                    self._launch_reported(session, log, report)
+
+    def run(self, cancel_event, interval=1.0, log=None, progress=None, report=None):
+        """ Watches the sessions until ``cancel_event`` is set or none are left """
+        while not cancel_event.is_set():
+            self.poll(log=log, report=report)
+            with self.lock:
+                if not any(s["state"] in ("running", "waiting", "starting") for s in self.sessions.values()): break
+            cancel_event.wait(interval)
@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import zlib
+import queue
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.adb_transport import AdbConnection
+from core.shell_session import shell
+from core.chunk_store import open_store, ChunkImageSink, iter_image
+
+STREAM_CHUNK = 1024 * 1024
+PIPELINE_DEPTH = 8
+BY_NAME_DIR = "/dev/block/by-name"
+MANIFEST_NAME = "manifest.json"
+# Shared by every backup written under the same backup folder
+STORE_DIR = ".chunkstore"
+PARTITION_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+class BackupError(Exception):
+    pass
+
+def list_block_partitions(serial, use_su=True, log=None, progress=None, report=None):
+    """ Returns ``{partition: size_bytes}`` for everything under /dev/block/by-name """
+    script = f"for p in $(ls {BY_NAME_DIR}); do echo $p $(blockdev --getsize64 {BY_NAME_DIR}/$p); done"
+    sizes = {}
+    for line in shell(serial, script, root=use_su).output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit() and PARTITION_NAME.match(parts[0]):
+            sizes[parts[0]] = int(parts[1])
+    return sizes
+
+class GzipImageSink:
+    """ Compresses and hashes a raw image stream into ``<name>.img.gz`` """
+    def __init__(self, path, level=6):
+        self.path = path
+        self.file = open(path, "wb")
+        # wbits=31 -> gzip container, readable by any gunzip
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        self.file.write(self.compressor.compress(chunk))
+
+    def close(self):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        return {"file": os.path.basename(self.path), "size": self.size, "sha256": self.sha256.hexdigest(),
+                "stored": os.path.getsize(self.path)}
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.path): os.remove(self.path)
+
+def dump_command(partition, use_su):
+    dd = f"dd if={BY_NAME_DIR}/{partition} bs={STREAM_CHUNK} 2>/dev/null"
+    return f"exec:su -c '{dd}'" if use_su else f"exec:{dd}"
+
+def stream_to_sink(conn, sink, expected_size=None, on_bytes=None):
+    """ Socket reader and hash/compress writer run as a two-stage pipeline with a bounded queue """
+    chunks = queue.Queue(maxsize=PIPELINE_DEPTH)
+    errors = []
+
+    def reader():
+        try:
+            while True:
+                chunk = conn.recv(STREAM_CHUNK)
+                if not chunk: break
+                chunks.put(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            chunks.put(None)
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None: break
+            sink.write(chunk)
+            if on_bytes: on_bytes(len(chunk))
+    except Exception:
+        sink.abort()
+        raise
+    t.join()
+    if errors:
+        sink.abort()
+        raise BackupError(str(errors[0]))
+    if expected_size is not None and sink.size != expected_size:
+        sink.abort()
+        raise BackupError(f"Short read: got {sink.size} of {expected_size} bytes (root denied?)")
+    return sink.close()
+
+def make_gzip_sink(out_dir, partition):
+    return GzipImageSink(os.path.join(out_dir, f"{partition}.img.gz"))
+
+def backup_partitions(serial, partitions, root_dir, use_su=True, parallel=3, sink_factory=make_gzip_sink,
+                      dedup=False, open_stream=AdbConnection.open, log=None, progress=None, report=None):
+    """ Dumps ``partitions`` (``{name: size}``) in parallel into a timestamped backup folder.
+
+    Each partition is streamed with ``dd`` over an ``exec:`` service and
+    compressed/hashed on the host as it arrives, so memory stays bounded by
+    the pipeline depth regardless of image size. With ``dedup`` the images
+    go into the chunk store shared by all backups in ``root_dir`` instead
+    of per-backup gzip files. Writes ``manifest.json`` and returns its path.
+    """
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = os.path.join(root_dir, f"{serial.replace(':', '_')}_{stamp}")
+    os.makedirs(out_dir, exist_ok=True)
+    store = None
+    if dedup:
+        store = open_store(os.path.join(root_dir, STORE_DIR))
+        sink_factory = lambda out_dir, partition: ChunkImageSink(store, os.path.join(out_dir, f"{partition}.chunks"))
+    total = sum(partitions.values())
+    done = [0]
+    lock = threading.Lock()
+
+    def on_bytes(n):
+        with lock:
+            done[0] += n
+            value = done[0]
+        if progress: progress(value // 1024, max(total // 1024, 1))
+
+    def dump(partition, size):
+        with open_stream(serial, dump_command(partition, use_su)) as conn:
+            return stream_to_sink(conn, sink_factory(out_dir, partition), size or None, on_bytes)
+
+    manifest = {"serial": serial, "created": stamp, "partitions": {}}
+    if store is not None: manifest["store"] = os.path.relpath(store.root, out_dir)
+    failures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            futures = {pool.submit(dump, name, size): name for name, size in partitions.items()}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    entry = fut.result()
+                    manifest["partitions"][name] = entry
+                    if log: log(f"Backed up {name}: {entry['size'] / (1024 * 1024):.1f} MB ({entry['stored'] / (1024 * 1024):.1f} MB new on disk), sha256 {entry['sha256'][:16]}...")
+                    if report: report({"partition": name, "ok": True, **entry})
+                except Exception as e:
+                    failures.append(name)
+                    if log: log(f"Error: backup of {name} failed: {str(e)}")
+                    if report: report({"partition": name, "ok": False, "error": str(e)})
+    finally:
+        if store is not None: store.close()
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    if log: log(f"Backup finished: {len(manifest['partitions'])} partition(s) saved to {out_dir}, {len(failures)} failed")
+    return manifest_path
+
+def load_backup(manifest_path):
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+def restore_entries(manifest_path):
+    """ ``(partition, path)`` pairs for queueing a backup into the flash queue """
+    manifest = load_backup(manifest_path)
+    base = os.path.dirname(manifest_path)
+    return [(name, os.path.join(base, entry["file"])) for name, entry in sorted(manifest["partitions"].items())]
+
+def is_backup_image(path):
+    return path.endswith((".img.gz", ".chunks")) and os.path.exists(os.path.join(os.path.dirname(path), MANIFEST_NAME))
+
+def _gunzip_stream(path):
+    decompressor = zlib.decompressobj(31)
+    with open(path, "rb") as src:
+        raw = b""
+        while True:
+            # Bounded output per call: a run of zeros can inflate ~1000x
+            if not raw:
+                raw = src.read(STREAM_CHUNK)
+                if not raw: break
+            yield decompressor.decompress(raw, STREAM_CHUNK)
+            raw = decompressor.unconsumed_tail
+        yield decompressor.flush()
+
+def stage_backup_image(path, cache_dir, log=None, progress=None, report=None):
+    """ Rebuilds a backed-up image (gzip or chunk store) in ``cache_dir`` and verifies it against the manifest """
+    manifest = load_backup(os.path.join(os.path.dirname(path), MANIFEST_NAME))
+    entry = next((e for e in manifest["partitions"].values() if e["file"] == os.path.basename(path)), None)
+    os.makedirs(cache_dir, exist_ok=True)
+    name = os.path.basename(path)
+    out_path = os.path.join(cache_dir, name[:-len(".gz")] if name.endswith(".gz") else name[:-len(".chunks")] + ".img")
+    store = None
+    if name.endswith(".chunks"):
+        if "store" not in manifest: raise BackupError(f"{os.path.basename(os.path.dirname(path))} has no chunk store")
+        store = open_store(os.path.normpath(os.path.join(os.path.dirname(path), manifest["store"])))
+        stream = iter_image(store, path)
+    else:
+        stream = _gunzip_stream(path)
+    total = entry["size"] if entry else 0
+    done = 0
+    sha256 = hashlib.sha256()
+    try:
+        with open(out_path, "wb") as dst:
+            for data in stream:
+                sha256.update(data)
+                dst.write(data)
+                done += len(data)
+                if progress and total: progress(done // 1024, max(total // 1024, 1))
+    except Exception:
+        if os.path.exists(out_path): os.remove(out_path)
+        raise
+    finally:
+        if store is not None: store.close()
+    if entry and sha256.hexdigest() != entry["sha256"]:
+        os.remove(out_path)
+        raise BackupError(f"{os.path.basename(path)} does not match its recorded sha256")
+    if log: log(f"Staged {os.path.basename(out_path)} from backup (sha256 verified)")
+    return out_path
@@ -0,0 +1,226 @@
+import os
+import bz2
+import lzma
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+PAYLOAD_MAGIC = b"CrAU"
+READ_CHUNK = 1024 * 1024
+OPS_PER_TASK = 64
+
+# InstallOperation.Type
+OP_REPLACE = 0
+OP_REPLACE_BZ = 1
+OP_ZERO = 6
+OP_DISCARD = 7
+OP_REPLACE_XZ = 8
+FULL_OTA_OPS = {OP_REPLACE, OP_REPLACE_BZ, OP_ZERO, OP_DISCARD, OP_REPLACE_XZ}
+
+class PayloadError(Exception):
+    pass
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80: return result, pos
+        shift += 7
+
+def _parse_message(data):
+    """ Minimal protobuf wire decoder: returns ``{field_number: [values]}`` """
+    fields = {}
+    pos, end = 0, len(data)
+    while pos < end:
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value = struct.unpack_from("<Q", data, pos)[0]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value = bytes(data[pos:pos + length])
+            pos += length
+        elif wire_type == 5:
+            value = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+        else:
+            raise PayloadError(f"Unsupported protobuf wire type {wire_type}")
+        fields.setdefault(field, []).append(value)
+    return fields
+
+def _one(fields, number, default=None):
+    values = fields.get(number)
+    return values[0] if values else default
+
+def _parse_extents(raw_list):
+    extents = []
+    for raw in raw_list:
+        ext = _parse_message(raw)
+        extents.append((_one(ext, 1, 0), _one(ext, 2, 0)))
+    return extents
+
+def parse_manifest(data):
+    """ Decodes the parts of DeltaArchiveManifest needed for full-OTA extraction """
+    manifest = _parse_message(data)
+    block_size = _one(manifest, 3, 4096)
+    partitions = []
+    for raw_part in manifest.get(13, []):
+        part = _parse_message(raw_part)
+        info = _parse_message(_one(part, 7, b""))
+        operations = []
+        for raw_op in part.get(8, []):
+            op = _parse_message(raw_op)
+            operations.append({
+                "type": _one(op, 1, 0),
+                "data_offset": _one(op, 2, 0),
+                "data_length": _one(op, 3, 0),
+                "dst_extents": _parse_extents(op.get(6, [])),
+            })
+        partitions.append({
+            "name": _one(part, 1, b"").decode("utf-8", errors="replace"),
+            "size": _one(info, 1, 0),
+            "operations": operations,
+        })
+    return {"block_size": block_size, "partitions": partitions}
+
+def locate_payload(path):
+    """ Returns the absolute offset of payload.bin inside ``path`` (a zip or a bare payload) """
+    with open(path, "rb") as f:
+        if f.read(4) == PAYLOAD_MAGIC: return 0
+    try:
+        with zipfile.ZipFile(path) as zf:
+            info = zf.getinfo("payload.bin")
+    except (zipfile.BadZipFile, KeyError):
+        raise PayloadError("No payload.bin found")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise PayloadError("payload.bin is compressed inside the zip; cannot stream it in place")
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(30)
+        if header[:4] != b"PK\x03\x04": raise PayloadError("Corrupt zip local header")
+        name_len, extra_len = struct.unpack_from("<HH", header, 26)
+        return info.header_offset + 30 + name_len + extra_len
+
+def read_payload(path):
+    """ Reads the payload header and manifest, leaving operation data on disk """
+    base = locate_payload(path)
+    with open(path, "rb") as f:
+        f.seek(base)
+        header = f.read(24)
+        if header[:4] != PAYLOAD_MAGIC: raise PayloadError("Bad payload magic")
+        version, manifest_size = struct.unpack_from(">QQ", header, 4)
+        if version == 1:
+            header_size, metadata_sig_size = 20, 0
+        elif version == 2:
+            header_size, metadata_sig_size = 24, struct.unpack_from(">I", header, 20)[0]
+        else:
+            raise PayloadError(f"Unsupported payload version {version}")
+        f.seek(base + header_size)
+        manifest = parse_manifest(f.read(manifest_size))
+    manifest["data_offset"] = base + header_size + manifest_size + metadata_sig_size
+    manifest["version"] = version
+    return manifest
+
+def _open_decompressor(op_type):
+    if op_type == OP_REPLACE_XZ: return lzma.LZMADecompressor()
+    if op_type == OP_REPLACE_BZ: return bz2.BZ2Decompressor()
+    return None
+
+def _write_extents(out, extents, block_size, chunks):
+    """ Writes a byte stream across destination extents in order """
+    targets = [(start * block_size, count * block_size) for start, count in extents]
+    idx, written = 0, 0
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view and idx < len(targets):
+            offset, length = targets[idx]
+            n = min(len(view), length - written)
+            out.seek(offset + written)
+            out.write(view[:n])
+            view = view[n:]
+            written += n
+            if written == length: idx, written = idx + 1, 0
+
+def _apply_operations(payload_path, data_offset, block_size, operations, out_path):
+    """ Process-pool task: applies a slice of full-OTA operations to a preallocated image """
+    with open(payload_path, "rb") as src, open(out_path, "r+b") as out:
+        for op in operations:
+            op_type = op["type"]
+            # Images are freshly preallocated, so zeroed extents are already zero
+            if op_type in (OP_ZERO, OP_DISCARD): continue
+            src.seek(data_offset + op["data_offset"])
+            decompressor = _open_decompressor(op_type)
+
+            def stream(remaining=op["data_length"]):
+                while remaining > 0:
+                    raw = src.read(min(READ_CHUNK, remaining))
+                    if not raw: raise PayloadError("Unexpected end of payload")
+                    remaining -= len(raw)
+                    yield decompressor.decompress(raw) if decompressor else raw
+
+            _write_extents(out, op["dst_extents"], block_size, stream())
+    return len(operations)
+
+def preallocate(path, size):
+    with open(path, "wb") as f:
+        if size:
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                    return
+                except OSError: pass
+            f.truncate(size)
+
+def extract_payload(path, out_dir, partitions=None, workers=None, log=None, progress=None, report=None):
+    """ Extracts full-OTA partitions from ``path`` (OTA zip or payload.bin) into ``out_dir``.
+
+    Operations are split into small slices and applied by a process pool,
+    each worker streaming its compressed data straight from the zip into a
+    preallocated image, so memory use does not depend on payload size.
+    Calls ``report((partition, image_path))`` as each image completes.
+    """
+    manifest = read_payload(path)
+    block_size, data_offset = manifest["block_size"], manifest["data_offset"]
+    selected = [p for p in manifest["partitions"] if not partitions or p["name"] in partitions]
+    for part in selected:
+        unsupported = {op["type"] for op in part["operations"]} - FULL_OTA_OPS
+        if unsupported:
+            raise PayloadError(f"{part['name']}: incremental OTA operations {sorted(unsupported)} are not supported")
+
+    os.makedirs(out_dir, exist_ok=True)
+    total_ops = sum(len(p["operations"]) for p in selected)
+    done_ops, images = 0, []
+    if log: log(f"Extracting {len(selected)} partition(s) from payload v{manifest['version']} ({total_ops} operations)")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures, remaining = {}, {}
+        for part in selected:
+            name, ops = part["name"], part["operations"]
+            out_path = os.path.join(out_dir, f"{name}.img")
+            size = part["size"] or sum(count for op in ops for _, count in op["dst_extents"]) * block_size
+            preallocate(out_path, size)
+            remaining[name] = [out_path, 0]
+            for i in range(0, len(ops), OPS_PER_TASK):
+                fut = pool.submit(_apply_operations, path, data_offset, block_size, ops[i:i + OPS_PER_TASK], out_path)
+                futures[fut] = name
+                remaining[name][1] += 1
+
+        for name, (out_path, count) in remaining.items():
+            if count == 0:
+                images.append((name, out_path))
+                if report: report((name, out_path))
+        for fut in as_completed(futures):
+            done_ops += fut.result()
+            if progress: progress(done_ops, total_ops)
+            name = futures[fut]
+            remaining[name][1] -= 1
+            if remaining[name][1] == 0:
+                out_path = remaining[name][0]
+                images.append((name, out_path))
+                if log: log(f"Extracted {name} -> {out_path}")
+                if report: report((name, out_path))
+    return images
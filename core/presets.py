@@ -0,0 +1,146 @@
+import os
+import re
+import json
+
+CACHE_VERSION = 1
+
+BRAND_KEYS = ["ro.product.brand", "ro.product.system.brand", "ro.product.vendor.brand", "ro.product.manufacturer"]
+MODEL_KEYS = ["ro.product.model", "ro.product.system.model", "ro.product.vendor.model"]
+FINGERPRINT_KEYS = ["ro.build.fingerprint", "ro.system.build.fingerprint", "ro.vendor.build.fingerprint", "ro.bootimage.build.fingerprint"]
+VERSION_KEYS = ["ro.build.version.release", "ro.system.build.version.release", "ro.vendor.build.version.release"]
+
+# brand/name/device:VERSION/BUILD_ID/INCREMENTAL:type/tags
+FINGERPRINT_VERSION = re.compile(r"^[^/]+/[^/]+/[^:]+:([^/]+)/")
+
+def read_prop_file(path):
+    props = {}
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"): continue
+            if "=" in line:
+                key, val = line.split("=", 1)
+                props[key.strip()] = val.strip()
+    return props
+
+def _first(props, keys):
+    for key in keys:
+        if props.get(key): return props[key]
+    return ""
+
+def index_preset(path):
+    props = read_prop_file(path)
+    fingerprint = _first(props, FINGERPRINT_KEYS)
+    android = _first(props, VERSION_KEYS)
+    if not android and fingerprint:
+        match = FINGERPRINT_VERSION.match(fingerprint)
+        if match: android = match.group(1)
+    name = os.path.basename(path)[:-len(".prop")].replace("_", " ")
+    return {
+        "name": name,
+        "brand": _first(props, BRAND_KEYS),
+        "model": _first(props, MODEL_KEYS),
+        "android": android,
+        "fingerprint": fingerprint,
+        "props": len(props),
+    }
+
+def fuzzy_score(query, text):
+    """ Returns a match score (higher is better) or -1 if ``query`` is not a subsequence of ``text`` """
+    if not query: return 0
+    pos = text.find(query)
+    if pos >= 0:
+        # Contiguous hits beat scattered ones, earlier hits beat later ones
+        return 1000 - pos
+    score, idx, streak = 0, 0, 0
+    for ch in query:
+        found = text.find(ch, idx)
+        if found < 0: return -1
+        streak = streak + 1 if found == idx else 0
+        score += 1 + streak * 2
+        idx = found + 1
+    return score
+
+class PresetCatalog:
+    """ Metadata index over a directory of ``.prop`` presets.
+
+    Parsed metadata is persisted to a JSON cache keyed by file name and
+    invalidated per file by mtime and size, so a rescan only re-reads
+    presets that changed since the previous run.
+    """
+    def __init__(self, presets_dir, cache_path=None):
+        self.presets_dir = presets_dir
+        self.cache_path = cache_path
+        self.entries = {}
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path): return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION or data.get("dir") != os.path.abspath(self.presets_dir):
+                return {}
+            return data.get("entries", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path: return
+        data = {"version": CACHE_VERSION, "dir": os.path.abspath(self.presets_dir), "entries": self.entries}
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError: pass
+
+    def scan(self, log=None, progress=None, report=None):
+        cached = self._load_cache()
+        entries = {}
+        dirty = False
+        if os.path.isdir(self.presets_dir):
+            files = [e for e in os.scandir(self.presets_dir) if e.is_file() and e.name.endswith(".prop")]
+            for i, entry in enumerate(files):
+                st = entry.stat()
+                meta = cached.get(entry.name)
+                if not meta or meta.get("mtime") != st.st_mtime_ns or meta.get("size") != st.st_size:
+                    try:
+                        meta = index_preset(entry.path)
+                    except OSError as e:
+                        if log: log(f"Error indexing preset {entry.name}: {str(e)}")
+                        continue
+                    meta["mtime"] = st.st_mtime_ns
+                    meta["size"] = st.st_size
+                    dirty = True
+                entries[entry.name] = meta
+                if progress and i % 50 == 0: progress(i, len(files))
+        self.entries = entries
+        if dirty or len(entries) != len(cached):
+            self._save_cache()
+        return self
+
+    def path_for(self, file_name):
+        return os.path.join(self.presets_dir, file_name)
+
+    def facets(self, field):
+        natural_key = lambda v: [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", v)]
+        return sorted({meta[field] for meta in self.entries.values() if meta.get(field)}, key=natural_key)
+
+    def search(self, query="", brand=None, android=None, limit=None):
+        """ Returns ``(file_name, meta)`` pairs matching the filters, best fuzzy match first """
+        terms = query.lower().split()
+        results = []
+        for file_name, meta in self.entries.items():
+            if brand and meta.get("brand", "").lower() != brand.lower(): continue
+            if android and meta.get("android") != android: continue
+            haystack = " ".join([meta["name"], meta["brand"], meta["model"], meta["android"], meta["fingerprint"]]).lower()
+            score = 0
+            for term in terms:
+                term_score = fuzzy_score(term, haystack)
+                if term_score < 0: break
+                score += term_score
+            else:
+                results.append((score, meta["name"].lower(), file_name, meta))
+        results.sort(key=lambda r: (-r[0], r[1]))
+        if limit: results = results[:limit]
+        return [(file_name, meta) for _, _, file_name, meta in results]
@@ -0,0 +1,150 @@
+import uuid
+import socket
+import threading
+from core.adb_transport import AdbConnection, AdbError
+
+DEFAULT_TIMEOUT = 30
+
+class ShellError(Exception):
+    pass
+
+class ShellTimeout(ShellError):
+    pass
+
+def quote(text):
+    """ Single-quotes ``text`` for sh """
+    return "'" + text.replace("'", "'\\''") + "'"
+
+class ShellResult:
+    def __init__(self, command, code, output):
+        self.command = command
+        self.code = code
+        self.output = output
+
+    @property
+    def ok(self):
+        return self.code == 0
+
+    def __repr__(self):
+        return f"ShellResult(code={self.code}, output={self.output[:60]!r})"
+
+class ShellSession:
+    """ One long-lived ``sh`` on the device, fed commands over a single adb stream.
+
+    The shell runs through ``exec:`` (no pty, so no echo or CRLF
+    mangling). Each command is evaluated in a subshell with stdin from
+    /dev/null, so a syntax error or a command that reads stdin cannot
+    break the session. Its output (stderr merged) ends at a per-command
+    random sentinel that carries the exit code. Commands can be
+    pipelined: ``run_many`` writes them all, then reads the results in
+    order. A dead stream is reopened and the command retried once, as
+    long as none of its output had arrived yet.
+    """
+    def __init__(self, serial, root=False, open_stream=AdbConnection.open):
+        self.serial = serial
+        self.root = root
+        self.open_stream = open_stream
+        self.conn = None
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        self.close()
+        self.conn = self.open_stream(self.serial, "exec:su" if self.root else "exec:sh")
+        self.buffer = bytearray()
+        if self.root:
+            # su can refuse silently (no root, denied grant); prove we got uid 0 before running anything
+            marker = self._marker()
+            self._send([("id -u", marker)])
+            code, output = self._read_result(marker, DEFAULT_TIMEOUT)
+            if code != 0 or output.strip() != b"0":
+                self.close()
+                raise ShellError("Root shell was denied (grant Shell root access in Magisk)")
+
+    @staticmethod
+    def _marker():
+        return f"__NAT_{uuid.uuid4().hex}__"
+
+    def _send(self, commands):
+        script = "".join(f"( eval {quote(command)} ) </dev/null 2>&1; printf '\\n{marker} %d\\n' $?\n"
+                         for command, marker in commands)
+        self.conn.send(script.encode("utf-8"))
+
+    def _read_result(self, marker, timeout):
+        token = b"\n" + marker.encode("ascii") + b" "
+        self.conn.settimeout(timeout)
+        while True:
+            pos = self.buffer.find(token)
+            if pos >= 0:
+                end = self.buffer.find(b"\n", pos + len(token))
+                if end >= 0:
+                    output = bytes(self.buffer[:pos])
+                    code = int(self.buffer[pos + len(token):end])
+                    del self.buffer[:end + 1]
+                    return code, output
+            try:
+                chunk = self.conn.recv(65536)
+            except (socket.timeout, TimeoutError):
+                raise ShellTimeout(f"No result within {timeout}s")
+            if not chunk: raise ConnectionError("Shell session closed by device")
+            self.buffer.extend(chunk)
+
+    def run(self, command, timeout=DEFAULT_TIMEOUT):
+        return self.run_many([command], timeout)[0]
+
+    def run_many(self, commands, timeout=DEFAULT_TIMEOUT):
+        """ Runs ``commands`` back to back on the session; returns one ``ShellResult`` each """
+        with self.lock:
+            results = []
+            pending = list(commands)
+            retried = False
+            while pending:
+                batch = [(command, self._marker()) for command in pending]
+                try:
+                    if self.conn is None: self._connect()
+                    self._send(batch)
+                    for command, marker in batch:
+                        code, output = self._read_result(marker, timeout)
+                        results.append(ShellResult(command, code, output.decode("utf-8", errors="replace")))
+                        pending.pop(0)
+                except ShellTimeout:
+                    # The hung command still owns the shell; drop the session so the next call starts clean
+                    self.close()
+                    raise
+                except (OSError, AdbError) as e:
+                    self.close()
+                    # Only retry when the failed command produced nothing yet, so nothing runs twice that we saw start
+                    if retried or self.buffer: raise ShellError(f"Shell session to {self.serial} lost: {str(e)}")
+                    retried = True
+            return results
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def shell_for(serial, root=False):
+    """ Shared session per (device, root); created on first use """
+    with _sessions_lock:
+        session = _sessions.get((serial, root))
+        if session is None:
+            session = _sessions[(serial, root)] = ShellSession(serial, root=root)
+        return session
+
+def shell(serial, command, root=False, timeout=DEFAULT_TIMEOUT, log=None, progress=None, report=None):
+    """ Runs one command on the shared session and returns its ``ShellResult`` """
+    return shell_for(serial, root).run(command, timeout)
+
+def drop_session(serial):
+    with _sessions_lock:
+        for key in [k for k in _sessions if k[0] == serial]:
+            _sessions.pop(key).close()
+
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,256 @@
+import os
+import mmap
+import bisect
+import struct
+import hashlib
+from core.fastboot_client import (SPARSE_MAGIC, SPARSE_HEADER, CHUNK_HEADER, CHUNK_RAW, CHUNK_FILL,
+                                  CHUNK_DONT_CARE, CHUNK_CRC32)
+
+# Queue entries for one logical partition inside a super image are stored as
+# "super.img!lp/system_a" and extracted right before flashing, like zip refs.
+SUPER_REF_SEP = "!lp/"
+STREAM_CHUNK = 4 * 1024 * 1024
+
+# liblp on-disk format (system/core/fs_mgr/liblp/include/liblp/metadata_format.h)
+SECTOR_SIZE = 512
+PARTITION_RESERVED_BYTES = 4096
+GEOMETRY_SIZE = 4096
+GEOMETRY_MAGIC = 0x616C4467
+HEADER_MAGIC = 0x414C5030
+GEOMETRY = struct.Struct("<II32sIII")
+HEADER = struct.Struct("<IHHI32sI32s12I")
+PARTITION = struct.Struct("<36sIIII")
+EXTENT = struct.Struct("<QIQI")
+GROUP = struct.Struct("<36sIQ")
+BLOCK_DEVICE = struct.Struct("<QIIQ36sI")
+TARGET_LINEAR, TARGET_ZERO = 0, 1
+ATTR_READONLY, ATTR_SLOT_SUFFIXED, ATTR_UPDATED, ATTR_DISABLED = 1, 2, 4, 8
+
+class SuperImageError(Exception):
+    pass
+
+class ImageReader:
+    """ Random access to a raw or Android sparse image through one mmap.
+
+    ``read`` returns bytes; ``iter_range`` yields memoryviews into the map
+    for stored data, ``bytes`` for fill patterns and an ``int`` byte count
+    for runs of zeros (don't-care chunks), so writers can leave holes.
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise SuperImageError(f"{os.path.basename(path)} is empty")
+        self.view = memoryview(self.map)
+        self.sparse = len(self.view) >= SPARSE_HEADER.size and struct.unpack_from("<I", self.view)[0] == SPARSE_MAGIC
+        self.size = len(self.view)
+        if self.sparse: self._index_sparse()
+
+    def _index_sparse(self):
+        _, major, _, hdr_size, chunk_hdr_size, blk_size, total_blocks, total_chunks, _ = SPARSE_HEADER.unpack_from(self.view)
+        if major != 1: raise SuperImageError(f"Unsupported sparse image version {major}")
+        # (raw start, raw length, kind, file offset of the payload)
+        self.chunks, offset, position = [], hdr_size, 0
+        for _ in range(total_chunks):
+            kind, _, blocks, total_size = CHUNK_HEADER.unpack_from(self.view, offset)
+            if kind == CHUNK_CRC32:
+                offset += total_size
+                continue
+            if kind not in (CHUNK_RAW, CHUNK_FILL, CHUNK_DONT_CARE): raise SuperImageError(f"Corrupt sparse image (chunk type {kind:#x})")
+            self.chunks.append((position, blocks * blk_size, kind, offset + chunk_hdr_size))
+            position += blocks * blk_size
+            offset += total_size
+        self.starts = [chunk[0] for chunk in self.chunks]
+        self.size = total_blocks * blk_size
+
+    def iter_range(self, offset, length, chunk_size=STREAM_CHUNK):
+        if offset + length > self.size: raise SuperImageError("Read beyond the end of the image")
+        end = offset + length
+        while offset < end:
+            step = min(chunk_size, end - offset)
+            if not self.sparse:
+                yield self.view[offset:offset + step]
+                offset += step
+                continue
+            i = bisect.bisect_right(self.starts, offset) - 1
+            start, size, kind, data = self.chunks[i]
+            step = min(step, start + size - offset)
+            inner = offset - start
+            if kind == CHUNK_RAW:
+                yield self.view[data + inner:data + inner + step]
+            elif kind == CHUNK_FILL:
+                pattern = bytes(self.view[data:data + 4])
+                rotated = pattern[inner % 4:] + pattern[:inner % 4]
+                yield (rotated * (step // 4 + 1))[:step]
+            else:
+                yield step
+            offset += step
+
+    def read(self, offset, length):
+        # bytes(n) is n zeros, so holes and data join the same way
+        return b"".join(bytes(piece) for piece in self.iter_range(offset, length))
+
+    def close(self):
+        self.view.release()
+        try: self.map.close()
+        except BufferError: pass
+        self.file.close()
+
+def _name(raw):
+    return raw.split(b"\0", 1)[0].decode("ascii", errors="replace")
+
+def _table(data, desc, entry_struct):
+    offset, count, entry_size = desc
+    if entry_size < entry_struct.size or offset + count * entry_size > len(data): raise SuperImageError("Corrupt metadata table")
+    return [entry_struct.unpack_from(data, offset + i * entry_size) for i in range(count)]
+
+def parse_geometry(data):
+    magic, struct_size, checksum, max_size, slot_count, block_size = GEOMETRY.unpack_from(data)
+    if magic != GEOMETRY_MAGIC: raise SuperImageError("No liblp geometry")
+    zeroed = bytearray(data[:struct_size])
+    zeroed[8:40] = bytes(32)
+    if hashlib.sha256(zeroed).digest() != checksum: raise SuperImageError("Geometry checksum mismatch")
+    return {"metadata_max_size": max_size, "metadata_slot_count": slot_count, "logical_block_size": block_size}
+
+def parse_metadata(data):
+    """ Partitions, groups and block devices from one metadata slot (header + tables) """
+    fields = HEADER.unpack_from(data)
+    magic, major, minor, header_size, header_checksum, tables_size, tables_checksum = fields[:7]
+    if magic != HEADER_MAGIC: raise SuperImageError("No liblp metadata header")
+    if major != 10: raise SuperImageError(f"Unsupported metadata version {major}.{minor}")
+    zeroed = bytearray(data[:header_size])
+    zeroed[12:44] = bytes(32)
+    if hashlib.sha256(zeroed).digest() != header_checksum: raise SuperImageError("Metadata header checksum mismatch")
+    tables = data[header_size:header_size + tables_size]
+    if hashlib.sha256(tables).digest() != tables_checksum: raise SuperImageError("Metadata tables checksum mismatch")
+    descs = [fields[7 + i * 3:10 + i * 3] for i in range(4)]
+    extents = _table(tables, descs[1], EXTENT)
+    groups = [{"name": _name(name), "flags": flags, "maximum_size": max_size} for name, flags, max_size in _table(tables, descs[2], GROUP)]
+    block_devices = [{"name": _name(name), "first_logical_sector": first, "size": size}
+                     for first, _, _, size, name, _ in _table(tables, descs[3], BLOCK_DEVICE)]
+    partitions = []
+    for name, attributes, first, count, group in _table(tables, descs[0], PARTITION):
+        part_extents = []
+        for num_sectors, target_type, target_data, source in extents[first:first + count]:
+            part_extents.append({"type": target_type, "length": num_sectors * SECTOR_SIZE,
+                                 "offset": target_data * SECTOR_SIZE if target_type == TARGET_LINEAR else None, "source": source})
+        partitions.append({"name": _name(name), "attributes": attributes, "extents": part_extents,
+                           "size": sum(e["length"] for e in part_extents),
+                           "group": groups[group]["name"] if group < len(groups) else ""})
+    return {"version": f"{major}.{minor}", "partitions": partitions, "groups": groups, "block_devices": block_devices}
+
+class SuperImage:
+    """ A super image (raw or sparse) with its liblp metadata; logical partitions stream out of the mmap """
+    def __init__(self, path, slot=0):
+        self.path = path
+        self.reader = ImageReader(path)
+        try:
+            self.geometry, self.metadata = self._load(slot)
+        except Exception:
+            self.reader.close()
+            raise
+        self.partitions = {p["name"]: p for p in self.metadata["partitions"]}
+
+    def _load(self, slot):
+        if self.reader.size < PARTITION_RESERVED_BYTES + 2 * GEOMETRY_SIZE: raise SuperImageError("Not a super image (too small)")
+        geometry = None
+        for offset in (PARTITION_RESERVED_BYTES, PARTITION_RESERVED_BYTES + GEOMETRY_SIZE):
+            try:
+                geometry = parse_geometry(self.reader.read(offset, GEOMETRY_SIZE))
+                break
+            except SuperImageError as e:
+                error = e
+        if geometry is None: raise SuperImageError(f"Not a super image ({str(error)})")
+        max_size, slots = geometry["metadata_max_size"], geometry["metadata_slot_count"]
+        primary = PARTITION_RESERVED_BYTES + 2 * GEOMETRY_SIZE
+        # Fall back to the backup copy when the primary slot is damaged
+        for offset in (primary + slot * max_size, primary + (slots + slot) * max_size):
+            try:
+                return geometry, parse_metadata(self.reader.read(offset, max_size))
+            except SuperImageError as e:
+                error = e
+        raise error
+
+    @property
+    def sparse(self):
+        return self.reader.sparse
+
+    def logical_partitions(self):
+        """ Partitions that hold data, in metadata order (empty ``_b`` slots of factory images are left out) """
+        return [p for p in self.metadata["partitions"] if p["size"] > 0]
+
+    def iter_partition(self, name, chunk_size=STREAM_CHUNK):
+        """ Yields the partition's bytes extent by extent; ``int`` items are runs of zeros """
+        part = self.partitions.get(name)
+        if part is None: raise SuperImageError(f"No logical partition {name}")
+        for extent in part["extents"]:
+            if extent["type"] == TARGET_ZERO:
+                yield extent["length"]
+            elif extent["source"] != 0:
+                raise SuperImageError(f"{name} has extents on another block device")
+            else:
+                yield from self.reader.iter_range(extent["offset"], extent["length"], chunk_size)
+
+    def extract(self, name, out_path, progress=None):
+        if name not in self.partitions: raise SuperImageError(f"No logical partition {name}")
+        total, done = self.partitions[name]["size"], 0
+        with open(out_path, "wb") as out:
+            for piece in self.iter_partition(name):
+                if isinstance(piece, int):
+                    out.seek(piece, os.SEEK_CUR)
+                    done += piece
+                else:
+                    out.write(piece)
+                    done += len(piece)
+                if progress: progress(done // 1024, max(total // 1024, 1))
+            out.truncate(done)
+        return out_path
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def is_super_image(path):
+    """ True when ``path`` carries liblp geometry; sparse images are checked through their chunk map """
+    try:
+        reader = ImageReader(path)
+    except (OSError, SuperImageError):
+        return False
+    try:
+        return struct.unpack("<I", reader.read(PARTITION_RESERVED_BYTES, 4))[0] == GEOMETRY_MAGIC
+    except (SuperImageError, struct.error):
+        return False
+    finally:
+        reader.close()
+
+def read_super_layout(path):
+    with SuperImage(path) as image:
+        return {"sparse": image.sparse, "version": image.metadata["version"],
+                "groups": image.metadata["groups"], "partitions": image.logical_partitions()}
+
+def make_super_ref(path, name):
+    return f"{path}{SUPER_REF_SEP}{name}"
+
+def is_super_ref(path):
+    return SUPER_REF_SEP in path
+
+def stage_super_partition(ref, cache_dir, log=None, progress=None, report=None):
+    """ Extracts one logical partition from a super image to ``cache_dir`` and returns its path """
+    path, name = ref.split(SUPER_REF_SEP, 1)
+    os.makedirs(cache_dir, exist_ok=True)
+    out_path = os.path.join(cache_dir, f"{name}.img")
+    try:
+        with SuperImage(path) as image:
+            image.extract(name, out_path, progress)
+    except Exception:
+        if os.path.exists(out_path): os.remove(out_path)
+        raise
+    if log: log(f"Staged {name} from {os.path.basename(path)}")
+    return out_path
@@ -0,0 +1,149 @@
+import re
+import time
+from core.shell_session import shell
+
+# Everything is read by one shell invocation per tick; sections are split on
+# the @@ markers and all deltas are computed on the host.
+TELEMETRY_SCRIPT = "; ".join([
+    "echo @@stat", "cat /proc/stat",
+    "echo @@meminfo", "cat /proc/meminfo",
+    "echo @@thermal",
+    "for z in /sys/class/thermal/thermal_zone*; do echo $(cat $z/type 2>/dev/null) $(cat $z/temp 2>/dev/null); done",
+    "echo @@cpufreq",
+    "for c in /sys/devices/system/cpu/cpu[0-9]*; do echo ${c##*/} $(cat $c/cpufreq/scaling_cur_freq 2>/dev/null); done",
+    "echo @@battery",
+    "for f in capacity temp; do echo $f $(cat /sys/class/power_supply/battery/$f 2>/dev/null); done",
+    "echo @@df", "df /data",
+])
+
+def split_sections(text):
+    sections, current = {}, None
+    for line in text.splitlines():
+        line = line.rstrip("\r")
+        if line.startswith("@@"):
+            current = line[2:]
+            sections[current] = []
+        elif current is not None and line.strip():
+            sections[current].append(line)
+    return sections
+
+def parse_proc_stat(lines):
+    """ ``{cpu: (busy_jiffies, total_jiffies)}`` for the aggregate line and each core """
+    times = {}
+    for line in lines:
+        if not line.startswith("cpu"): continue
+        parts = line.split()
+        values = [int(v) for v in parts[1:] if v.isdigit()]
+        if len(values) < 4: continue
+        # idle + iowait count as not busy; guest time is already inside user/nice
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        total = sum(values[:8])
+        times[parts[0]] = (total - idle, total)
+    return times
+
+def cpu_utilisation(previous, current):
+    usage = {}
+    for cpu, (busy, total) in current.items():
+        if cpu not in previous: continue
+        d_total = total - previous[cpu][1]
+        # An offlined core stops counting; a hotplugged one restarts from zero
+        if d_total <= 0: continue
+        usage[cpu] = max(0.0, min(100.0, 100.0 * (busy - previous[cpu][0]) / d_total))
+    return usage
+
+def parse_meminfo(lines):
+    info = {}
+    for line in lines:
+        match = re.match(r"(\w+):\s+(\d+)", line)
+        if match: info[match.group(1)] = int(match.group(2))
+    total = info.get("MemTotal")
+    if not total: return {}
+    available = info.get("MemAvailable", info.get("MemFree", 0) + info.get("Cached", 0))
+    return {"total_kb": total, "available_kb": available, "used_pct": 100.0 * (total - available) / total,
+            "swap_used_kb": info.get("SwapTotal", 0) - info.get("SwapFree", 0)}
+
+def parse_thermal(lines):
+    zones = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) != 2 or not parts[1].lstrip("-").isdigit(): continue
+        value = int(parts[1])
+        # Most zones report millidegrees, a few older ones whole degrees
+        celsius = value / 1000 if abs(value) >= 1000 else float(value)
+        name = parts[0]
+        n = 2
+        while name in zones:
+            name = f"{parts[0]}#{n}"
+            n += 1
+        zones[name] = celsius
+    return zones
+
+def parse_cpufreq(lines):
+    freqs = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit(): freqs[parts[0]] = int(parts[1]) // 1000
+    return freqs
+
+def parse_battery(lines):
+    """ ``capacity`` / ``temp`` lines, each named, so a missing file cannot shift the other value """
+    battery = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) != 2 or not parts[1].lstrip("-").isdigit(): continue
+        if parts[0] == "capacity": battery["pct"] = int(parts[1])
+        elif parts[0] == "temp": battery["temp_c"] = int(parts[1]) / 10
+    return battery
+
+def parse_df(lines):
+    if len(lines) < 2: return None
+    parts = lines[-1].split()
+    for part in parts:
+        if part.endswith("%") and part[:-1].isdigit(): return int(part[:-1])
+    return None
+
+class TelemetryCollector:
+    """ Turns one raw telemetry read per tick into samples; keeps the previous /proc/stat per device for deltas """
+    def __init__(self, read=None):
+        self.read = read or self.read_device
+        self.previous_stat = {}
+
+    @staticmethod
+    def read_device(serial):
+        return shell(serial, TELEMETRY_SCRIPT).output
+
+    def collect(self, serial, log=None, progress=None, report=None):
+        """ Returns a JSON-serialisable sample dict; CPU utilisation is empty on the first tick of a device """
+        sections = split_sections(self.read(serial))
+        stat = parse_proc_stat(sections.get("stat", []))
+        cpu = cpu_utilisation(self.previous_stat.get(serial, {}), stat)
+        self.previous_stat[serial] = stat
+        battery = parse_battery(sections.get("battery", []))
+        return {
+            "timestamp": time.time(),
+            "serial": serial,
+            "cpu_pct": cpu,
+            "memory": parse_meminfo(sections.get("meminfo", [])),
+            "thermal_c": parse_thermal(sections.get("thermal", [])),
+            "cpufreq_mhz": parse_cpufreq(sections.get("cpufreq", [])),
+            "battery_pct": battery.get("pct"),
+            "battery_temp_c": battery.get("temp_c"),
+            "storage_pct": parse_df(sections.get("df", [])),
+        }
+
+def flatten_sample(sample):
+    """ Flat ``{metric: number}`` view of a sample, as recorded in the metrics history """
+    values = {}
+    for cpu, pct in sample["cpu_pct"].items():
+        values[f"{cpu}_pct"] = pct
+    if sample["memory"]:
+        values["mem_used_pct"] = sample["memory"]["used_pct"]
+    for zone, celsius in sample["thermal_c"].items():
+        values[f"thermal_{zone}_c"] = celsius
+    if sample["thermal_c"]:
+        values["thermal_max_c"] = max(sample["thermal_c"].values())
+    for cpu, mhz in sample["cpufreq_mhz"].items():
+        values[f"{cpu}_mhz"] = mhz
+    for key in ("battery_pct", "battery_temp_c", "storage_pct"):
+        if sample[key] is not None: values[key] = sample[key]
+    return values
@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.adb_transport import host_query
+from core.shell_session import shell_for, drop_session
+
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+ENDPOINT = re.compile(r"^[\w.\-\[\]:]+:\d+$")
+# Android 11+ wireless debugging advertises these; the pairing service is only useful for `adb pair`
+CONNECT_SERVICES = ("_adb-tls-connect._tcp", "_adb._tcp")
+PAIRING_SERVICE = "_adb-tls-pairing._tcp"
+
+class WirelessError(Exception):
+    pass
+
+def parse_mdns_services(text):
+    """ ``[{"name", "service", "address"}]`` from ``host:mdns:services`` (same text as `adb mdns services`) """
+    services = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and parts[1].startswith("_adb") and ENDPOINT.match(parts[-1]):
+            services.append({"name": parts[0], "service": parts[1].rstrip("."), "address": parts[-1]})
+    return services
+
+def parse_device_states(text):
+    states = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2: states[parts[0]] = parts[1]
+    return states
+
+def connect_endpoint(address, log=None, progress=None, report=None):
+    """ ``adb connect`` through the server socket; returns the server's message or raises ``WirelessError`` """
+    reply = host_query(f"host:connect:{address}").strip()
+    if reply.startswith("connected to") or reply.startswith("already connected"): return reply
+    raise WirelessError(reply or "no reply from adb server")
+
+def disconnect_endpoint(address):
+    return host_query(f"host:disconnect:{address}").strip()
+
+def probe_latency(address, timeout=5):
+    """ Round trip of a no-op through adbd on the device, in milliseconds.
+
+    Uses the shared shell session, so after the first probe this measures
+    the link rather than stream setup.
+    """
+    start = time.perf_counter()
+    shell_for(address).run(":", timeout=timeout)
+    return (time.perf_counter() - start) * 1000
+
+class EndpointPool:
+    """ Known wireless endpoints, persisted as JSON so the pool survives restarts """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        try:
+            with open(path, "r") as f:
+                for address, meta in json.load(f).items():
+                    self.endpoints[address] = {"name": meta.get("name", ""), "added": meta.get("added", 0), "last_connected": meta.get("last_connected")}
+        except (OSError, ValueError):
+            pass
+
+    def add(self, address, name=""):
+        if not ENDPOINT.match(address): raise WirelessError(f"Not an IP:port endpoint: {address}")
+        with self.lock:
+            entry = self.endpoints.setdefault(address, {"name": name, "added": time.time(), "last_connected": None})
+            if name: entry["name"] = name
+        self.save()
+
+    def remove(self, address):
+        with self.lock:
+            self.endpoints.pop(address, None)
+        self.save()
+
+    def mark_connected(self, address):
+        with self.lock:
+            if address in self.endpoints: self.endpoints[address]["last_connected"] = time.time()
+
+    def addresses(self):
+        with self.lock:
+            return list(self.endpoints)
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.endpoints, indent=2)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
+class WirelessManager:
+    """ Keeps every endpoint in the pool connected.
+
+    Each round reads the adb server's device list once, probes latency on
+    connected endpoints and reconnects dropped ones in parallel, backing
+    off exponentially (with jitter) per endpoint so a powered-off phone
+    is not hammered. ``report`` receives one status dict per endpoint per
+    round.
+    """
+    def __init__(self, pool, workers=8, connect=connect_endpoint, probe=probe_latency,
+                 list_states=lambda: parse_device_states(host_query("host:devices")),
+                 list_services=lambda: parse_mdns_services(host_query("host:mdns:services"))):
+        self.pool = pool
+        self.workers = workers
+        self.connect = connect
+        self.probe = probe
+        self.list_states = list_states
+        self.list_services = list_services
+        self.status = {}
+
+    def discover(self, log=None, progress=None, report=None):
+        """ Adds mDNS-advertised connect endpoints to the pool; returns the pairing services seen """
+        found, pairing = 0, []
+        for service in self.list_services():
+            if service["service"] in CONNECT_SERVICES:
+                if service["address"] not in self.pool.endpoints: found += 1
+                self.pool.add(service["address"], service["name"])
+            elif service["service"] == PAIRING_SERVICE:
+                pairing.append(service)
+        if log: log(f"mDNS discovery: {found} new endpoint(s), {len(pairing)} device(s) waiting to pair")
+        return pairing
+
+    def _backoff(self, failures):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, failures - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _check(self, address, state, now, log):
+        status = self.status.setdefault(address, {"address": address, "state": "unknown", "latency_ms": None,
+                                                  "failures": 0, "next_retry": 0.0, "error": None})
+        status["name"] = self.pool.endpoints.get(address, {}).get("name", "")
+        if state == "device":
+            try:
+                status["latency_ms"] = self.probe(address)
+                if status["state"] != "connected" and log: log(f"{address} connected ({status['latency_ms']:.0f} ms)")
+                status.update(state="connected", failures=0, error=None)
+                self.pool.mark_connected(address)
+                return dict(status)
+            except Exception as e:
+                # Listed as a device but not answering: force a fresh connection
+                status["error"] = str(e)
+                drop_session(address)
+                try: disconnect_endpoint(address)
+                except Exception: pass
+        if now < status["next_retry"]:
+            status["state"] = "waiting"
+            return dict(status)
+        recovering = status["state"] in ("connected", "offline", "waiting")
+        try:
+            self.connect(address)
+            status.update(state="reconnected" if recovering else "connected", failures=0,
+                          error=None, next_retry=0.0, latency_ms=None)
+            self.pool.mark_connected(address)
+            if log: log(f"{address}: {status['state']}")
+        except Exception as e:
+            status["failures"] += 1
+            status.update(state="offline", error=str(e), latency_ms=None, next_retry=now + self._backoff(status["failures"]))
+            if log and status["failures"] == 1: log(f"{address} dropped: {str(e)}")
+        return dict(status)
+
+    def round(self, log=None, progress=None, report=None):
+        try:
+            states = self.list_states()
+        except Exception as e:
+            if log: log(f"Error: adb server unreachable: {str(e)}")
+            return []
+        addresses = self.pool.addresses()
+        now = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(addresses) or 1))) as pool:
+            results = list(pool.map(lambda a: self._check(a, states.get(a), now, log), addresses))
+        for address in list(self.status):
+            if address not in addresses: del self.status[address]
+        if report:
+            for status in results: report(status)
+        self.pool.save()
+        return results
+
+    def run(self, cancel_event, interval=10.0, discover_every=6, log=None, progress=None, report=None):
+        """ Keepalive loop until ``cancel_event`` is set; mDNS discovery runs every ``discover_every`` rounds """
+        rounds = 0
+        while not cancel_event.is_set():
+            if rounds % discover_every == 0:
+                try: self.discover(log=log)
+                except Exception as e:
+                    if log: log(f"mDNS discovery unavailable: {str(e)}")
+            self.round(log=log, report=report)
+            rounds += 1
+            cancel_event.wait(interval)
@@ -1,8 +1,11 @@
 import sys
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 def main():
+    # Required for the process pools used by the extractors in frozen builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
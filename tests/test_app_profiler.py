@@ -0,0 +1,83 @@
+import os
+import pytest
+from core.app_profiler import (parse_framestats, parse_proc_entries, summarize, percentile, estimate_frame_budget,
+                               profile_app, ProfileError)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# Durations of the valid frames in gfxinfo_framestats.txt, in ms
+FRAME_MS = [5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 25, 30, 40, 50]
+
+def fixture_lines(name):
+    with open(os.path.join(FIXTURES, name), "r") as f:
+        return f.read().splitlines()
+
+def test_parse_framestats_reads_every_window_and_skips_flagged_frames():
+    frames = parse_framestats(fixture_lines("gfxinfo_framestats.txt"))
+    assert [d / 1e6 for _, d in frames] == FRAME_MS
+    starts = [start for start, _ in frames]
+    assert starts == sorted(starts) and len(set(starts)) == len(starts)
+
+def test_parse_framestats_ignores_text_outside_profile_data():
+    assert parse_framestats(["Total frames rendered: 1287", "50th percentile: 9ms"]) == []
+
+def test_parse_proc_entries_sums_all_processes():
+    # The second process's comm contains a space
+    assert parse_proc_entries(fixture_lines("proc_entries.txt")) == {"jiffies": 1500 + 420 + 300 + 80,
+                                                                     "rss_kb": 245760 + 81920, "processes": 2}
+
+def test_parse_proc_entries_without_processes():
+    assert parse_proc_entries([]) == {"jiffies": 0, "rss_kb": 0, "processes": 0}
+
+def test_frame_budget_comes_from_vsync_spacing():
+    frames = parse_framestats(fixture_lines("gfxinfo_framestats.txt"))
+    assert estimate_frame_budget(frames) == pytest.approx(1000 / 60, abs=0.001)
+    assert estimate_frame_budget([]) == pytest.approx(1000 / 60)
+
+def test_summarize_percentiles_and_jank():
+    frames = parse_framestats(fixture_lines("gfxinfo_framestats.txt"))
+    summary = summarize([d / 1e6 for _, d in frames], [12.5, 30.0], [245760, 327680], estimate_frame_budget(frames))
+    assert summary["frames"] == 20
+    assert (summary["p50_ms"], summary["p90_ms"], summary["p99_ms"]) == (14, 30, 50)
+    # 17, 18, 19, 20, 25, 30, 40 and 50 ms miss a 16.67 ms budget
+    assert summary["janky_ratio"] == pytest.approx(8 / 20)
+    assert summary["frame_budget_ms"] == 16.67
+    assert (summary["cpu_avg_pct"], summary["cpu_max_pct"]) == (21.25, 30.0)
+    assert (summary["rss_avg_kb"], summary["rss_max_kb"]) == (286720, 327680)
+
+def test_summarize_without_frames():
+    summary = summarize([], [], [], 1000 / 60)
+    assert summary["frames"] == 0 and summary["p50_ms"] is None and summary["janky_ratio"] is None
+
+def test_percentile_is_nearest_rank():
+    assert percentile([1, 2, 3, 4], 50) == 2
+    assert percentile([1, 2, 3, 4], 99) == 4
+    assert percentile([], 50) is None
+
+def test_profile_app_dedups_repeated_frames_and_computes_cpu():
+    gfx = "\n".join(fixture_lines("gfxinfo_framestats.txt"))
+    proc = fixture_lines("proc_entries.txt")
+    # framestats repeats the same frames on both ticks; the app burns 240 of 1000 jiffies in between
+    later = [line.replace(" 1500 420 ", " 1700 460 ") for line in proc]
+    ticks = iter([(1000, proc), (2000, later)])
+    def read(serial, package):
+        total, entries = next(ticks)
+        return "\n".join(["@@gfx", gfx, "@@stat", f"cpu  {total} 0 0 0 0 0 0 0 0 0", "@@proc", *entries])
+    session = profile_app("SERIAL", "com.example.app", interval=0, duration=60, read=read, fingerprint=None,
+                          cancel_event=_StopAfter(2))
+    assert session["summary"]["frames"] == 20
+    assert session["frame_ms"] == FRAME_MS
+    assert [s["cpu_pct"] for s in session["samples"]] == [None, pytest.approx(24.0)]
+    assert session["summary"]["rss_max_kb"] == 327680
+
+def test_profile_app_rejects_bad_package_names():
+    with pytest.raises(ProfileError):
+        profile_app("SERIAL", "com.example; reboot", read=None, fingerprint=None)
+
+class _StopAfter:
+    """ A cancel event that fires after ``ticks`` waits """
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def wait(self, timeout=None):
+        self.ticks -= 1
+        return self.ticks <= 0
@@ -0,0 +1,212 @@
+import os
+import socket
+import struct
+import threading
+import pytest
+from core.fastboot_client import (FastbootClient, FastbootError, TcpTransport, split_sparse, flash_partition,
+                                  getvar_all, SPARSE_MAGIC, SPARSE_HEADER, CHUNK_HEADER, CHUNK_RAW, CHUNK_FILL,
+                                  CHUNK_DONT_CARE, CHUNK_CRC32, BLOCK_SIZE)
+
+def unsparse(data, image=None):
+    """ Applies one sparse image to ``image`` (a bytearray), leaving don't-care blocks untouched """
+    _, _, _, hdr_size, chunk_hdr_size, blk_size, total_blocks, total_chunks, _ = SPARSE_HEADER.unpack_from(data)
+    if image is None: image = bytearray(total_blocks * blk_size)
+    offset, block = hdr_size, 0
+    for _ in range(total_chunks):
+        kind, _, blocks, total_size = CHUNK_HEADER.unpack_from(data, offset)
+        body = data[offset + chunk_hdr_size:offset + total_size]
+        if kind == CHUNK_RAW: image[block * blk_size:(block + blocks) * blk_size] = body
+        elif kind == CHUNK_FILL: image[block * blk_size:(block + blocks) * blk_size] = body * (blocks * blk_size // 4)
+        else: assert kind in (CHUNK_DONT_CARE, CHUNK_CRC32)
+        offset += total_size
+        block += blocks
+    assert block == total_blocks
+    return image
+
+def make_sparse(chunks):
+    """ A sparse image from ``(kind, blocks, payload)`` tuples """
+    body = b"".join(CHUNK_HEADER.pack(kind, 0, blocks, CHUNK_HEADER.size + len(payload)) + payload
+                    for kind, blocks, payload in chunks)
+    total_blocks = sum(blocks for _, blocks, _ in chunks)
+    return SPARSE_HEADER.pack(SPARSE_MAGIC, 1, 0, SPARSE_HEADER.size, CHUNK_HEADER.size, BLOCK_SIZE,
+                              total_blocks, len(chunks), 0) + body
+
+class FakeFastboot:
+    """ Just enough of a fastboot-over-TCP bootloader to flash against """
+    def __init__(self, max_download=64 * 1024, variables=None, fail=()):
+        self.max_download = max_download
+        self.variables = variables or {}
+        self.fail = set(fail)
+        self.downloads = []
+        self.flashed = {}
+        self.commands = []
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(4)
+        self.serial = f"tcp:127.0.0.1:{self.server.getsockname()[1]}"
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.close()
+
+    def _serve(self):
+        while True:
+            try: conn, _ = self.server.accept()
+            except OSError: return
+            with conn:
+                try: self._session(conn)
+                except (ConnectionError, OSError): pass
+
+    @staticmethod
+    def _recv_exact(conn, size):
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = conn.recv(size - len(buf))
+            if not chunk: raise ConnectionError("closed")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _recv(self, conn):
+        length, = struct.unpack(">Q", self._recv_exact(conn, 8))
+        return self._recv_exact(conn, length)
+
+    def _send(self, conn, status, message=""):
+        packet = status.encode() + message.encode()
+        conn.sendall(struct.pack(">Q", len(packet)) + packet)
+
+    def _session(self, conn):
+        if self._recv_exact(conn, 4) != b"FB01": return
+        conn.sendall(b"FB01")
+        pending = None
+        while True:
+            command = self._recv(conn).decode()
+            self.commands.append(command)
+            if command == "getvar:all":
+                for name, value in self.variables.items(): self._send(conn, "INFO", f"{name}:{value}")
+                self._send(conn, "OKAY")
+            elif command == "getvar:max-download-size":
+                self._send(conn, "OKAY", f"0x{self.max_download:08x}")
+            elif command.startswith("getvar:"):
+                self._send(conn, "OKAY", self.variables.get(command[7:], ""))
+            elif command.startswith("download:"):
+                size = int(command[9:], 16)
+                if size > self.max_download:
+                    self._send(conn, "FAIL", "data too large")
+                    continue
+                self._send(conn, "DATA", f"{size:08x}")
+                data = bytearray()
+                while len(data) < size: data.extend(self._recv(conn))
+                pending = bytes(data)
+                self.downloads.append(pending)
+                self._send(conn, "OKAY")
+            elif command.startswith("flash:"):
+                partition = command[6:]
+                if partition in self.fail:
+                    self._send(conn, "INFO", "writing")
+                    self._send(conn, "FAIL", "partition is locked")
+                    continue
+                self.flashed.setdefault(partition, []).append(pending)
+                self._send(conn, "OKAY")
+            else:
+                self._send(conn, "FAIL", f"unknown command {command}")
+
+@pytest.fixture
+def device():
+    fake = FakeFastboot(variables={"product": "sargo", "partition-size:boot_a": "0x4000000", "is-userspace": "no"})
+    yield fake
+    fake.close()
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_handshake(device):
+    transport = TcpTransport("127.0.0.1", int(device.serial.rsplit(":", 1)[1]))
+    transport.close()
+
+def test_handshake_rejects_other_services():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    def reply():
+        conn, _ = server.accept()
+        conn.recv(4)
+        conn.sendall(b"HTTP")
+        conn.close()
+    threading.Thread(target=reply, daemon=True).start()
+    with pytest.raises(FastbootError, match="Not a fastboot endpoint"):
+        TcpTransport("127.0.0.1", server.getsockname()[1])
+    server.close()
+
+def test_getvar_all_parses_info_lines(device):
+    lines = []
+    variables = getvar_all(device.serial, log=lines.append)
+    assert variables == {"product": "sargo", "partition-size:boot_a": "0x4000000", "is-userspace": "no"}
+
+def test_raw_flash_is_sent_as_is(device, tmp_path):
+    data = os.urandom(40 * 1024 + 123)
+    progress = []
+    flash_partition(device.serial, "boot_a", write(tmp_path, "boot.img", data), progress=lambda *p: progress.append(p))
+    assert device.flashed["boot_a"] == [data]
+    assert progress[-1] == (len(data) // 1024, len(data) // 1024)
+
+def test_oversized_raw_flash_is_resparsed(device, tmp_path):
+    data = os.urandom(300 * 1024 + 5)
+    flash_partition(device.serial, "system_a", write(tmp_path, "system.img", data))
+    parts = device.flashed["system_a"]
+    assert len(parts) > 1
+    assert all(len(part) <= device.max_download for part in parts)
+    image = None
+    for part in parts: image = unsparse(part, image)
+    assert bytes(image[:len(data)]) == data and not any(image[len(data):])
+
+def test_sparse_input_flash(device, tmp_path):
+    raw = os.urandom(3 * BLOCK_SIZE)
+    small = make_sparse([(CHUNK_RAW, 3, raw), (CHUNK_FILL, 2, b"\xaa\xbb\xcc\xdd"), (CHUNK_DONT_CARE, 4, b"")])
+    flash_partition(device.serial, "vendor_a", write(tmp_path, "vendor.img", small))
+    assert device.flashed["vendor_a"] == [small]
+
+    big_raw = os.urandom(40 * BLOCK_SIZE)
+    big = make_sparse([(CHUNK_RAW, 40, big_raw), (CHUNK_DONT_CARE, 10, b""), (CHUNK_FILL, 20, b"\x01\x02\x03\x04")])
+    flash_partition(device.serial, "product_a", write(tmp_path, "product.img", big))
+    parts = device.flashed["product_a"]
+    assert len(parts) > 1
+    image = None
+    for part in parts: image = unsparse(part, image)
+    assert bytes(image) == bytes(unsparse(big))
+
+def test_fail_reply_raises_with_device_message(tmp_path):
+    fake = FakeFastboot(fail={"abl"})
+    try:
+        with pytest.raises(FastbootError, match="partition is locked"):
+            flash_partition(fake.serial, "abl", write(tmp_path, "abl.img", b"\x7fELF" + bytes(1000)))
+        with FastbootClient.open(fake.serial) as client:
+            with pytest.raises(FastbootError, match="unknown command"):
+                client.command("oem unlock")
+    finally:
+        fake.close()
+
+@pytest.mark.parametrize("limit", [16 * 1024, 64 * 1024, 1 << 20])
+def test_split_sparse_round_trips_raw_images(limit):
+    data = os.urandom(200 * 1024 + 7)
+    image = None
+    for size, pieces in split_sparse(memoryview(data), limit):
+        blob = b"".join(bytes(piece) for piece in pieces)
+        assert len(blob) == size <= limit
+        image = unsparse(blob, image)
+    assert bytes(image[:len(data)]) == data and not any(image[len(data):])
+
+def test_split_sparse_round_trips_sparse_images():
+    sparse = make_sparse([(CHUNK_DONT_CARE, 5, b""), (CHUNK_RAW, 30, os.urandom(30 * BLOCK_SIZE)),
+                          (CHUNK_FILL, 100, b"\xff\x00\xff\x00"), (CHUNK_CRC32, 0, b"\0\0\0\0"),
+                          (CHUNK_RAW, 7, os.urandom(7 * BLOCK_SIZE))])
+    image = None
+    for size, pieces in split_sparse(memoryview(sparse), 32 * 1024):
+        image = unsparse(b"".join(bytes(piece) for piece in pieces), image)
+    assert bytes(image) == bytes(unsparse(sparse))
+
+def test_split_sparse_rejects_tiny_limits():
+    with pytest.raises(FastbootError):
+        list(split_sparse(memoryview(bytes(BLOCK_SIZE)), 64))
@@ -1,9 +1,44 @@
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QLabel, QPushButton, QGroupBox, QHBoxLayout, QWidget
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QPen, QColor, QPolygonF
 from ui.theme import Theme
+from core.metrics_store import decimate
+
+class Sparkline(QWidget):
+    """ Min/max band of a metric's history, decimated to one point per pixel column """
+    def __init__(self, color=Theme.ACCENT, parent=None):
+        super().__init__(parent)
+        self.color = QColor(color)
+        self.mins, self.maxs = [], []
+        self.setFixedHeight(22)
+
+    def set_data(self, mins, maxs):
+        self.mins, self.maxs = mins, maxs
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.mins) < 2: return
+        w, h = self.width(), self.height()
+        mins, maxs = decimate(self.mins, self.maxs, max(w // 2, 2))
+        lo, hi = min(mins), max(maxs)
+        scale = (h - 2) / (hi - lo) if hi > lo else 0
+        step = w / (len(mins) - 1)
+        y = lambda v: h - 1 - (v - lo) * scale if scale else h / 2
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        band = QPolygonF([QPointF(i * step, y(v)) for i, v in enumerate(maxs)] +
+                         [QPointF(i * step, y(v)) for i, v in reversed(list(enumerate(mins)))])
+        fill = QColor(self.color)
+        fill.setAlpha(60)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(fill)
+        painter.drawPolygon(band)
+        painter.setPen(QPen(self.color, 1.2))
+        painter.drawPolyline(QPolygonF([QPointF(i * step, y(v)) for i, v in enumerate(maxs)]))
+        painter.end()
 
 class InfoCard(QFrame):
-    def __init__(self, title, accent_color=Theme.ACCENT, parent=None):
+    def __init__(self, title, accent_color=Theme.ACCENT, sparkline=False, parent=None):
         super().__init__(parent)
         self.accent_color = accent_color
         self.setStyleSheet(f"""
@@ -25,6 +60,7 @@ class InfoCard(QFrame):
         self.title_lbl.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 9px; font-weight: 800; letter-spacing: 1.2px;")
         
         self.val_lbl = QLabel("---")
+        self.val_color = accent_color
         self.val_lbl.setStyleSheet(f"color: {accent_color}; font-size: 15px; font-weight: bold;")
         self.val_lbl.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
         self.val_lbl.setWordWrap(True)
@@ -32,10 +68,21 @@ class InfoCard(QFrame):
         layout.addWidget(self.title_lbl)
         layout.addWidget(self.val_lbl)
 
+        self.sparkline = None
+        if sparkline:
+            self.sparkline = Sparkline(accent_color)
+            layout.addWidget(self.sparkline)
+
     def set_value(self, value, color=None):
         self.val_lbl.setText(str(value))
         current_color = color if color else self.accent_color
-        self.val_lbl.setStyleSheet(f"color: {current_color}; font-size: 15px; font-weight: bold;")
+        # Re-parsing a style sheet is expensive; only do it when the colour actually changes
+        if current_color != self.val_color:
+            self.val_color = current_color
+            self.val_lbl.setStyleSheet(f"color: {current_color}; font-size: 15px; font-weight: bold;")
+
+    def set_history(self, mins, maxs):
+        if self.sparkline: self.sparkline.set_data(mins, maxs)
 
 class ActionButton(QPushButton):
     def __init__(self, text, style="default", parent=None):
@@ -75,6 +122,13 @@ class CompactGroupBox(QGroupBox):
             }}
         """)
 
+def set_level(widget, level):
+    """ Switches a widget between the theme's ok/warn/alert styles via a dynamic property """
+    if widget.property("level") == level: return
+    widget.setProperty("level", level)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
 def create_h_layout(widgets=None, spacing=Theme.SPACING, margins=(0,0,0,0)):
     layout = QHBoxLayout()
     layout.setSpacing(spacing)
@@ -0,0 +1,136 @@
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle, QListView
+from PySide6.QtCore import Qt, QSize, QRect
+from PySide6.QtGui import QColor, QFont, QPen, QStandardItemModel, QStandardItem
+from ui.theme import Theme
+from core.fleet import is_hot
+
+STATUS_ROLE = Qt.UserRole + 1
+TILE_SIZE = QSize(210, 128)
+
+STATE_COLORS = {
+    "ADB": Theme.SUCCESS,
+    "FASTBOOT": "#FFEB3B",
+    "RECOVERY": "#FF9800",
+    "SIDELOAD": "#FF9800",
+}
+
+class FleetModel(QStandardItemModel):
+    """ One item per device, with the latest status dict under ``STATUS_ROLE``.
+
+    Polling results update single items, so only the tiles that changed
+    are repainted. Updates go through ``QStandardItem.setData`` to let Qt
+    emit ``dataChanged`` itself: emitting it from Python leaks a reference
+    per call on some PySide6 builds.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = {}
+
+    @property
+    def devices(self):
+        return [self.item(row).data(STATUS_ROLE) for row in range(self.rowCount())]
+
+    def update_device(self, status):
+        row = self.rows.get(status["serial"])
+        if row is None:
+            item = QStandardItem(status["serial"])
+            item.setEditable(False)
+            item.setData(status, STATUS_ROLE)
+            # Keep tiles in serial order no matter which device answers first
+            row = next((r for r in range(self.rowCount()) if self.item(r).text() > status["serial"]), self.rowCount())
+            self.insertRow(row, item)
+            self.rows = {self.item(r).text(): r for r in range(self.rowCount())}
+        else:
+            self.item(row).setData(status, STATUS_ROLE)
+        item = self.item(self.rows[status["serial"]])
+        tooltip = status["error"] or status.get("model") or status["serial"]
+        if item.toolTip() != tooltip: item.setToolTip(tooltip)
+
+    def retain(self, serials):
+        """ Drops devices that were not seen in the last poll """
+        keep = set(serials)
+        for row in reversed(range(self.rowCount())):
+            if self.item(row).text() not in keep: self.removeRow(row)
+        self.rows = {self.item(row).text(): row for row in range(self.rowCount())}
+
+    def counts(self):
+        devices = self.devices
+        counts = {"total": len(devices), "hot": 0, "errors": 0}
+        for status in devices:
+            counts[status["state"]] = counts.get(status["state"], 0) + 1
+            if is_hot(status): counts["hot"] += 1
+            if status["error"]: counts["errors"] += 1
+        return counts
+
+class FleetDelegate(QStyledItemDelegate):
+    """ Paints device tiles directly; colours and fonts are built once, never per paint """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.bg = QColor(Theme.BG_CARD)
+        self.bg_selected = QColor(Theme.BG_BUTTON)
+        self.border = QPen(QColor(Theme.BORDER))
+        self.text = QColor(Theme.TEXT_PRIMARY)
+        self.muted = QColor(Theme.TEXT_SECONDARY)
+        self.danger = QColor(Theme.DANGER)
+        self.accent = QColor(Theme.ACCENT)
+        self.state_colors = {state: QColor(color) for state, color in STATE_COLORS.items()}
+        self.title_font = QFont()
+        self.title_font.setBold(True)
+        self.small_font = QFont()
+        self.small_font.setPointSizeF(self.small_font.pointSizeF() * 0.85)
+
+    def sizeHint(self, option, index):
+        return TILE_SIZE
+
+    def paint(self, painter, option, index):
+        status = index.data(STATUS_ROLE)
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(self.border)
+        painter.setBrush(self.bg_selected if option.state & QStyle.State_Selected else self.bg)
+        painter.drawRoundedRect(rect, 6, 6)
+        hot = is_hot(status)
+        painter.fillRect(QRect(rect.left() + 1, rect.top() + 6, 4, rect.height() - 12),
+                         self.danger if hot or status["error"] else self.state_colors.get(status["state"], self.muted))
+
+        x, w = rect.left() + 12, rect.width() - 18
+        painter.setFont(self.title_font)
+        painter.setPen(self.text)
+        painter.drawText(QRect(x, rect.top() + 6, w, 18), Qt.AlignLeft | Qt.AlignVCenter,
+                         painter.fontMetrics().elidedText(status.get("model") or status["serial"], Qt.ElideRight, w))
+        painter.setFont(self.small_font)
+        painter.setPen(self.muted)
+        painter.drawText(QRect(x, rect.top() + 24, w, 16), Qt.AlignLeft | Qt.AlignVCenter,
+                         painter.fontMetrics().elidedText(f"{status['state']}  {status['serial']}", Qt.ElideRight, w))
+        if status["error"]:
+            lines = ["Unreachable: " + status["error"], "", ""]
+        elif status["state"] == "ADB":
+            fmt = lambda v, spec, unit: f"{v:{spec}}{unit}" if v is not None else "-"
+            lines = [f"Batt {fmt(status.get('battery_pct'), 'd', '%')}  {fmt(status.get('battery_temp_c'), '.1f', '°C')}",
+                     f"CPU {fmt(status.get('cpu_pct'), '.0f', '%')}  Max {fmt(status.get('thermal_max_c'), '.1f', '°C')}  Mem {fmt(status.get('mem_used_pct'), '.0f', '%')}",
+                     f"Storage {fmt(status.get('storage_pct'), '.0f', '%')}  Root: {status.get('root') or '-'}"]
+        else:
+            lines = ["", "", ""]
+        painter.setPen(self.danger if hot or status["error"] else self.text)
+        for i, line in enumerate(lines):
+            painter.drawText(QRect(x, rect.top() + 44 + i * 18, w, 16), Qt.AlignLeft | Qt.AlignVCenter,
+                             painter.fontMetrics().elidedText(line, Qt.ElideRight, w))
+        if status.get("job"):
+            painter.setPen(self.accent)
+            painter.drawText(QRect(x, rect.top() + 98, w, 16), Qt.AlignLeft | Qt.AlignVCenter,
+                             painter.fontMetrics().elidedText(f"Running {status['job']}", Qt.ElideRight, w))
+        painter.restore()
+
+class FleetView(QListView):
+    """ Virtualized tile grid: only visible tiles are painted and all tiles share one size """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setSpacing(4)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setItemDelegate(FleetDelegate(self))
+        self.setStyleSheet(f"QListView {{ background-color: {Theme.BG_DARK}; border: none; }}")
@@ -0,0 +1,84 @@
+import html
+import heapq
+from collections import defaultdict, deque
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QTextCursor
+from ui.theme import Theme
+
+LEVEL_COLORS = {"command": "#FFEB3B", "success": Theme.ACCENT, "error": Theme.DANGER, "info": "#E0E0E0"}
+DEVICE_RECORDS = 2000
+RENDER_LIMIT = 2000
+FLUSH_INTERVAL_MS = 100
+
+def render_record(record):
+    prefix = f"[{record['serial']}] " if record["serial"] else ""
+    return f'<font color="{LEVEL_COLORS[record["level"]]}">{html.escape(prefix + record["msg"])}</font>'
+
+class ConsoleSink:
+    """ One console widget: which records it shows (``match``) and where to re-read them from (``source``) """
+    def __init__(self, widget, match, source):
+        self.widget = widget
+        self.match = match
+        self.source = source
+        self.pending = []
+        self.stale = True
+        self.since = 0.0
+
+    def accepts(self, record):
+        return record["ts"] >= self.since and self.match(record)
+
+class ConsoleRouter(QObject):
+    """ Sends each log record to the consoles that want it.
+
+    Records are kept per device (the ``None`` buffer holds app-level lines)
+    so a chatty device cannot push a quiet one out of memory. Only visible
+    consoles are written, in one batch per FLUSH_INTERVAL_MS; a hidden
+    console is marked stale and re-rendered from the buffers the next time
+    it is shown, as is one whose filter changed (``invalidate``).
+    """
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.buffers = defaultdict(lambda: deque(maxlen=DEVICE_RECORDS))
+        self.sinks = []
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(FLUSH_INTERVAL_MS)
+
+    def add_console(self, widget, match=lambda record: True, source=None):
+        sink = ConsoleSink(widget, match, source or (lambda: self.history))
+        self.sinks.append(sink)
+        return sink
+
+    def records(self, serials):
+        """ The buffered records of ``serials`` (None for untagged lines), oldest first """
+        return heapq.merge(*(self.buffers[s] for s in serials if s in self.buffers), key=lambda r: r["ts"])
+
+    def route(self, record):
+        self.buffers[record["serial"]].append(record)
+        for sink in self.sinks:
+            if sink.stale or not sink.accepts(record): continue
+            if sink.widget.isVisible(): sink.pending.append(record)
+            else: sink.stale, sink.pending = True, []
+
+    def invalidate(self, sink):
+        sink.stale, sink.pending = True, []
+
+    def clear(self, sink, now):
+        sink.since = now
+        sink.pending = []
+        sink.widget.clear()
+
+    def flush(self):
+        for sink in self.sinks:
+            if not sink.widget.isVisible():
+                if sink.pending: self.invalidate(sink)
+                continue
+            if sink.stale:
+                records = deque((r for r in sink.source() if sink.accepts(r)), maxlen=RENDER_LIMIT)
+                sink.widget.clear()
+                sink.stale, sink.pending = False, list(records)
+            if not sink.pending: continue
+            sink.widget.append("<br>".join(render_record(r) for r in sink.pending))
+            sink.pending = []
+            sink.widget.moveCursor(QTextCursor.End)
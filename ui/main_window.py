@@ -1,26 +1,55 @@
 import os
-import sys
+import time
 import shutil
+import posixpath
+import threading
 import subprocess
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QTextEdit, QComboBox, 
                              QGroupBox, QLineEdit, QProgressBar, QTableWidget,
                              QTableWidgetItem, QHeaderView, QMessageBox, QTabWidget,
                              QFormLayout, QFrame, QGridLayout, QSplitter, QInputDialog,
-                             QDialog, QDialogButtonBox, QCheckBox, QStackedWidget, QTabBar)
+                             QDialog, QDialogButtonBox, QCheckBox, QStackedWidget, QTabBar,
+                             QSpinBox, QListWidget, QListWidgetItem)
 from PySide6.QtCore import Qt, QThread, Signal, QTimer
-from PySide6.QtGui import QFont, QColor, QPixmap, QTextCursor, QIcon
+from PySide6.QtGui import QFont, QColor, QPixmap, QIcon
 
 from ui.theme import Theme
-from ui.components import InfoCard, ActionButton, CompactGroupBox, create_h_layout, create_v_layout
-from core.command_thread import CommandThread
+from ui.components import InfoCard, ActionButton, CompactGroupBox, create_h_layout, create_v_layout, set_level
+from ui.fleet_view import FleetModel, FleetView, STATUS_ROLE
+from ui.log_view import ConsoleRouter
+from core.command_thread import CommandThread, TaskThread, JobThread
+from core.presets import PresetCatalog
+from core.apk_install import BulkInstaller, collect_apks, group_apks
+from core.apk_info import check_install, DevicePackageCache
+from core.payload import read_payload, extract_payload, PayloadError
+from core.image_classifier import classify_images
+from core.factory_image import classify_zip, scan_factory_zip, is_ref, extract_ref, remove_staged, clear_cache
+from core.sideload import sideload_package
+from core.adb_sync import list_remote, push_paths, pull_paths
+from core.metrics_store import MetricsStore, WINDOWS
+from core.telemetry import TelemetryCollector, flatten_sample
+from core.app_profiler import profile_app, list_sessions, foreground_package
+from core.fleet import FleetPoller
+from core.shell_session import shell
+from core.boot_image import read_boot_info, repack_boot_image
+from core.super_image import SuperImage, SuperImageError, make_super_ref, is_super_ref, stage_super_partition
+from core.flash_plan import build_plan, describe_step, savings, switch_mode
+from core.avb import verify_images
+from core.fastboot_client import is_network_serial, flash_partition, getvar_all
+from core.wireless import EndpointPool, WirelessManager, WirelessError, connect_endpoint
+from core.mirroring import MirrorManager, host_budget, describe_limits, DEFAULT_BANDWIDTH_MBPS
+from core.capture import capture_screens, record_screens, SCREENRECORD_LIMIT_S
+from core.partition_backup import (list_block_partitions, backup_partitions, restore_entries,
+                                   is_backup_image, stage_backup_image)
 from core.adb_fastboot import (get_devices, fetch_partitions_from_device, check_tools, 
-                               get_adb_info, get_fastboot_info, get_adb_metrics, is_scrcpy_available)
-from utils.logger import save_session_log, start_boot_monitor
+                               get_adb_info, get_fastboot_info, get_fastboot_vars, is_scrcpy_available)
+from utils.logger import LogStore, LEVELS, make_record, save_session_log, start_boot_monitor
 from utils.settings import SettingsManager
-from utils.paths import get_resource_path
+from utils.paths import get_resource_path, get_cache_path
 
 APP_VERSION = "v1.4.1"
+PRESET_RESULT_LIMIT = 200
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -35,11 +64,36 @@ class MainWindow(QMainWindow):
             self.setWindowIcon(QIcon(icon_path))
         
         self.is_flashing = False
-        self.session_log = []
+        self.log_store = LogStore(get_cache_path("logs"))
+        self.console_router = ConsoleRouter(self.log_store.recent, self)
+        self.log_filter = {"device": "*", "level": None, "text": ""}
         self.settings = SettingsManager()
         self.info_labels = {}
         self.modified_props = {}
         self.active_threads = []
+        self.preset_catalog = None
+        self.bulk_installer = None
+        self.capture_cancel = None
+        self.record_cancel = None
+        self.package_cache = DevicePackageCache()
+        self.flash_cache_dir = get_cache_path("flash_cache")
+        self.staged_image = None
+        self.transfer_cancel = None
+        self.backup_thread = None
+        self.metrics_store = MetricsStore()
+        self.telemetry = TelemetryCollector()
+        self.telemetry_thread = None
+        self.profile_cancel = None
+        self.fleet_poller = FleetPoller(TelemetryCollector())
+        self.fleet_thread = None
+        self.wireless = WirelessManager(EndpointPool(get_cache_path("wireless_pool.json")))
+        self.wireless_cancel = None
+        self.mirror = MirrorManager(get_cache_path("scrcpy"))
+        self.mirror_cancel = None
+        self.network_fastboot = []
+        self.flash_plan = None
+        self.avb_cache = {}
+        self.avb_verdicts = {}
         
         self.setStyleSheet(Theme.get_stylesheet())
         self.init_ui()
@@ -51,6 +105,18 @@ class MainWindow(QMainWindow):
         self.metrics_timer.timeout.connect(self.update_live_metrics)
         self.metrics_timer.start(5000)
 
+        # Fleet polling only runs while the Fleet tab is visible
+        self.fleet_timer = QTimer()
+        self.fleet_timer.timeout.connect(self.poll_fleet)
+        self.fleet_timer.start(5000)
+
+    def closeEvent(self, event):
+        # scrcpy windows are detached and stay open; only the watchers stop
+        for cancel in (self.mirror_cancel, self.wireless_cancel):
+            if cancel is not None: cancel.set()
+        self.log_store.close()
+        super().closeEvent(event)
+
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             event.accept()
@@ -59,33 +125,103 @@ class MainWindow(QMainWindow):
 
     def dropEvent(self, event):
         files = [u.toLocalFile() for u in event.mimeData().urls()]
+        apk_sources = [f for f in files if os.path.isdir(f) or f.lower().endswith(".apk")]
+        if len(apk_sources) > 1 or any(os.path.isdir(f) for f in apk_sources):
+            self.start_bulk_install(apk_sources)
+        elif apk_sources:
+            self.handle_apk_drop(apk_sources[0])
+        images = []
         for f in files:
             ext = os.path.splitext(f)[1].lower()
-            if ext == ".apk":
-                self.handle_apk_drop(f)
+            if f in apk_sources:
+                continue
+            elif ext == ".zip":
+                self.handle_zip_drop(f)
             elif ext in [".img", ".bin"]:
-                self.handle_image_drop(f)
+                images.append(f)
             else:
                 self.log(f"Unsupported file dropped: {os.path.basename(f)}")
+        self.queue_image_files(images)
 
     def handle_apk_drop(self, file_path):
         serial = self.device_combo.currentData()
         if not serial or "ADB" not in self.device_combo.currentText():
             QMessageBox.warning(self, "ADB Error", "Please connect a device in ADB mode to install APKs.")
             return
-        
-        reply = QMessageBox.question(self, "Install APK", 
-                                   f"Do you want to install {os.path.basename(file_path)}?",
-                                   QMessageBox.Yes | QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            self.tabs.setCurrentIndex(1)
-            self.run_command(f'adb install "{file_path}"')
+        self.install_single_apk(serial, file_path)
+
+    def install_single_apk(self, serial, file_path):
+        """ Reads the APK and the device's installed packages off the UI thread, then asks before installing """
+        thread = TaskThread(check_install, serial, file_path, self.package_cache)
+        self.active_threads.append(thread)
+        thread.tag("apk-check", serial)
+        thread.output_signal.connect(self.log)
+        thread.result_signal.connect(lambda result: self.confirm_apk_install(serial, file_path, *result))
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
 
-    def handle_image_drop(self, file_path):
-        self.tabs.setCurrentIndex(2)
+    def confirm_apk_install(self, serial, file_path, info, installed):
+        label = os.path.basename(file_path)
+        if info and info["package"]:
+            label += f"\n\nPackage: {info['package']}\nVersion: {info['version_name'] or '?'} ({info['version_code']})"
+        if installed is not None:
+            reply = QMessageBox.question(self, "Already Installed",
+                                         f"{label}\n\nThe device already has versionCode {installed}. Reinstall anyway?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                self.log(f"Skipped {info['package']}: versionCode {installed} already installed on {serial}", serial)
+                return
+        else:
+            reply = QMessageBox.question(self, "Install APK", f"Do you want to install {label}?",
+                                         QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes: return
+        self.nav_bar.setCurrentIndex(1)
+        self.run_command(f'adb install "{file_path}"', callback=lambda code: self.package_cache.invalidate(serial))
+
+    def queue_image_files(self, paths):
+        """ Sniffs the images off the UI thread and queues each under the partition its content points to """
+        if not paths: return
+        self.nav_bar.setCurrentIndex(2)
         selected_part = self.partition_combo.currentText().strip()
-        partition = selected_part if selected_part else os.path.basename(file_path).lower().replace(".img", "").replace(".bin", "")
-        
+        thread = TaskThread(classify_images, paths)
+        self.active_threads.append(thread)
+        thread.tag("classify")
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: (self.progress.setMaximum(total), self.progress.setValue(done)))
+        thread.item_signal.connect(lambda result: self.queue_classified_image(result, selected_part))
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def queue_classified_image(self, result, selected_part):
+        path, name = result["path"], os.path.basename(result["path"])
+        if result["kind"] == "payload":
+            self.handle_payload_drop(path)
+            return
+        if result["kind"] == "super" and selected_part != "super":
+            self.handle_super_drop(path)
+            return
+        partition = result["partition"]
+        if selected_part:
+            # The selected partition wins unless the content clearly disagrees (boot_a for a boot image is fine)
+            agrees = (not partition or result["source"] != "content" or selected_part.startswith(partition)
+                      or (result["kind"] == "boot" and any(k in selected_part for k in ("boot", "recovery"))))
+            if agrees:
+                partition = selected_part
+            else:
+                self.log(f"{name} is a {result['detail']}; queued for {partition} instead of {selected_part}")
+        row = self.add_queue_row(partition or "", path)
+        self.queue_table.item(row, 1).setToolTip(f"{path}\n{result['detail']}")
+        if partition:
+            self.log(f"Queued {name} for {partition} ({result['detail']})")
+        else:
+            self.queue_table.item(row, 2).setText("Set partition")
+            self.log(f"Queued {name} ({result['detail']}): enter its partition before flashing")
+
+    def add_queue_row(self, partition, file_path):
         row = self.queue_table.rowCount()
         self.queue_table.insertRow(row)
         
@@ -100,7 +236,122 @@ class MainWindow(QMainWindow):
         status_item = QTableWidgetItem("Pending")
         status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
         self.queue_table.setItem(row, 2, status_item)
-        self.log(f"Added to queue via drag-drop: {os.path.basename(file_path)}")
+        return row
+
+    def handle_zip_drop(self, file_path):
+        kind = classify_zip(file_path)
+        if kind == "ota":
+            self.handle_payload_drop(file_path)
+        elif kind == "factory":
+            self.handle_factory_drop(file_path)
+        else:
+            self.log(f"Unsupported file dropped: {os.path.basename(file_path)}")
+
+    def handle_factory_drop(self, file_path):
+        try:
+            plan = scan_factory_zip(file_path)
+        except Exception as e:
+            self.log(f"Error: {os.path.basename(file_path)}: {str(e)}")
+            QMessageBox.warning(self, "Factory Image Error", f"Cannot read factory package:\n{str(e)}")
+            return
+        if not plan["images"]:
+            self.log(f"No flashable images found in {os.path.basename(file_path)}")
+            return
+        self.nav_bar.setCurrentIndex(2)
+        for key, val in plan["info"].items():
+            self.log(f"Factory package requires {key}={val}")
+        for img in plan["images"]:
+            row = self.add_queue_row(img["partition"], img["ref"])
+            self.queue_table.item(row, 1).setToolTip(f"{img['ref']}\n(extracted on demand, {img['size'] / (1024 * 1024):.1f} MB)")
+        self.log(f"Queued {len(plan['images'])} image(s) from factory package {os.path.basename(file_path)}")
+
+    def handle_payload_drop(self, file_path):
+        try:
+            manifest = read_payload(file_path)
+        except (PayloadError, OSError) as e:
+            self.log(f"Error: {os.path.basename(file_path)}: {str(e)}")
+            QMessageBox.warning(self, "OTA Error", f"Cannot read OTA payload:\n{str(e)}")
+            return
+
+        diag = QDialog(self)
+        diag.setWindowTitle("Extract OTA Payload")
+        diag.setMinimumWidth(400)
+        d_layout = QVBoxLayout(diag)
+        d_layout.addWidget(QLabel(f"Select partitions to extract from {os.path.basename(file_path)}:"))
+        part_list = QListWidget()
+        for part in manifest["partitions"]:
+            item = QListWidgetItem(f"{part['name']}  ({part['size'] / (1024 * 1024):.1f} MB)")
+            item.setData(Qt.UserRole, part["name"])
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            part_list.addItem(item)
+        d_layout.addWidget(part_list)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(diag.accept)
+        buttons.rejected.connect(diag.reject)
+        d_layout.addWidget(buttons)
+        if diag.exec() != QDialog.Accepted: return
+
+        selected = [part_list.item(i).data(Qt.UserRole) for i in range(part_list.count())
+                    if part_list.item(i).checkState() == Qt.Checked]
+        if not selected: return
+        out_dir = os.path.splitext(file_path)[0] + "_extracted"
+        self.nav_bar.setCurrentIndex(2)
+        self.progress.setValue(0)
+        thread = TaskThread(extract_payload, file_path, out_dir, selected)
+        self.active_threads.append(thread)
+        thread.tag("payload")
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: (self.progress.setMaximum(total), self.progress.setValue(done)))
+        thread.item_signal.connect(lambda image: self.add_queue_row(image[0], image[1]))
+        thread.finished_signal.connect(lambda code: self.active_threads.remove(thread) if thread in self.active_threads else None)
+        thread.start()
+
+    def handle_super_drop(self, file_path):
+        try:
+            with SuperImage(file_path) as image:
+                partitions = image.logical_partitions()
+                sparse = image.sparse
+        except (SuperImageError, OSError) as e:
+            self.log(f"Error: {os.path.basename(file_path)}: {str(e)}")
+            QMessageBox.warning(self, "Super Image Error", f"Cannot read super image metadata:\n{str(e)}")
+            return
+
+        diag = QDialog(self)
+        diag.setWindowTitle("Super Image")
+        diag.setMinimumWidth(400)
+        d_layout = QVBoxLayout(diag)
+        d_layout.addWidget(QLabel(f"Logical partitions in {os.path.basename(file_path)} ({'sparse' if sparse else 'raw'}).\n"
+                                  "Checked ones are queued individually and flashed in fastbootd:"))
+        part_list = QListWidget()
+        for part in partitions:
+            item = QListWidgetItem(f"{part['name']}  ({part['size'] / (1024 * 1024):.1f} MB, {part['group']})")
+            item.setData(Qt.UserRole, part["name"])
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            part_list.addItem(item)
+        d_layout.addWidget(part_list)
+        chk_whole = QCheckBox("Flash the whole super image instead")
+        chk_whole.toggled.connect(part_list.setDisabled)
+        d_layout.addWidget(chk_whole)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(diag.accept)
+        buttons.rejected.connect(diag.reject)
+        d_layout.addWidget(buttons)
+        if diag.exec() != QDialog.Accepted: return
+
+        if chk_whole.isChecked():
+            self.add_queue_row("super", file_path)
+            self.log(f"Queued whole super image {os.path.basename(file_path)}")
+            return
+        sizes = {part["name"]: part["size"] for part in partitions}
+        selected = [part_list.item(i).data(Qt.UserRole) for i in range(part_list.count())
+                    if part_list.item(i).checkState() == Qt.Checked]
+        for name in selected:
+            ref = make_super_ref(file_path, name)
+            row = self.add_queue_row(name, ref)
+            self.queue_table.item(row, 1).setToolTip(f"{ref}\n(extracted on demand, {sizes[name] / (1024 * 1024):.1f} MB)")
+        self.log(f"Queued {len(selected)} logical partition(s) from {os.path.basename(file_path)}")
 
     def check_env(self):
         missing = check_tools()
@@ -169,14 +420,18 @@ class MainWindow(QMainWindow):
         self.setup_adb_tab()
         self.setup_fastboot_tab()
         self.setup_tweaks_tab()
+        self.setup_files_tab()
+        self.setup_fleet_tab()
         self.setup_logs_tab()
 
         self.nav_bar.currentChanged.connect(self.content_stack.setCurrentIndex)
+        self.device_combo.currentIndexChanged.connect(self.refresh_device_consoles)
+        self.nav_bar.currentChanged.connect(lambda index: self.poll_fleet() if index == self.fleet_tab_index else None)
 
         # Bottom UI
         bottom_layout = create_h_layout()
         self.status_label = QLabel("Ready")
-        self.status_label.setStyleSheet(f"color: {Theme.ACCENT}; font-weight: bold;")
+        set_level(self.status_label, "ok")
         bottom_layout.addWidget(self.status_label)
         bottom_layout.addStretch()
         self.progress = QProgressBar()
@@ -186,24 +441,25 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(bottom_layout)
         central_widget.setLayout(main_layout)
 
-    def log(self, text):
-        clean_text = text.replace("<b>", "").replace("</b>", "").replace("<font color=", "").replace("</font>", "").replace(">", "")
-        self.session_log.append(clean_text)
+    def log(self, text, serial=None, source=None, job=None):
+        # Worker output connected straight to log() is tagged by the thread that sent it
+        thread = self.sender()
+        if isinstance(thread, JobThread):
+            serial, job = serial or thread.serial, job or thread.job
+        record = self.log_store.append(make_record(text, serial, source, job=job))
+        self.console_router.route(record)
+        if serial and self.log_device_filter.findData(serial) < 0:
+            self.log_device_filter.addItem(serial, serial)
 
-        color = "#E0E0E0"
-        if text.startswith(">"): color = "#FFEB3B"
-        elif "OKAY" in text or "Success" in text or "finished" in text: color = Theme.ACCENT
-        elif "FAILED" in text or "error" in text or "Error" in text: color = Theme.DANGER
-        
-        html_text = f'<font color="{color}">{text}</font>'
-        
-        self.console.append(html_text)
-        if hasattr(self, 'fb_console'): self.fb_console.append(html_text)
-        if hasattr(self, 'adb_console'): self.adb_console.append(html_text)
-        
-        self.console.moveCursor(QTextCursor.End)
-        if hasattr(self, 'fb_console'): self.fb_console.moveCursor(QTextCursor.End)
-        if hasattr(self, 'adb_console'): self.adb_console.moveCursor(QTextCursor.End)
+    def is_selected_device_record(self, record):
+        return record["serial"] in (None, self.device_combo.currentData())
+
+    def selected_device_records(self):
+        return self.console_router.records({None, self.device_combo.currentData()})
+
+    def refresh_device_consoles(self):
+        self.console_router.invalidate(self.adb_sink)
+        self.console_router.invalidate(self.fb_sink)
 
     def setup_dashboard_tab(self):
         tab = QWidget()
@@ -221,17 +477,35 @@ class MainWindow(QMainWindow):
             ("Root", "Root Status", "#FFC107"),
             ("Bootloader", "Bootloader State", "#F44336"),
             ("Battery", "Battery Level", "#4CAF50"),
-            ("Temp", "CPU Temp", "#FF9800"),
-            ("Storage", "Storage (Internal)", "#2196F3")
+            ("Temp", "Battery Temp", "#FF9800"),
+            ("Storage", "Storage (Internal)", "#2196F3"),
+            ("CPU", "CPU Load", "#AB47BC"),
+            ("Memory", "Memory Used", "#26A69A"),
+            ("Thermal", "Hottest Zone", "#EF5350"),
+            ("Freq", "CPU Frequency", "#7E57C2")
         ]
 
+        # Cards that plot a metric history under their value
+        self.card_metrics = {"Battery": "battery_pct", "Temp": "battery_temp_c", "Storage": "storage_pct",
+                             "CPU": "cpu_pct", "Memory": "mem_used_pct", "Thermal": "thermal_max_c"}
+        self.live_cards = ["Battery", "Temp", "Storage", "CPU", "Memory", "Thermal", "Freq"]
         for i, (key, title, color) in enumerate(card_configs):
-            card = InfoCard(title, color)
+            card = InfoCard(title, color, sparkline=key in self.card_metrics)
             self.cards[f"{key}_card"] = card
             grid.addWidget(card, i // 4, i % 4)
 
         layout.addLayout(grid)
 
+        self.history_window_combo = QComboBox()
+        self.history_window_combo.addItems(list(WINDOWS))
+        self.history_window_combo.setFixedWidth(80)
+        self.history_window_combo.currentIndexChanged.connect(self.refresh_sparklines)
+        btn_export_metrics = ActionButton("Export History (CSV)")
+        btn_export_metrics.clicked.connect(self.export_metrics_csv)
+        history_lbl = QLabel("Metrics history:")
+        history_lbl.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 11px;")
+        layout.addLayout(create_h_layout([history_lbl, self.history_window_combo, 1, btn_export_metrics]))
+
         mid_layout = QHBoxLayout()
         mid_layout.setSpacing(10)
 
@@ -241,11 +515,32 @@ class MainWindow(QMainWindow):
         btn_mirror.clicked.connect(lambda: self.launch_scrcpy("standard"))
         btn_dex = ActionButton("DeX Mode (Off)", style="accent")
         btn_dex.clicked.connect(lambda: self.launch_scrcpy("dex"))
+        btn_mirror_all = ActionButton("Mirror All")
+        btn_mirror_all.setToolTip("Mirror every ADB device, sharing the budget below between the sessions")
+        btn_mirror_all.clicked.connect(lambda: self.start_mirroring(self.adb_serials(), "standard"))
+        btn_mirror_stop = ActionButton("Stop", style="danger")
+        btn_mirror_stop.setToolTip("Stop the selected sessions (all when none are selected)")
+        btn_mirror_stop.clicked.connect(self.stop_mirroring)
         self.chk_audio = QCheckBox("Forward Audio")
         self.chk_audio.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 11px;")
+        self.mirror_bandwidth = QSpinBox()
+        self.mirror_bandwidth.setRange(10, 2000)
+        self.mirror_bandwidth.setValue(int(DEFAULT_BANDWIDTH_MBPS))
+        self.mirror_bandwidth.setPrefix("Link budget: ")
+        self.mirror_bandwidth.setSuffix(" Mbps")
+        self.mirror_table = QTableWidget(0, 4)
+        self.mirror_table.setHorizontalHeaderLabels(["Device", "Mode", "Limits", "State"])
+        self.mirror_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.mirror_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.mirror_table.verticalHeader().setVisible(False)
+        self.mirror_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.mirror_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.mirror_table.setMaximumHeight(110)
         
         mirror_inner.addLayout(create_h_layout([btn_mirror, btn_dex]))
-        mirror_inner.addWidget(self.chk_audio)
+        mirror_inner.addLayout(create_h_layout([btn_mirror_all, btn_mirror_stop]))
+        mirror_inner.addLayout(create_h_layout([self.chk_audio, 1, self.mirror_bandwidth]))
+        mirror_inner.addWidget(self.mirror_table)
         mirror_group.setLayout(mirror_inner)
 
         conn_group = CompactGroupBox("Wireless ADB (Android 11+)")
@@ -254,14 +549,59 @@ class MainWindow(QMainWindow):
         btn_pair.clicked.connect(self.wireless_pairing_workflow)
         btn_qconnect = ActionButton("Quick Connect")
         btn_qconnect.clicked.connect(self.wireless_quick_connect)
-        
-        conn_inner.addLayout(create_h_layout([btn_pair, btn_qconnect]))
+        btn_discover = ActionButton("Discover (mDNS)")
+        btn_discover.clicked.connect(self.discover_wireless)
+        self.btn_keepalive = ActionButton("Keep Connected", style="accent")
+        self.btn_keepalive.setCheckable(True)
+        self.btn_keepalive.toggled.connect(self.toggle_wireless_keepalive)
+        btn_forget = ActionButton("Forget")
+        btn_forget.clicked.connect(self.forget_wireless_endpoint)
+        self.wireless_table = QTableWidget(0, 4)
+        self.wireless_table.setHorizontalHeaderLabels(["Endpoint", "Name", "State", "Latency"])
+        self.wireless_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.wireless_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.wireless_table.verticalHeader().setVisible(False)
+        self.wireless_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.wireless_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.wireless_table.setMaximumHeight(110)
+        
+        conn_inner.addLayout(create_h_layout([btn_pair, btn_qconnect, btn_discover]))
+        conn_inner.addWidget(self.wireless_table)
+        conn_inner.addLayout(create_h_layout([self.btn_keepalive, btn_forget]))
         conn_group.setLayout(conn_inner)
+        for address in self.wireless.pool.addresses():
+            self.show_wireless_status({"address": address, "name": self.wireless.pool.endpoints[address]["name"],
+                                       "state": "unknown", "latency_ms": None, "failures": 0, "error": None})
 
         mid_layout.addWidget(mirror_group, 1)
         mid_layout.addWidget(conn_group, 1)
         layout.addLayout(mid_layout)
 
+        profile_group = CompactGroupBox("App Profiler (Frames / CPU / Memory)")
+        profile_layout = create_v_layout(margins=(8, 8, 8, 8))
+        self.profile_pkg_input = QLineEdit()
+        self.profile_pkg_input.setPlaceholderText("Package name, e.g. com.android.settings")
+        btn_profile_fg = ActionButton("Foreground App")
+        btn_profile_fg.clicked.connect(self.fill_foreground_package)
+        self.profile_duration = QSpinBox()
+        self.profile_duration.setRange(5, 3600)
+        self.profile_duration.setValue(60)
+        self.profile_duration.setPrefix("Duration: ")
+        self.profile_duration.setSuffix(" s")
+        self.btn_profile_start = ActionButton("Start Profiling", style="accent")
+        self.btn_profile_start.clicked.connect(self.start_profiling)
+        btn_profile_stop = ActionButton("Stop", style="danger")
+        btn_profile_stop.clicked.connect(self.stop_profiling)
+        btn_profile_compare = ActionButton("Compare Sessions")
+        btn_profile_compare.clicked.connect(self.show_profile_sessions)
+        self.profile_status_lbl = QLabel("Idle")
+        self.profile_status_lbl.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 11px;")
+        profile_layout.addLayout(create_h_layout([self.profile_pkg_input, btn_profile_fg, self.profile_duration]))
+        profile_layout.addLayout(create_h_layout([self.btn_profile_start, btn_profile_stop, btn_profile_compare, 1]))
+        profile_layout.addWidget(self.profile_status_lbl)
+        profile_group.setLayout(profile_layout)
+        layout.addWidget(profile_group)
+
         terminal_group = CompactGroupBox("Manual Command Terminal")
         terminal_layout = create_h_layout(margins=(8, 8, 8, 8))
         self.terminal_tool_combo = QComboBox()
@@ -310,6 +650,34 @@ class MainWindow(QMainWindow):
         app_group.setLayout(app_layout)
         left_layout.addWidget(app_group)
 
+        bulk_group = CompactGroupBox("Bulk Install (Files / Folders / Split APKs)")
+        bulk_layout = create_v_layout(margins=(8, 8, 8, 8))
+        btn_bulk_files = ActionButton("Select APKs")
+        btn_bulk_files.clicked.connect(self.browse_bulk_apks)
+        btn_bulk_folder = ActionButton("Select Folder")
+        btn_bulk_folder.clicked.connect(self.browse_bulk_folder)
+        self.bulk_per_device = QSpinBox()
+        self.bulk_per_device.setRange(1, 8)
+        self.bulk_per_device.setValue(2)
+        self.bulk_per_device.setPrefix("Per device: ")
+        self.chk_bulk_all = QCheckBox("All ADB devices")
+        self.chk_bulk_all.setChecked(True)
+        self.chk_bulk_skip = QCheckBox("Skip installed versions")
+        self.chk_bulk_skip.setChecked(True)
+        self.btn_bulk_stop = ActionButton("Stop", style="danger")
+        self.btn_bulk_stop.setEnabled(False)
+        self.btn_bulk_stop.clicked.connect(self.stop_bulk_install)
+        bulk_layout.addLayout(create_h_layout([btn_bulk_files, btn_bulk_folder, self.bulk_per_device, self.chk_bulk_all, self.chk_bulk_skip, 1, self.btn_bulk_stop]))
+
+        self.bulk_table = QTableWidget(0, 4)
+        self.bulk_table.setHorizontalHeaderLabels(["Device", "Package", "Result", "Time (s)"])
+        self.bulk_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.bulk_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.bulk_table.setMinimumHeight(140)
+        bulk_layout.addWidget(self.bulk_table)
+        bulk_group.setLayout(bulk_layout)
+        left_layout.addWidget(bulk_group, 1)
+
         cmd_group = CompactGroupBox("Custom ADB Shell")
         cmd_layout = create_v_layout(margins=(8, 8, 8, 8))
         self.adb_cmd_input = QLineEdit()
@@ -326,6 +694,35 @@ class MainWindow(QMainWindow):
         cmd_group.setLayout(cmd_layout)
         left_layout.addWidget(cmd_group)
 
+        capture_group = CompactGroupBox("Screen Capture")
+        capture_layout = create_v_layout(margins=(8, 8, 8, 8))
+        self.capture_format = QComboBox()
+        self.capture_format.addItems(["PNG", "WebP"])
+        self.capture_count = QSpinBox()
+        self.capture_count.setRange(1, 500)
+        self.capture_count.setPrefix("Shots: ")
+        self.capture_interval = QSpinBox()
+        self.capture_interval.setRange(0, 60000)
+        self.capture_interval.setSingleStep(100)
+        self.capture_interval.setValue(500)
+        self.capture_interval.setPrefix("Every: ")
+        self.capture_interval.setSuffix(" ms")
+        self.chk_capture_all = QCheckBox("All ADB devices")
+        self.btn_screenshot = ActionButton("Screenshot", style="accent")
+        self.btn_screenshot.clicked.connect(self.capture_screenshots)
+        self.record_duration = QSpinBox()
+        self.record_duration.setRange(1, SCREENRECORD_LIMIT_S)
+        self.record_duration.setValue(30)
+        self.record_duration.setPrefix("Length: ")
+        self.record_duration.setSuffix(" s")
+        self.btn_record = ActionButton("Record Screen")
+        self.btn_record.setToolTip("Streams raw H.264 from screenrecord into the chosen folder (play with VLC / ffplay)")
+        self.btn_record.clicked.connect(self.toggle_screen_recording)
+        capture_layout.addLayout(create_h_layout([self.capture_format, self.capture_count, self.capture_interval, self.chk_capture_all]))
+        capture_layout.addLayout(create_h_layout([self.btn_screenshot, self.record_duration, self.btn_record]))
+        capture_group.setLayout(capture_layout)
+        left_layout.addWidget(capture_group)
+
         sideload_group = CompactGroupBox("ADB Sideload (Recovery)")
         sideload_layout = create_v_layout(margins=(8, 8, 8, 8))
         btn_reboot_sideload = ActionButton("Reboot to Sideload")
@@ -348,6 +745,27 @@ class MainWindow(QMainWindow):
         sideload_layout.addWidget(btn_sideload_exec)
         sideload_group.setLayout(sideload_layout)
         left_layout.addWidget(sideload_group)
+
+        backup_group = CompactGroupBox("Partition Backup (Root / Recovery)")
+        backup_layout = create_v_layout(margins=(8, 8, 8, 8))
+        self.backup_part_list = QListWidget()
+        self.backup_part_list.setMaximumHeight(120)
+        btn_backup_fetch = ActionButton("Fetch Partitions")
+        btn_backup_fetch.clicked.connect(self.fetch_backup_partitions)
+        self.backup_parallel = QSpinBox()
+        self.backup_parallel.setRange(1, 6)
+        self.backup_parallel.setValue(3)
+        self.backup_parallel.setPrefix("Parallel: ")
+        self.backup_dedup = QCheckBox("Deduplicate")
+        self.backup_dedup.setToolTip("Store images in a chunk store shared by all backups in the chosen folder; identical data across devices and runs is kept once")
+        btn_backup = ActionButton("Backup Selected", style="accent")
+        btn_backup.clicked.connect(self.backup_selected_partitions)
+        btn_restore = ActionButton("Restore to Flash Queue")
+        btn_restore.clicked.connect(self.restore_backup_to_queue)
+        backup_layout.addLayout(create_h_layout([btn_backup_fetch, self.backup_parallel, self.backup_dedup, btn_backup, btn_restore]))
+        backup_layout.addWidget(self.backup_part_list)
+        backup_group.setLayout(backup_layout)
+        left_layout.addWidget(backup_group)
         
         left_layout.addStretch()
         left_panel.setLayout(left_layout)
@@ -358,6 +776,7 @@ class MainWindow(QMainWindow):
         self.adb_console.setReadOnly(True)
         self.adb_console.setStyleSheet(f"background-color: #0A0A0A; color: {Theme.ACCENT}; font-family: 'Consolas', 'Courier New'; font-size: 11px;")
         right_layout.addWidget(self.adb_console)
+        self.adb_sink = self.console_router.add_console(self.adb_console, self.is_selected_device_record, self.selected_device_records)
         right_panel.setLayout(right_layout)
         
         splitter.addWidget(left_panel)
@@ -385,6 +804,12 @@ class MainWindow(QMainWindow):
             btn = ActionButton(mode)
             btn.clicked.connect(lambda checked, m=mode: self.reboot_device(m))
             reboot_layout.addWidget(btn, i//2, i%2)
+        self.fastboot_tcp_input = QLineEdit(self.settings.get_last_dir("last_fastboot_tcp"))
+        self.fastboot_tcp_input.setPlaceholderText("Network fastboot: tcp:IP[:port]")
+        btn_attach = ActionButton("Attach")
+        btn_attach.clicked.connect(self.attach_network_fastboot)
+        reboot_layout.addWidget(self.fastboot_tcp_input, 2, 0)
+        reboot_layout.addWidget(btn_attach, 2, 1)
         reboot_group.setLayout(reboot_layout)
         left_layout.addWidget(reboot_group)
 
@@ -417,9 +842,13 @@ class MainWindow(QMainWindow):
         self.btn_flash = ActionButton("START BATCH FLASH", style="danger")
         self.btn_flash.setEnabled(False)
         self.btn_flash.clicked.connect(self.process_queue)
+        btn_verify = ActionButton("Verify AVB")
+        btn_verify.setToolTip("Check queued images against the vbmeta images queued with them (or their own AVB footer)")
+        btn_verify.clicked.connect(lambda: self.verify_queue())
         btn_clear = ActionButton("Clear")
         btn_clear.clicked.connect(lambda: self.queue_table.setRowCount(0))
         btn_row.addWidget(self.btn_flash, 2)
+        btn_row.addWidget(btn_verify, 1)
         btn_row.addWidget(btn_clear, 1)
         queue_layout.addLayout(btn_row)
         queue_group.setLayout(queue_layout)
@@ -456,6 +885,7 @@ class MainWindow(QMainWindow):
         self.fb_console.setReadOnly(True)
         self.fb_console.setStyleSheet(f"background-color: #0A0A0A; color: {Theme.ACCENT}; font-family: 'Consolas', 'Courier New'; font-size: 11px;")
         right_layout.addWidget(self.fb_console)
+        self.fb_sink = self.console_router.add_console(self.fb_console, self.is_selected_device_record, self.selected_device_records)
         right_panel.setLayout(right_layout)
         
         splitter.addWidget(left_panel)
@@ -477,9 +907,24 @@ class MainWindow(QMainWindow):
         
         spoof_group = CompactGroupBox("Device Identity Spoofing (Beta / Experimental)")
         spoof_layout = create_v_layout(margins=(8, 8, 8, 8))
+        filter_layout = create_h_layout()
+        self.preset_search = QLineEdit()
+        self.preset_search.setPlaceholderText("Search presets (brand, model, fingerprint)...")
+        self.preset_search.textChanged.connect(self.filter_presets)
+        self.preset_brand_combo = QComboBox()
+        self.preset_brand_combo.addItem("All Brands", "")
+        self.preset_brand_combo.currentIndexChanged.connect(self.filter_presets)
+        self.preset_android_combo = QComboBox()
+        self.preset_android_combo.addItem("All Android", "")
+        self.preset_android_combo.currentIndexChanged.connect(self.filter_presets)
+        filter_layout.addWidget(self.preset_search, 1)
+        filter_layout.addWidget(self.preset_brand_combo)
+        filter_layout.addWidget(self.preset_android_combo)
+        spoof_layout.addLayout(filter_layout)
         preset_layout = create_h_layout()
         self.preset_combo = QComboBox()
-        self.load_presets()
+        self.preset_combo.addItem("Indexing presets...")
+        QTimer.singleShot(0, self.load_presets)
         btn_apply_preset = ActionButton("Apply Live")
         btn_apply_preset.clicked.connect(self.apply_identity_preset)
         btn_gen_script = ActionButton("Install Fix", style="accent")
@@ -492,6 +937,33 @@ class MainWindow(QMainWindow):
         spoof_group.setLayout(spoof_layout)
         left_layout.addWidget(spoof_group)
 
+        boot_group = CompactGroupBox("Boot Image Patching (boot / init_boot / vendor_boot)")
+        boot_layout = QFormLayout()
+        boot_layout.setContentsMargins(8, 8, 8, 8)
+        self.boot_image_input = QLineEdit()
+        self.boot_image_input.setReadOnly(True)
+        self.boot_image_input.setPlaceholderText("Stock boot image...")
+        btn_boot_open = ActionButton("Open")
+        btn_boot_open.clicked.connect(self.open_boot_image)
+        boot_layout.addRow("Image:", create_h_layout([self.boot_image_input, btn_boot_open]))
+        self.boot_info_lbl = QLabel("No image loaded.")
+        self.boot_info_lbl.setWordWrap(True)
+        self.boot_info_lbl.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 11px;")
+        boot_layout.addRow(self.boot_info_lbl)
+        self.boot_cmdline_input = QLineEdit()
+        boot_layout.addRow("Cmdline:", self.boot_cmdline_input)
+        self.boot_ramdisk_input = QLineEdit()
+        self.boot_ramdisk_input.setPlaceholderText("Keep original ramdisk")
+        btn_boot_ramdisk = ActionButton("Browse")
+        btn_boot_ramdisk.clicked.connect(self.choose_boot_ramdisk)
+        boot_layout.addRow("Ramdisk:", create_h_layout([self.boot_ramdisk_input, btn_boot_ramdisk]))
+        self.btn_boot_repack = ActionButton("Repack && Queue", style="accent")
+        self.btn_boot_repack.setEnabled(False)
+        self.btn_boot_repack.clicked.connect(self.repack_boot_to_queue)
+        boot_layout.addRow(self.btn_boot_repack)
+        boot_group.setLayout(boot_layout)
+        left_layout.addWidget(boot_group)
+
         prop_group = CompactGroupBox("Build Property Editor (Experimental)")
         prop_layout = create_v_layout(margins=(8, 8, 8, 8))
         search_layout = create_h_layout()
@@ -543,17 +1015,153 @@ class MainWindow(QMainWindow):
         self.nav_bar.addTab("Tweaks")
         self.content_stack.addWidget(tab)
 
+    def setup_files_tab(self):
+        tab = QWidget()
+        layout = create_h_layout(margins=(10, 5, 10, 10), spacing=10)
+        splitter = QSplitter(Qt.Horizontal)
+
+        browser_group = CompactGroupBox("Device Files (sync protocol)")
+        browser_layout = create_v_layout(margins=(8, 8, 8, 8))
+        self.remote_path_input = QLineEdit("/sdcard/")
+        self.remote_path_input.returnPressed.connect(self.list_remote_dir)
+        btn_up = ActionButton("Up")
+        btn_up.setFixedWidth(50)
+        btn_up.clicked.connect(self.remote_dir_up)
+        btn_list = ActionButton("List")
+        btn_list.setFixedWidth(70)
+        btn_list.clicked.connect(self.list_remote_dir)
+        browser_layout.addLayout(create_h_layout([self.remote_path_input, btn_up, btn_list]))
+
+        self.remote_table = QTableWidget(0, 3)
+        self.remote_table.setHorizontalHeaderLabels(["Name", "Size", "Modified"])
+        self.remote_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.remote_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.remote_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.remote_table.cellDoubleClicked.connect(self.open_remote_entry)
+        browser_layout.addWidget(self.remote_table)
+
+        btn_push_files = ActionButton("Push Files")
+        btn_push_files.clicked.connect(lambda: self.push_to_device(folder=False))
+        btn_push_folder = ActionButton("Push Folder")
+        btn_push_folder.clicked.connect(lambda: self.push_to_device(folder=True))
+        btn_pull = ActionButton("Pull Selected", style="accent")
+        btn_pull.clicked.connect(self.pull_from_device)
+        self.transfer_connections = QSpinBox()
+        self.transfer_connections.setRange(1, 8)
+        self.transfer_connections.setValue(4)
+        self.transfer_connections.setPrefix("Connections: ")
+        self.btn_transfer_stop = ActionButton("Stop", style="danger")
+        self.btn_transfer_stop.setEnabled(False)
+        self.btn_transfer_stop.clicked.connect(self.stop_transfer)
+        browser_layout.addLayout(create_h_layout([btn_push_files, btn_push_folder, btn_pull, self.transfer_connections, 1, self.btn_transfer_stop]))
+        browser_group.setLayout(browser_layout)
+
+        transfer_group = CompactGroupBox("Transfers")
+        transfer_layout = create_v_layout(margins=(8, 8, 8, 8))
+        self.transfer_stats = QLabel("Idle")
+        self.transfer_stats.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-weight: bold;")
+        self.transfer_table = QTableWidget(0, 3)
+        self.transfer_table.setHorizontalHeaderLabels(["Path", "Result", "Time (s)"])
+        self.transfer_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.transfer_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        transfer_layout.addWidget(self.transfer_stats)
+        transfer_layout.addWidget(self.transfer_table)
+        transfer_group.setLayout(transfer_layout)
+
+        splitter.addWidget(browser_group)
+        splitter.addWidget(transfer_group)
+        splitter.setStretchFactor(0, 2)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+        tab.setLayout(layout)
+        self.nav_bar.addTab("Files")
+        self.content_stack.addWidget(tab)
+
+    def setup_fleet_tab(self):
+        tab = QWidget()
+        layout = create_v_layout(margins=(10, 10, 10, 10))
+        self.fleet_summary_lbl = QLabel("Scanning...")
+        set_level(self.fleet_summary_lbl, "ok")
+        btn_fleet_refresh = ActionButton("Refresh Now")
+        btn_fleet_refresh.clicked.connect(self.poll_fleet)
+        hint = QLabel("Double-click a device to open it on the dashboard")
+        hint.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 11px;")
+        layout.addLayout(create_h_layout([self.fleet_summary_lbl, 1, hint, btn_fleet_refresh]))
+
+        self.fleet_model = FleetModel(self)
+        self.fleet_view = FleetView()
+        self.fleet_view.setModel(self.fleet_model)
+        self.fleet_view.doubleClicked.connect(self.open_fleet_device)
+        layout.addWidget(self.fleet_view)
+        tab.setLayout(layout)
+        self.fleet_tab_index = self.nav_bar.addTab("Fleet")
+        self.content_stack.addWidget(tab)
+
+    def poll_fleet(self):
+        if self.fleet_thread is not None or self.nav_bar.currentIndex() != self.fleet_tab_index: return
+        thread = TaskThread(self.fleet_poller.poll)
+        self.fleet_thread = thread
+        thread.item_signal.connect(lambda status: self.fleet_model.update_device({**status, "job": self.device_job(status["serial"])}))
+        def on_polled(serials):
+            self.fleet_model.retain(serials)
+            self.update_fleet_summary()
+        thread.result_signal.connect(on_polled)
+        # Released like the telemetry thread: after QThread.finished and a wait() for the thread's exit
+        def on_stopped():
+            thread.wait()
+            if self.fleet_thread is thread: self.fleet_thread = None
+        thread.finished.connect(on_stopped)
+        thread.start()
+
+    def device_job(self, serial):
+        """ Label of the newest job still running against ``serial``, if any """
+        return next((t.job for t in reversed(self.active_threads)
+                     if isinstance(t, JobThread) and t.serial == serial and t.isRunning()), None)
+
+    def update_fleet_summary(self):
+        counts = self.fleet_model.counts()
+        parts = [f"{counts['total']} device(s)"]
+        parts += [f"{counts[state]} {state.lower()}" for state in ("ADB", "FASTBOOT", "RECOVERY", "SIDELOAD") if counts.get(state)]
+        if counts["hot"]: parts.append(f"{counts['hot']} hot")
+        if counts["errors"]: parts.append(f"{counts['errors']} unreachable")
+        self.fleet_summary_lbl.setText("  |  ".join(parts))
+        set_level(self.fleet_summary_lbl, "alert" if counts["errors"] else "warn" if counts["hot"] else "ok")
+
+    def open_fleet_device(self, index):
+        serial = index.data(STATUS_ROLE)["serial"]
+        combo_index = self.device_combo.findData(serial)
+        if combo_index < 0:
+            self.refresh_devices()
+            combo_index = self.device_combo.findData(serial)
+        if combo_index >= 0:
+            self.device_combo.setCurrentIndex(combo_index)
+            self.nav_bar.setCurrentIndex(0)
+
     def setup_logs_tab(self):
         tab = QWidget()
         layout = create_v_layout(margins=(10, 10, 10, 10))
+        self.log_device_filter = QComboBox()
+        self.log_device_filter.addItem("All devices", "*")
+        self.log_device_filter.addItem("App (no device)", "")
+        self.log_device_filter.currentIndexChanged.connect(self.apply_log_filter)
+        self.log_level_filter = QComboBox()
+        self.log_level_filter.addItem("All levels", None)
+        for level in LEVELS: self.log_level_filter.addItem(level.capitalize(), level)
+        self.log_level_filter.currentIndexChanged.connect(self.apply_log_filter)
+        self.log_search = QLineEdit()
+        self.log_search.setPlaceholderText("Filter by text or job (e.g. flash#12)")
+        self.log_search.textChanged.connect(self.apply_log_filter)
+        layout.addLayout(create_h_layout([self.log_device_filter, self.log_level_filter, self.log_search]))
+
         self.console = QTextEdit()
         self.console.setReadOnly(True)
         self.console.setStyleSheet(f"background-color: black; color: {Theme.ACCENT}; font-family: 'Consolas', monospace; font-size: 11px;")
         layout.addWidget(self.console)
+        self.logs_sink = self.console_router.add_console(self.console, self.log_filter_match, self.log_filter_source)
         
         btn_layout = create_h_layout()
         btn_clear = ActionButton("Clear Console")
-        btn_clear.clicked.connect(self.console.clear)
+        btn_clear.clicked.connect(lambda: self.console_router.clear(self.logs_sink, time.time()))
         btn_save = ActionButton("Save Logs")
         btn_save.clicked.connect(self.save_logs)
         btn_boot = ActionButton("Start Boot Monitor", style="accent")
@@ -565,20 +1173,38 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(btn_boot)
         layout.addLayout(btn_layout)
         tab.setLayout(layout)
-        self.nav_bar.addTab("Logs")
+        self.logs_tab_index = self.nav_bar.addTab("Logs")
         self.content_stack.addWidget(tab)
 
+    def apply_log_filter(self):
+        self.log_filter = {"device": self.log_device_filter.currentData(), "level": self.log_level_filter.currentData(),
+                           "text": self.log_search.text().strip().lower()}
+        self.console_router.invalidate(self.logs_sink)
+
+    def log_filter_match(self, record):
+        device, level, text = self.log_filter["device"], self.log_filter["level"], self.log_filter["text"]
+        if device != "*" and (record["serial"] or "") != device: return False
+        if level and record["level"] != level: return False
+        return not text or text in record["msg"].lower() or text in (record["job"] or "").lower()
+
+    def log_filter_source(self):
+        device = self.log_filter["device"]
+        if device == "*": return self.log_store.recent
+        return self.console_router.records([device or None])
+
     def refresh_devices(self):
         self.device_combo.clear()
         devices = get_devices()
+        devices += [{"type": "FASTBOOT", "serial": serial} for serial in self.network_fastboot
+                    if not any(dev["serial"] == serial for dev in devices)]
         for dev in devices:
             self.device_combo.addItem(f"{dev['type']}: {dev['serial']}", dev['serial'])
         if not devices:
             self.status_label.setText("No devices connected.")
-            self.status_label.setStyleSheet(f"color: {Theme.DANGER}; font-weight: bold;")
+            set_level(self.status_label, "alert")
         else:
             self.status_label.setText(f"Connected: {len(devices)} device(s)")
-            self.status_label.setStyleSheet(f"color: {Theme.ACCENT}; font-weight: bold;")
+            set_level(self.status_label, "ok")
 
     def on_device_selected(self):
         serial = self.device_combo.currentData()
@@ -589,6 +1215,7 @@ class MainWindow(QMainWindow):
         
         for card in self.cards.values(): 
             card.set_value("...")
+        self.refresh_sparklines()
         
         if is_fastboot:
             info = get_fastboot_info(serial)
@@ -601,11 +1228,11 @@ class MainWindow(QMainWindow):
             self.cards["Bootloader_card"].set_value("Unlocked" if bl_state == "yes" else "Locked" if bl_state == "no" else "Unknown", color=bl_color)
             
             self.cards["Root_card"].set_value("N/A")
-            for m_card in ["Battery_card", "Temp_card", "Storage_card"]:
-                self.cards[m_card].set_value("N/A")
+            for key in self.live_cards:
+                self.cards[f"{key}_card"].set_value("N/A")
             self.fetch_partitions()
         elif is_sideload:
-            for key in ["Model", "Product", "Bootloader", "Root", "Battery", "Temp", "Storage"]:
+            for key in ["Model", "Product", "Bootloader", "Root"] + self.live_cards:
                 self.cards[f"{key}_card"].set_value("N/A")
             self.cards["State_card"].set_value("SIDELOAD", color="#FFEB3B") # Yellow
         else:
@@ -622,10 +1249,138 @@ class MainWindow(QMainWindow):
     def update_live_metrics(self):
         serial = self.device_combo.currentData()
         if not serial or "ADB" not in self.device_combo.currentText(): return
-        metrics = get_adb_metrics(serial)
-        self.cards["Battery_card"].set_value(metrics["Battery"])
-        self.cards["Temp_card"].set_value(metrics["Temp"])
-        self.cards["Storage_card"].set_value(metrics["Storage"])
+        # One telemetry read per tick, off the UI thread; skip the tick if the last read is still running
+        if self.telemetry_thread is not None: return
+        thread = TaskThread(self.telemetry.collect, serial)
+        self.telemetry_thread = thread
+        thread.result_signal.connect(self.show_telemetry)
+        # finished_signal is emitted from run() and even QThread.finished precedes the thread's exit;
+        # the wrapper owns the QThread, so it is only dropped once wait() says the thread is gone
+        def on_stopped():
+            thread.wait()
+            if self.telemetry_thread is thread: self.telemetry_thread = None
+        thread.finished.connect(on_stopped)
+        thread.start()
+
+    def show_telemetry(self, sample):
+        self.metrics_store.record(sample["serial"], flatten_sample(sample), sample["timestamp"])
+        if sample["serial"] != self.device_combo.currentData(): return
+        na = lambda v, fmt: fmt.format(v) if v is not None else "N/A"
+        self.cards["Battery_card"].set_value(na(sample["battery_pct"], "{}%"))
+        self.cards["Temp_card"].set_value(na(sample["battery_temp_c"], "{:.1f}°C"))
+        self.cards["Storage_card"].set_value(na(sample["storage_pct"], "{}% used"))
+        cores = {k: v for k, v in sample["cpu_pct"].items() if k != "cpu"}
+        self.cards["CPU_card"].set_value(na(sample["cpu_pct"].get("cpu"), "{:.0f}%"))
+        self.cards["CPU_card"].setToolTip("\n".join(f"{k}: {v:.0f}%" for k, v in sorted(cores.items(), key=lambda kv: int(kv[0][3:]))))
+        memory = sample["memory"]
+        self.cards["Memory_card"].set_value(f"{memory['used_pct']:.0f}% ({memory['available_kb'] // 1024} MB free)" if memory else "N/A")
+        zones = sample["thermal_c"]
+        if zones:
+            hottest = max(zones, key=zones.get)
+            self.cards["Thermal_card"].set_value(f"{zones[hottest]:.1f}°C {hottest}")
+            self.cards["Thermal_card"].setToolTip("\n".join(f"{k}: {v:.1f}°C" for k, v in sorted(zones.items())))
+        else:
+            self.cards["Thermal_card"].set_value("N/A")
+        freqs = sample["cpufreq_mhz"]
+        self.cards["Freq_card"].set_value(f"{min(freqs.values())}-{max(freqs.values())} MHz" if freqs else "N/A")
+        self.cards["Freq_card"].setToolTip("\n".join(f"{k}: {v} MHz" for k, v in sorted(freqs.items(), key=lambda kv: int(kv[0][3:]))))
+        self.refresh_sparklines()
+
+    def fill_foreground_package(self):
+        serial = self.adb_serial_or_warn()
+        if not serial: return
+        try:
+            package = foreground_package(serial)
+        except Exception as e:
+            self.log(f"Error: could not read the foreground app: {str(e)}")
+            return
+        if package: self.profile_pkg_input.setText(package)
+
+    def start_profiling(self):
+        serial = self.adb_serial_or_warn()
+        package = self.profile_pkg_input.text().strip()
+        if not serial or not package: return
+        if self.profile_cancel is not None:
+            QMessageBox.information(self, "App Profiler", "A profiling session is already running.")
+            return
+        self.profile_cancel = threading.Event()
+        self.btn_profile_start.setEnabled(False)
+        thread = TaskThread(profile_app, serial, package, duration=self.profile_duration.value(),
+                            sessions_dir=get_cache_path("profiles"), cancel_event=self.profile_cancel)
+        self.active_threads.append(thread)
+        thread.tag("profile", serial)
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.show_profile_progress)
+        def on_done(code):
+            self.profile_cancel = None
+            self.btn_profile_start.setEnabled(True)
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def show_profile_progress(self, update):
+        s, sample = update["summary"], update["sample"]
+        parts = [f"{sample['t']:.0f}s", f"{s['frames']} frames"]
+        if s["frames"]:
+            parts.append(f"p50 {s['p50_ms']:.1f} / p90 {s['p90_ms']:.1f} / p99 {s['p99_ms']:.1f} ms, {s['janky_ratio'] * 100:.1f}% janky")
+        if sample["cpu_pct"] is not None: parts.append(f"CPU {sample['cpu_pct']:.1f}%")
+        if sample["rss_kb"] is not None: parts.append(f"RSS {sample['rss_kb'] // 1024} MB")
+        self.profile_status_lbl.setText("  |  ".join(parts))
+
+    def stop_profiling(self):
+        if self.profile_cancel is not None: self.profile_cancel.set()
+
+    def show_profile_sessions(self):
+        package = self.profile_pkg_input.text().strip()
+        if not package:
+            QMessageBox.information(self, "App Profiler", "Enter a package name to list its sessions.")
+            return
+        sessions = list_sessions(get_cache_path("profiles"), package)
+        if not sessions:
+            QMessageBox.information(self, "App Profiler", f"No stored sessions for {package}.")
+            return
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Profiling Sessions - {package}")
+        dialog.resize(900, 400)
+        table = QTableWidget(len(sessions), 9)
+        table.setHorizontalHeaderLabels(["Started", "Build", "Serial", "Frames", "p50 ms", "p90 ms", "p99 ms", "Janky", "CPU avg / RSS max"])
+        fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+        for row, session in enumerate(sessions):
+            s = session["summary"]
+            cells = [session["started"], session["build"] or "-", session["serial"], str(s["frames"]),
+                     fmt(s["p50_ms"], ".1f"), fmt(s["p90_ms"], ".1f"), fmt(s["p99_ms"], ".1f"),
+                     fmt(s["janky_ratio"] * 100 if s["janky_ratio"] is not None else None, ".1f") + "%",
+                     f"{fmt(s['cpu_avg_pct'], '.1f')}% / {fmt(s['rss_max_kb'] // 1024 if s['rss_max_kb'] else None, 'd')} MB"]
+            for col, text in enumerate(cells):
+                table.setItem(row, col, QTableWidgetItem(text))
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.resizeColumnsToContents()
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(dialog.reject)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(table)
+        layout.addWidget(buttons)
+        dialog.exec()
+
+    def refresh_sparklines(self):
+        serial = self.device_combo.currentData()
+        seconds = WINDOWS[self.history_window_combo.currentText()]
+        for key, name in self.card_metrics.items():
+            _, mins, maxs = self.metrics_store.window(serial, name, seconds)
+            self.cards[f"{key}_card"].set_history(mins, maxs)
+
+    def export_metrics_csv(self):
+        serial = self.device_combo.currentData()
+        if not serial or serial not in self.metrics_store.devices:
+            QMessageBox.information(self, "Export History", "No metrics recorded for the selected device yet.")
+            return
+        default_name = os.path.join(self.settings.get_last_dir("last_metrics_dir"), f"metrics_{serial.replace(':', '_')}.csv")
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics History", default_name, "CSV Files (*.csv)")
+        if not path: return
+        self.settings.set_last_dir(os.path.dirname(path), "last_metrics_dir")
+        window = self.history_window_combo.currentText()
+        rows = self.metrics_store.export_csv(serial, path, WINDOWS[window])
+        self.log(f"Exported {rows} metric samples ({window}) to {path}")
 
     def reboot_device(self, mode):
         serial = self.device_combo.currentData()
@@ -635,6 +1390,27 @@ class MainWindow(QMainWindow):
         if mode == "System": cmd = "adb reboot" if is_adb else "fastboot reboot"
         self.run_command(cmd)
 
+    def attach_network_fastboot(self):
+        serial = self.fastboot_tcp_input.text().strip()
+        if not serial: return
+        if not is_network_serial(serial): serial = f"tcp:{serial}"
+        thread = TaskThread(getvar_all, serial)
+        self.active_threads.append(thread)
+        thread.tag("getvar", serial)
+        thread.output_signal.connect(self.log)
+        def on_vars(variables):
+            if serial not in self.network_fastboot: self.network_fastboot.append(serial)
+            self.settings.set_last_dir(serial, "last_fastboot_tcp")
+            self.log(f"Attached network fastboot device {serial} ({variables.get('product', 'unknown product')})")
+            self.refresh_devices()
+            index = self.device_combo.findData(serial)
+            if index >= 0: self.device_combo.setCurrentIndex(index)
+        thread.result_signal.connect(on_vars)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
     def fetch_partitions(self):
         serial = self.device_combo.currentData()
         if serial:
@@ -654,34 +1430,166 @@ class MainWindow(QMainWindow):
 
     def browse_file(self, key="last_image_dir"):
         last_dir = self.settings.get_last_dir(key)
-        files, _ = QFileDialog.getOpenFileNames(self, "Select Images", last_dir, "Images (*.img *.bin)")
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Images", last_dir, "Images (*.img *.bin);;OTA / Factory Packages (*.zip *.bin)")
         if files:
             self.settings.set_last_dir(os.path.dirname(files[0]), key)
-            selected_part = self.partition_combo.currentText().strip()
             for f in files:
-                partition = selected_part if selected_part else os.path.basename(f).lower().replace(".img", "").replace(".bin", "")
-                row = self.queue_table.rowCount()
-                self.queue_table.insertRow(row)
-                part_item = QTableWidgetItem(partition)
-                self.queue_table.setItem(row, 0, part_item)
-                file_item = QTableWidgetItem(f)
-                file_item.setFlags(file_item.flags() & ~Qt.ItemIsEditable)
-                file_item.setToolTip(f)
-                self.queue_table.setItem(row, 1, file_item)
-                status_item = QTableWidgetItem("Pending")
-                status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
-                self.queue_table.setItem(row, 2, status_item)
+                if f.lower().endswith(".zip"): self.handle_zip_drop(f)
+            self.queue_image_files([f for f in files if not f.lower().endswith(".zip")])
 
     def install_apk(self):
         last_dir = self.settings.get_last_dir("last_apk_dir")
         apk, _ = QFileDialog.getOpenFileName(self, "Select APK", last_dir, "APK Files (*.apk)")
         if apk:
             self.settings.set_last_dir(os.path.dirname(apk), "last_apk_dir")
-            self.run_command(f'adb install "{apk}"')
+            serial = self.device_combo.currentData()
+            if serial and "ADB" in self.device_combo.currentText():
+                self.install_single_apk(serial, apk)
+                return
+            self.run_command(f'adb install "{apk}"', callback=lambda code: self.package_cache.invalidate(serial))
+
+    def adb_serials(self):
+        return [self.device_combo.itemData(i) for i in range(self.device_combo.count())
+                if self.device_combo.itemText(i).startswith("ADB:")]
+
+    def capture_serials(self):
+        if self.chk_capture_all.isChecked(): return self.adb_serials()
+        return [self.device_combo.currentData()] if "ADB" in self.device_combo.currentText() else []
+
+    def choose_capture_dir(self):
+        out_dir = QFileDialog.getExistingDirectory(self, "Save Captures To", self.settings.get_last_dir("last_capture_dir"))
+        if out_dir: self.settings.set_last_dir(out_dir, "last_capture_dir")
+        return out_dir
+
+    def capture_screenshots(self):
+        if self.capture_cancel:
+            self.capture_cancel.set()
+            return
+        serials = self.capture_serials()
+        if not serials:
+            QMessageBox.warning(self, "ADB Error", "Screen capture requires an active ADB connection.")
+            return
+        out_dir = self.choose_capture_dir()
+        if not out_dir: return
+        self.capture_cancel = threading.Event()
+        self.btn_screenshot.setText("Stop")
+        count = self.capture_count.value()
+        thread = TaskThread(capture_screens, serials, out_dir, count=count, interval=self.capture_interval.value() / 1000,
+                            image_format=self.capture_format.currentText().lower(), cancel_event=self.capture_cancel)
+        self.active_threads.append(thread)
+        self.progress.setMaximum(count * len(serials))
+        self.progress.setValue(0)
+        thread.tag("screenshot", serials[0] if len(serials) == 1 else None)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: self.progress.setValue(done))
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.capture_cancel = None
+            self.btn_screenshot.setText("Screenshot")
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def toggle_screen_recording(self):
+        if self.record_cancel:
+            self.record_cancel.set()
+            return
+        serials = self.capture_serials()
+        if not serials:
+            QMessageBox.warning(self, "ADB Error", "Screen recording requires an active ADB connection.")
+            return
+        out_dir = self.choose_capture_dir()
+        if not out_dir: return
+        self.record_cancel = threading.Event()
+        self.btn_record.setText("Stop Recording")
+        duration = self.record_duration.value()
+        thread = TaskThread(record_screens, serials, out_dir, duration=duration, cancel_event=self.record_cancel)
+        self.active_threads.append(thread)
+        self.progress.setMaximum(duration)
+        self.progress.setValue(0)
+        thread.tag("screenrecord", serials[0] if len(serials) == 1 else None)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: self.progress.setValue(done))
+        self.log(f"Recording {len(serials)} device(s) for up to {duration} s...")
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.record_cancel = None
+            self.btn_record.setText("Record Screen")
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def browse_bulk_apks(self):
+        last_dir = self.settings.get_last_dir("last_apk_dir")
+        apks, _ = QFileDialog.getOpenFileNames(self, "Select APKs", last_dir, "APK Files (*.apk)")
+        if apks:
+            self.settings.set_last_dir(os.path.dirname(apks[0]), "last_apk_dir")
+            self.start_bulk_install(apks)
+
+    def browse_bulk_folder(self):
+        last_dir = self.settings.get_last_dir("last_apk_dir")
+        folder = QFileDialog.getExistingDirectory(self, "Select APK Folder", last_dir)
+        if folder:
+            self.settings.set_last_dir(folder, "last_apk_dir")
+            self.start_bulk_install([folder])
+
+    def start_bulk_install(self, paths):
+        if self.bulk_installer:
+            QMessageBox.warning(self, "Busy", "A bulk install is already running.")
+            return
+        if self.chk_bulk_all.isChecked():
+            serials = self.adb_serials()
+        else:
+            serials = [self.device_combo.currentData()] if "ADB" in self.device_combo.currentText() else []
+        if not serials:
+            QMessageBox.warning(self, "ADB Error", "Please connect a device in ADB mode to install APKs.")
+            return
+        groups = group_apks(collect_apks(paths))
+        if not groups:
+            QMessageBox.warning(self, "No APKs", "No .apk files were found in the selection.")
+            return
+        reply = QMessageBox.question(self, "Bulk Install",
+                                     f"Install {len(groups)} package(s) on {len(serials)} device(s)?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes: return
+
+        self.nav_bar.setCurrentIndex(1)
+        self.bulk_table.setRowCount(0)
+        self.progress.setMaximum(len(groups) * len(serials))
+        self.progress.setValue(0)
+        self.btn_bulk_stop.setEnabled(True)
+        package_cache = self.package_cache if self.chk_bulk_skip.isChecked() else None
+        self.bulk_installer = BulkInstaller(serials, groups, per_device=self.bulk_per_device.value(), package_cache=package_cache)
+        thread = TaskThread(self.bulk_installer.run)
+        self.active_threads.append(thread)
+        thread.tag("install", serials[0] if len(serials) == 1 else None)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: self.progress.setValue(done))
+        thread.item_signal.connect(self.add_bulk_result)
+        def on_bulk_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.bulk_installer = None
+            self.btn_bulk_stop.setEnabled(False)
+        thread.finished_signal.connect(on_bulk_done)
+        thread.start()
+
+    def add_bulk_result(self, result):
+        row = self.bulk_table.rowCount()
+        self.bulk_table.insertRow(row)
+        status_item = QTableWidgetItem(result["status"])
+        status_color = Theme.TEXT_SECONDARY if result.get("skipped") else Theme.ACCENT if result["ok"] else Theme.DANGER
+        status_item.setForeground(QColor(status_color))
+        status_item.setToolTip(result["status"])
+        for col, item in enumerate([QTableWidgetItem(result["serial"]), QTableWidgetItem(result["name"]),
+                                    status_item, QTableWidgetItem(f"{result['seconds']:.2f}")]):
+            self.bulk_table.setItem(row, col, item)
+
+    def stop_bulk_install(self):
+        if self.bulk_installer:
+            self.bulk_installer.cancel()
+            self.log("Bulk install stopping after in-flight packages...")
 
     def set_ui_enabled(self, enabled):
         self.device_combo.setEnabled(enabled)
-        self.tabs.setEnabled(enabled)
+        self.content_stack.setEnabled(enabled)
         self.status_label.setText("Operation in progress..." if not enabled else "Ready")
 
     def run_command(self, cmd, callback=None, safety=False):
@@ -699,10 +1607,10 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.No: return
 
         self.set_ui_enabled(False)
-        self.log(f"> {cmd}")
-        thread = CommandThread(cmd)
+        thread = CommandThread(cmd).tag(cmd.split()[0], serial)
+        self.log(f"> {cmd}", serial, cmd, thread.job)
         self.active_threads.append(thread)
-        thread.output_signal.connect(self.log)
+        thread.output_signal.connect(lambda line: self.log(line, serial, cmd, thread.job))
         def on_finished_internal(code):
             if thread in self.active_threads: self.active_threads.remove(thread)
             self.set_ui_enabled(True)
@@ -710,65 +1618,253 @@ class MainWindow(QMainWindow):
         thread.finished_signal.connect(on_finished_internal)
         thread.start()
 
+    def run_device_shell(self, command, callback=None, root=False, timeout=60):
+        """ Runs ``command`` on the selected device's persistent shell; ``callback`` gets the exit code (-1 if the session failed) """
+        serial = self.device_combo.currentData()
+        if not serial: return
+        self.set_ui_enabled(False)
+        self.log(f"> {'#' if root else '$'} {command}", serial)
+        thread = TaskThread(shell, serial, command, root=root, timeout=timeout)
+        self.active_threads.append(thread)
+        thread.tag("shell", serial)
+        thread.output_signal.connect(self.log)
+        exit_code = [-1]
+        def on_result(result):
+            exit_code[0] = result.code
+            for line in result.output.splitlines(): self.log(line)
+        thread.result_signal.connect(on_result)
+        def on_finished_internal(status):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.set_ui_enabled(True)
+            if callback: callback(exit_code[0])
+        thread.finished_signal.connect(on_finished_internal)
+        thread.start()
+
     def update_queue_validation(self):
         has_items = self.queue_table.rowCount() > 0
         if hasattr(self, 'btn_flash'): self.btn_flash.setEnabled(has_items)
 
+    def queue_rows(self):
+        return [(i, self.queue_table.item(i, 0).text().strip(), self.queue_table.item(i, 1).text().strip())
+                for i in range(self.queue_table.rowCount())]
+
     def process_queue(self):
-        count = self.queue_table.rowCount()
-        if count == 0: return
-        cmds = []
+        if self.queue_table.rowCount() == 0 or self.is_flashing: return
+        rows = self.queue_rows()
+        unnamed = [os.path.basename(f) for _, p, f in rows if not p]
+        if unnamed:
+            QMessageBox.warning(self, "Missing Partition", "Enter a partition for:\n" + "\n".join(unnamed))
+            return
+        # Verdicts go into the queue before the plan is shown, so a bad image is visible before anything is flashed
+        self.verify_queue(rows, then=lambda: self.read_plan_variables(rows))
+
+    def verify_queue(self, rows=None, then=None):
+        rows = self.queue_rows() if rows is None else rows
+        if not rows: return
+        self.btn_flash.setEnabled(False)
+        self.avb_verdicts = {}
+        thread = TaskThread(verify_images, rows, cache=self.avb_cache)
+        self.active_threads.append(thread)
+        thread.tag("avb")
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: (self.progress.setMaximum(total), self.progress.setValue(done)))
+        thread.item_signal.connect(self.show_avb_verdict)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.btn_flash.setEnabled(True)
+            if code != 0: self.log("AVB verification failed; the queue was not checked.")
+            if then: then()
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def show_avb_verdict(self, verdict):
+        self.avb_verdicts[verdict["row"]] = verdict
+        if verdict["row"] >= self.queue_table.rowCount(): return
+        if verdict["state"] == "unchecked":
+            self.queue_table.item(verdict["row"], 2).setToolTip(verdict["detail"])
+            return
+        text, color = {"ok": ("Verified", Theme.SUCCESS), "mismatch": ("AVB Mismatch", Theme.DANGER)}.get(verdict["state"], ("AVB Error", Theme.DANGER))
+        status_item = QTableWidgetItem(text)
+        status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
+        status_item.setForeground(QColor(color))
+        status_item.setToolTip(verdict["detail"])
+        self.queue_table.setItem(verdict["row"], 2, status_item)
+        if verdict["state"] != "ok": self.log(f"AVB: {verdict['partition']}: {verdict['detail']}")
+
+    def read_plan_variables(self, rows):
+        serial = self.device_combo.currentData()
+        if not serial or "FASTBOOT" not in self.device_combo.currentText():
+            self.confirm_flash_plan(rows, {})
+            return
+        # The plan needs is-logical / is-userspace from the device; read them off the UI thread
+        self.btn_flash.setEnabled(False)
+        thread = TaskThread(get_fastboot_vars, serial)
+        self.active_threads.append(thread)
+        variables = {}
+        thread.result_signal.connect(variables.update)
+        def on_vars(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.btn_flash.setEnabled(True)
+            if code != 0 or not variables: self.log("Could not read device variables; flashing in table order without mode switches.")
+            self.confirm_flash_plan(rows, variables)
+        thread.finished_signal.connect(on_vars)
+        thread.start()
+
+    def confirm_flash_plan(self, rows, variables):
+        plan = build_plan(rows, variables)
         serial = self.device_combo.currentData()
-        for i in range(count):
-            p = self.queue_table.item(i, 0).text().strip()
-            f = self.queue_table.item(i, 1).text().strip()
-            base_cmd = f"fastboot flash {p} \"{f}\""
-            if serial: base_cmd = base_cmd.replace("fastboot", f"fastboot -s {serial}", 1)
-            cmds.append(base_cmd)
-        msg = "This operation will run the following commands:\n\n" + "\n".join(cmds) + "\n\nCRITICAL WARNING: Improper flashing can permanently damage your device.\nPROCEED WITH CAUTION!"
+        cmds = [line for step in plan["steps"] for line in describe_step(step)]
+        if serial: cmds = [cmd.replace("fastboot", f"fastboot -s {serial}", 1) if cmd.startswith("fastboot ") else cmd for cmd in cmds]
+        summary = ""
+        if plan["naive_switches"] > plan["switches"]:
+            estimated, _ = savings(plan)
+            summary = (f"\n\nReordered for {plan['switches']} mode switch(es) instead of {plan['naive_switches']} "
+                       f"(about {estimated:.0f} s saved).")
+        failed = [v for v in self.avb_verdicts.values() if v["state"] in ("mismatch", "error")]
+        if failed:
+            summary += ("\n\nAVB WARNING: these images do not match the vbmeta they are verified against and may not boot:\n"
+                        + "\n".join(f"{v['partition']}: {v['detail']}" for v in failed))
+        msg = "This operation will run the following commands:\n\n" + "\n".join(cmds) + summary + "\n\nCRITICAL WARNING: Improper flashing can permanently damage your device.\nPROCEED WITH CAUTION!"
         reply = QMessageBox.critical(self, "Batch Safety Verification", msg, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes and not self.is_flashing:
             self.is_flashing = True
             self.btn_flash.setEnabled(False)
             self.btn_flash.setText("Flashing...")
-            self.current_row = 0
-            self.progress.setMaximum(count)
+            self.flash_plan = plan
+            self.flash_step = 0
+            self.switch_durations = []
+            self.progress.setMaximum(len(plan["steps"]))
             self.progress.setValue(0)
             self.flash_next()
 
+    def run_mode_switch(self, mode):
+        self.log(f"> reboot to {mode} and wait", self.device_combo.currentData())
+        thread = TaskThread(switch_mode, self.device_combo.currentData(), mode)
+        self.active_threads.append(thread)
+        thread.tag("mode", self.device_combo.currentData())
+        thread.output_signal.connect(self.log)
+        thread.result_signal.connect(self.switch_durations.append)
+        def on_switched(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            if code != 0:
+                # Nothing else can run in the wrong mode; mark the rest and stop
+                for step in self.flash_plan["steps"][self.flash_step:]:
+                    if step["action"] == "flash": self.queue_table.setItem(step["row"], 2, QTableWidgetItem("Skipped"))
+                self.flash_step = len(self.flash_plan["steps"])
+            else:
+                self.flash_step += 1
+            self.progress.setValue(self.flash_step)
+            self.flash_next()
+        thread.finished_signal.connect(on_switched)
+        thread.start()
+
+    def report_flash_savings(self):
+        plan = self.flash_plan
+        if not plan or plan["naive_switches"] <= plan["switches"]: return
+        estimated, actual = savings(plan, self.switch_durations)
+        text = (f"Flash plan: {plan['switches']} mode switch(es) instead of {plan['naive_switches']}; "
+                f"estimated {estimated:.0f} s saved")
+        if actual is not None: text += f", actual ~{actual:.0f} s saved (measured switch {sum(self.switch_durations) / len(self.switch_durations):.1f} s)"
+        self.log(text)
+
     def flash_next(self):
-        if self.current_row < self.queue_table.rowCount():
+        steps = self.flash_plan["steps"]
+        if self.flash_step < len(steps):
+            step = steps[self.flash_step]
+            if step["action"] == "switch":
+                self.run_mode_switch(step["mode"])
+                return
+            self.current_row = step["row"]
             p = self.queue_table.item(self.current_row, 0).text().strip()
             f = self.queue_table.item(self.current_row, 1).text().strip()
             if not p:
                 self.log(f"Error: No partition specified for {f}")
                 self.on_finished(-1)
                 return
-            self.queue_table.setItem(self.current_row, 2, QTableWidgetItem("Flashing..."))
-            self.run_batch_command(f'fastboot flash {p} "{f}"', self.on_finished)
+            if is_ref(f):
+                self.stage_and_flash(p, f, extract_ref)
+                return
+            if is_backup_image(f):
+                self.stage_and_flash(p, f, stage_backup_image)
+                return
+            if is_super_ref(f):
+                self.stage_and_flash(p, f, stage_super_partition)
+                return
+            self.flash_image(p, f)
         else:
+            clear_cache(self.flash_cache_dir)
             self.is_flashing = False
             self.btn_flash.setText("START BATCH FLASH")
             self.btn_flash.setEnabled(True)
             self.progress.setValue(self.progress.maximum())
             self.set_ui_enabled(True)
+            self.report_flash_savings()
+            self.flash_plan = None
             self.log("<b>Batch operation complete.</b>")
 
     def run_batch_command(self, cmd, callback):
         serial = self.device_combo.currentData()
         if serial and "fastboot" in cmd: cmd = cmd.replace("fastboot", f"fastboot -s {serial}", 1)
         if serial and "adb" in cmd: cmd = cmd.replace("adb", f"adb -s {serial}", 1)
-        self.log(f"> {cmd}")
-        thread = CommandThread(cmd)
+        thread = CommandThread(cmd).tag(cmd.split()[0], serial)
+        self.log(f"> {cmd}", serial, cmd, thread.job)
         self.active_threads.append(thread)
-        thread.output_signal.connect(self.log)
+        thread.output_signal.connect(lambda line: self.log(line, serial, cmd, thread.job))
         def on_finished_batch(code):
             if thread in self.active_threads: self.active_threads.remove(thread)
             if callback: callback(code)
         thread.finished_signal.connect(on_finished_batch)
         thread.start()
 
+    def flash_image(self, partition, path):
+        self.queue_table.setItem(self.current_row, 2, QTableWidgetItem("Flashing..."))
+        serial = self.device_combo.currentData()
+        if not is_network_serial(serial):
+            self.run_batch_command(f'fastboot flash {partition} "{path}"', self.on_finished)
+            return
+        # Network devices are driven in-process: chunked mmap downloads with byte-level progress
+        self.log(f"> flash {partition} {path}", serial)
+        row = self.current_row
+        shown = {"pct": -1}
+        def on_progress(done_kb, total_kb):
+            pct = done_kb * 100 // max(total_kb, 1)
+            if pct != shown["pct"]:
+                shown["pct"] = pct
+                self.queue_table.setItem(row, 2, QTableWidgetItem(f"Flashing {pct}%"))
+        thread = TaskThread(flash_partition, serial, partition, path)
+        self.active_threads.append(thread)
+        thread.tag("flash", serial)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(on_progress)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.on_finished(code)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def stage_and_flash(self, partition, source, stager):
+        # Packed images (factory zips, backups) are unpacked one at a time, right before their turn
+        self.queue_table.setItem(self.current_row, 2, QTableWidgetItem("Extracting..."))
+        thread = TaskThread(stager, source, self.flash_cache_dir)
+        self.active_threads.append(thread)
+        thread.tag("stage", self.device_combo.currentData())
+        thread.output_signal.connect(self.log)
+        def on_staged(path):
+            self.staged_image = path
+        def on_stage_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            if code != 0 or not self.staged_image:
+                self.on_finished(-1)
+                return
+            self.flash_image(partition, self.staged_image)
+        thread.result_signal.connect(on_staged)
+        thread.finished_signal.connect(on_stage_done)
+        thread.start()
+
     def on_finished(self, code):
+        if self.staged_image:
+            remove_staged(self.staged_image, self.flash_cache_dir)
+            self.staged_image = None
         success = code == 0
         status = "Success" if success else "Failed"
         color = Theme.ACCENT if success else Theme.DANGER
@@ -778,8 +1874,8 @@ class MainWindow(QMainWindow):
         font.setBold(True)
         status_item.setFont(font)
         self.queue_table.setItem(self.current_row, 2, status_item)
-        self.current_row += 1
-        self.progress.setValue(self.current_row)
+        self.flash_step += 1
+        self.progress.setValue(self.flash_step)
         self.flash_next()
 
     def format_partition(self):
@@ -791,9 +1887,15 @@ class MainWindow(QMainWindow):
         self.run_command(f"fastboot format:{fs} {p}", safety=True)
 
     def save_logs(self):
-        if not self.session_log: return
-        filename = save_session_log(self.session_log)
-        QMessageBox.information(self, "Logs Saved", f"Session logs saved to: {filename}")
+        if not self.log_store.recent: return
+        # Reading the session back waits for the log writer, so it runs off the GUI thread
+        thread = TaskThread(save_session_log, self.log_store)
+        self.active_threads.append(thread)
+        thread.output_signal.connect(self.log)
+        thread.result_signal.connect(lambda filename: QMessageBox.information(
+            self, "Logs Saved", f"Session logs saved to: {filename}\n\nFull record log: {self.log_store.path}"))
+        thread.finished_signal.connect(lambda code: self.active_threads.remove(thread) if thread in self.active_threads else None)
+        thread.start()
 
     def boot_monitor(self):
         serial = self.device_combo.currentData()
@@ -815,7 +1917,7 @@ class MainWindow(QMainWindow):
                 return
         full_cmd = f"{tool} {cmd_text}"
         is_dangerous = any(x in cmd_text.lower() for x in ["flash", "erase", "format", "repartition", "uninstall", "rm "])
-        self.tabs.setCurrentIndex(4)
+        self.nav_bar.setCurrentIndex(self.logs_tab_index)
         self.run_command(full_cmd, safety=is_dangerous)
         self.terminal_input.clear()
 
@@ -895,8 +1997,7 @@ class MainWindow(QMainWindow):
                     conn_addr, ok = QInputDialog.getText(self, "Step 2: Connect", 
                                                        "Enter Connection IP:Port (e.g. 192.168.1.5:5555):")
                     if ok and conn_addr:
-                        self.settings.set_last_dir(conn_addr, "last_adb_ip")
-                        self.run_command(f"adb connect {conn_addr}")
+                        self.connect_wireless(conn_addr.strip())
                 else:
                     QMessageBox.critical(self, "Pairing Failed", 
                                        "Pairing failed. Ensure the IP and Code are correct and the phone's pairing screen is still visible.")
@@ -907,51 +2008,359 @@ class MainWindow(QMainWindow):
         last_ip = self.settings.get_last_dir("last_adb_ip")
         ip, ok = QInputDialog.getText(self, "Quick Connect", "Enter Device IP:Port:", text=last_ip)
         if ok and ip:
-            self.settings.set_last_dir(ip, "last_adb_ip")
-            self.run_command(f"adb connect {ip}")
+            self.connect_wireless(ip.strip())
 
-    def launch_scrcpy(self, mode):
-        scrcpy_path = shutil.which("scrcpy")
-        if not scrcpy_path:
-            QMessageBox.critical(self, "Missing Tool", "Scrcpy executable not found in system PATH.")
+    def connect_wireless(self, address):
+        """ Connects once and remembers the endpoint in the pool so the keepalive picks it up """
+        try:
+            self.wireless.pool.add(address)
+        except WirelessError as e:
+            QMessageBox.warning(self, "Wireless ADB", str(e))
+            return
+        self.settings.set_last_dir(address, "last_adb_ip")
+        thread = TaskThread(connect_endpoint, address)
+        self.active_threads.append(thread)
+        thread.tag("connect", address)
+        thread.output_signal.connect(self.log)
+        thread.result_signal.connect(lambda reply: self.log(reply))
+        def on_done(code):
+            self.show_wireless_status({"address": address, "name": self.wireless.pool.endpoints.get(address, {}).get("name", ""),
+                                       "state": "connected" if code == 0 else "offline", "latency_ms": None,
+                                       "failures": 0 if code == 0 else 1, "error": None})
+            if code == 0: self.refresh_devices()
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def discover_wireless(self):
+        thread = TaskThread(self.wireless.discover)
+        self.active_threads.append(thread)
+        thread.tag("discover")
+        thread.output_signal.connect(self.log)
+        def on_discovered(pairing):
+            for service in pairing:
+                self.log(f"{service['name']} is waiting to pair at {service['address']}")
+        thread.result_signal.connect(on_discovered)
+        def on_done(code):
+            for address in self.wireless.pool.addresses():
+                if self.find_wireless_row(address) < 0:
+                    self.show_wireless_status({"address": address, "name": self.wireless.pool.endpoints[address]["name"],
+                                               "state": "unknown", "latency_ms": None, "failures": 0, "error": None})
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def toggle_wireless_keepalive(self, enabled):
+        if not enabled:
+            if self.wireless_cancel is not None: self.wireless_cancel.set()
             return
+        if self.wireless_cancel is not None: return
+        self.wireless_cancel = threading.Event()
+        thread = TaskThread(self.wireless.run, self.wireless_cancel)
+        self.active_threads.append(thread)
+        thread.tag("wireless")
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.show_wireless_status)
+        def on_done(code):
+            self.wireless_cancel = None
+            if self.btn_keepalive.isChecked(): self.btn_keepalive.setChecked(False)
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
 
+    def find_wireless_row(self, address):
+        for row in range(self.wireless_table.rowCount()):
+            if self.wireless_table.item(row, 0).text() == address: return row
+        return -1
+
+    def show_wireless_status(self, status):
+        row = self.find_wireless_row(status["address"])
+        if row < 0:
+            row = self.wireless_table.rowCount()
+            self.wireless_table.insertRow(row)
+        state = status["state"]
+        if state == "offline" and status["failures"] > 1: state = f"offline ({status['failures']}x)"
+        latency = f"{status['latency_ms']:.0f} ms" if status["latency_ms"] is not None else "-"
+        for col, text in enumerate([status["address"], status["name"], state, latency]):
+            item = QTableWidgetItem(text)
+            if status["error"]: item.setToolTip(status["error"])
+            if col == 2:
+                item.setForeground(QColor(Theme.SUCCESS if status["state"] in ("connected", "reconnected")
+                                          else Theme.DANGER if status["state"] == "offline" else Theme.TEXT_SECONDARY))
+            self.wireless_table.setItem(row, col, item)
+
+    def forget_wireless_endpoint(self):
+        rows = sorted({index.row() for index in self.wireless_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.wireless.pool.remove(self.wireless_table.item(row, 0).text())
+            self.wireless_table.removeRow(row)
+
+    def launch_scrcpy(self, mode):
         serial = self.device_combo.currentData()
         if not serial or "ADB" not in self.device_combo.currentText():
             QMessageBox.warning(self, "Connection Error", "Mirroring requires an active ADB connection.")
             return
+        self.log({"dex": "Launching Ultimate DeX Mode...", "gaming": "Launching Gaming Mode..."}.get(mode, "Launching Standard Mirroring..."))
+        self.start_mirroring([serial], mode)
 
-        # Build command list
-        cmd_args = [scrcpy_path, "-s", serial, "--always-on-top", "--no-audio"]
-        
-        if mode == "dex":
-            # Session Start: Wake up the device
-            wake_cmd = f"adb -s {serial} shell 'input keyevent KEYCODE_WAKE && wm dismiss-keyguard'"
-            try: subprocess.run(wake_cmd, shell=True, capture_output=True)
-            except: pass
+    def start_mirroring(self, serials, mode):
+        """ Wakes and launches off the UI thread; limits come from the shared host budget """
+        if not serials:
+            QMessageBox.warning(self, "Connection Error", "Mirroring requires an active ADB connection.")
+            return
+        if not shutil.which("scrcpy"):
+            QMessageBox.critical(self, "Missing Tool", "Scrcpy executable not found in system PATH.")
+            return
+        self.mirror.budget = host_budget(bandwidth_mbps=self.mirror_bandwidth.value())
+        thread = TaskThread(self.mirror.start, serials, mode, audio=self.chk_audio.isChecked())
+        self.active_threads.append(thread)
+        thread.tag("mirror", serials[0] if len(serials) == 1 else None)
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.show_mirror_status)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.watch_mirroring()
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def watch_mirroring(self):
+        if self.mirror_cancel is not None: return
+        self.mirror_cancel = threading.Event()
+        cancel = self.mirror_cancel
+        thread = TaskThread(self.mirror.run, cancel)
+        self.active_threads.append(thread)
+        thread.tag("mirror-watch")
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.show_mirror_status)
+        def on_done(code):
+            self.mirror_cancel = None
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            # A session started after the watcher saw none left was not watched (mirror_cancel was still set)
+            if not cancel.is_set() and any(s["state"] in ("running", "waiting", "starting") for s in self.mirror.statuses()):
+                self.watch_mirroring()
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def stop_mirroring(self):
+        rows = sorted({index.row() for index in self.mirror_table.selectedIndexes()})
+        serials = [self.mirror_table.item(row, 0).text() for row in rows] or None
+        thread = TaskThread(self.mirror.stop, serials)
+        self.active_threads.append(thread)
+        thread.tag("mirror-stop")
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.show_mirror_status)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def show_mirror_status(self, status):
+        row = next((r for r in range(self.mirror_table.rowCount()) if self.mirror_table.item(r, 0).text() == status["serial"]), -1)
+        if status["state"] in ("closed", "stopped"):
+            if row >= 0: self.mirror_table.removeRow(row)
+            return
+        if row < 0:
+            row = self.mirror_table.rowCount()
+            self.mirror_table.insertRow(row)
+        state = status["state"] + (f" ({status['restarts']} restarts)" if status["restarts"] else "")
+        limits = describe_limits(status["limits"]) if status["limits"] else "-"
+        for col, text in enumerate([status["serial"], status["mode"], limits, state]):
+            item = QTableWidgetItem(text)
+            if status["error"]: item.setToolTip(status["error"])
+            if col == 3:
+                item.setForeground(QColor(Theme.SUCCESS if status["state"] == "running"
+                                          else Theme.DANGER if status["state"] == "failed" else Theme.TEXT_SECONDARY))
+            self.mirror_table.setItem(row, col, item)
+
+    def adb_serial_or_warn(self):
+        serial = self.device_combo.currentData()
+        if not serial or "ADB" not in self.device_combo.currentText():
+            QMessageBox.warning(self, "Connection Error", "Please select a device in ADB mode first.")
+            return None
+        return serial
+
+    def list_remote_dir(self):
+        serial = self.adb_serial_or_warn()
+        if not serial: return
+        path = self.remote_path_input.text().strip() or "/"
+        self.remote_table.setRowCount(0)
+        self.remote_table.setSortingEnabled(False)
+        thread = TaskThread(list_remote, serial, path)
+        self.active_threads.append(thread)
+        thread.tag("ls", serial)
+        thread.output_signal.connect(self.log)
+        thread.item_signal.connect(self.add_remote_entry)
+        def on_listed(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.remote_table.sortItems(0)
+        thread.finished_signal.connect(on_listed)
+        thread.start()
 
-            cmd_args += [
-                "--turn-screen-off", 
-                "--stay-awake", 
-                "--disable-screensaver",
-                "--power-off-on-close",
-                "--max-fps", "60",
-                "--video-bit-rate", "16M"
-            ]
-            self.log("Launching Ultimate DeX Mode...")
-        elif mode == "gaming":
-            cmd_args += ["--max-fps", "60", "--video-bit-rate", "16M"]
-            self.log("Launching Gaming Mode...")
+    def add_remote_entry(self, entry):
+        row = self.remote_table.rowCount()
+        self.remote_table.insertRow(row)
+        name_item = QTableWidgetItem(entry["name"] + ("/" if entry["is_dir"] else ""))
+        name_item.setData(Qt.UserRole, entry)
+        if entry["is_dir"]: name_item.setForeground(QColor(Theme.ACCENT))
+        size_text = "" if entry["is_dir"] else f"{entry['size'] / 1024:.1f} KB"
+        modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["mtime"])) if entry["mtime"] else ""
+        for col, item in enumerate([name_item, QTableWidgetItem(size_text), QTableWidgetItem(modified)]):
+            self.remote_table.setItem(row, col, item)
+
+    def open_remote_entry(self, row, column):
+        entry = self.remote_table.item(row, 0).data(Qt.UserRole)
+        if entry and entry["is_dir"]:
+            self.remote_path_input.setText(posixpath.join(self.remote_path_input.text().strip() or "/", entry["name"]) + "/")
+            self.list_remote_dir()
+
+    def remote_dir_up(self):
+        path = self.remote_path_input.text().strip().rstrip("/")
+        self.remote_path_input.setText((posixpath.dirname(path) or "/").rstrip("/") + "/")
+        self.list_remote_dir()
+
+    def push_to_device(self, folder=False):
+        serial = self.adb_serial_or_warn()
+        if not serial: return
+        last_dir = self.settings.get_last_dir("last_push_dir")
+        if folder:
+            picked = QFileDialog.getExistingDirectory(self, "Select Folder to Push", last_dir)
+            paths = [picked] if picked else []
         else:
-            self.log("Launching Standard Mirroring...")
+            paths, _ = QFileDialog.getOpenFileNames(self, "Select Files to Push", last_dir)
+        if not paths: return
+        self.settings.set_last_dir(paths[0] if folder else os.path.dirname(paths[0]), "last_push_dir")
+        remote_dir = self.remote_path_input.text().strip().rstrip("/") or "/sdcard"
+        self.start_transfer(push_paths, serial, paths, remote_dir)
+
+    def pull_from_device(self):
+        serial = self.adb_serial_or_warn()
+        if not serial: return
+        base = self.remote_path_input.text().strip() or "/"
+        rows = sorted({index.row() for index in self.remote_table.selectedIndexes()})
+        remote_paths = [posixpath.join(base, self.remote_table.item(r, 0).data(Qt.UserRole)["name"]) for r in rows]
+        if not remote_paths:
+            QMessageBox.information(self, "Pull", "Select one or more files or folders to pull.")
+            return
+        local_dir = QFileDialog.getExistingDirectory(self, "Pull To", self.settings.get_last_dir("last_pull_dir"))
+        if not local_dir: return
+        self.settings.set_last_dir(local_dir, "last_pull_dir")
+        self.start_transfer(pull_paths, serial, remote_paths, local_dir)
+
+    def start_transfer(self, func, serial, sources, destination):
+        if self.transfer_cancel:
+            QMessageBox.warning(self, "Busy", "A transfer is already running.")
+            return
+        self.transfer_cancel = threading.Event()
+        self.transfer_table.setRowCount(0)
+        self.transfer_stats.setText("Preparing transfer...")
+        self.btn_transfer_stop.setEnabled(True)
+        started = time.monotonic()
+        thread = TaskThread(func, serial, sources, destination, connections=self.transfer_connections.value(),
+                            cancel_event=self.transfer_cancel)
+        self.active_threads.append(thread)
+        thread.tag(func.__name__, serial)
+        thread.output_signal.connect(self.log)
+        def on_progress(done_kb, total_kb):
+            self.progress.setMaximum(total_kb)
+            self.progress.setValue(done_kb)
+            rate = done_kb / 1024 / max(time.monotonic() - started, 1e-6)
+            self.transfer_stats.setText(f"{done_kb / 1024:.1f} / {total_kb / 1024:.1f} MB | {rate:.1f} MB/s")
+        thread.progress_signal.connect(on_progress)
+        thread.item_signal.connect(self.add_transfer_result)
+        thread.result_signal.connect(lambda stats: self.transfer_stats.setText(
+            f"Done: {stats['files'] - stats['failed']} file(s), {stats['bytes'] / (1024 * 1024):.1f} MB, "
+            f"{stats['mbps']:.1f} MB/s avg, {stats['failed']} failed"))
+        def on_transfer_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.transfer_cancel = None
+            self.btn_transfer_stop.setEnabled(False)
+        thread.finished_signal.connect(on_transfer_done)
+        thread.start()
+
+    def add_transfer_result(self, result):
+        row = self.transfer_table.rowCount()
+        self.transfer_table.insertRow(row)
+        status_item = QTableWidgetItem(result["status"])
+        status_item.setForeground(QColor(Theme.ACCENT if result["ok"] else Theme.DANGER))
+        for col, item in enumerate([QTableWidgetItem(result["path"]), status_item, QTableWidgetItem(f"{result['seconds']:.2f}")]):
+            self.transfer_table.setItem(row, col, item)
+
+    def stop_transfer(self):
+        if self.transfer_cancel:
+            self.transfer_cancel.set()
+            self.log("Transfer stopping after in-flight files...")
+
+    def backup_target(self):
+        serial = self.device_combo.currentData()
+        text = self.device_combo.currentText()
+        if not serial or not (text.startswith("ADB") or text.startswith("RECOVERY")):
+            QMessageBox.warning(self, "Connection Error", "Partition backup needs a rooted device in ADB mode or a recovery with adb.")
+            return None, False
+        # Recovery shells already run as root; Android needs su
+        return serial, text.startswith("ADB")
+
+    def fetch_backup_partitions(self):
+        serial, use_su = self.backup_target()
+        if not serial: return
+        thread = TaskThread(list_block_partitions, serial, use_su)
+        self.active_threads.append(thread)
+        thread.tag("partitions", serial)
+        thread.output_signal.connect(self.log)
+        def on_partitions(sizes):
+            self.backup_part_list.clear()
+            if not sizes:
+                self.log("Error: no partitions found under /dev/block/by-name (root denied?)")
+            for name in sorted(sizes):
+                item = QListWidgetItem(f"{name}  ({sizes[name] / (1024 * 1024):.1f} MB)")
+                item.setData(Qt.UserRole, (name, sizes[name]))
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked if name.split("_")[0] in ("boot", "vbmeta", "persist", "efs") else Qt.Unchecked)
+                self.backup_part_list.addItem(item)
+        thread.result_signal.connect(on_partitions)
+        thread.finished_signal.connect(lambda code: self.active_threads.remove(thread) if thread in self.active_threads else None)
+        thread.start()
+
+    def is_busy(self, thread, title):
+        """ Warns and returns True while ``thread`` is still running """
+        if thread is None or not thread.isRunning(): return False
+        QMessageBox.information(self, title, "The previous run is still in progress; wait for it to finish.")
+        return True
 
+    def backup_selected_partitions(self):
+        if self.is_busy(self.backup_thread, "Backup"): return
+        serial, use_su = self.backup_target()
+        if not serial: return
+        selected = dict(self.backup_part_list.item(i).data(Qt.UserRole) for i in range(self.backup_part_list.count())
+                        if self.backup_part_list.item(i).checkState() == Qt.Checked)
+        if not selected:
+            QMessageBox.information(self, "Backup", "Fetch partitions and tick the ones to back up.")
+            return
+        root_dir = QFileDialog.getExistingDirectory(self, "Backup Folder", self.settings.get_last_dir("last_backup_dir"))
+        if not root_dir: return
+        self.settings.set_last_dir(root_dir, "last_backup_dir")
+        self.progress.setValue(0)
+        thread = TaskThread(backup_partitions, serial, selected, root_dir, use_su=use_su, parallel=self.backup_parallel.value(),
+                            dedup=self.backup_dedup.isChecked())
+        self.backup_thread = thread
+        self.active_threads.append(thread)
+        thread.tag("backup", serial)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: (self.progress.setMaximum(total), self.progress.setValue(done)))
+        thread.finished_signal.connect(lambda code: self.active_threads.remove(thread) if thread in self.active_threads else None)
+        thread.start()
+
+    def restore_backup_to_queue(self):
+        manifest, _ = QFileDialog.getOpenFileName(self, "Select Backup Manifest", self.settings.get_last_dir("last_backup_dir"), "Backup Manifest (manifest.json)")
+        if not manifest: return
         try:
-            if sys.platform == "win32":
-                subprocess.Popen(cmd_args, creationflags=subprocess.CREATE_NEW_CONSOLE)
-            else:
-                subprocess.Popen(cmd_args, start_new_session=True)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to launch scrcpy: {str(e)}")
+            entries = restore_entries(manifest)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Restore Error", f"Invalid backup manifest:\n{str(e)}")
+            return
+        self.nav_bar.setCurrentIndex(2)
+        for partition, path in entries:
+            self.add_queue_row(partition, path)
+        self.log(f"Queued {len(entries)} partition(s) from backup {os.path.dirname(manifest)}")
 
     def browse_sideload_file(self):
         last_dir = self.settings.get_last_dir("last_sideload_dir")
@@ -970,17 +2379,64 @@ class MainWindow(QMainWindow):
         if "ADB" not in mode_text and "SIDELOAD" not in mode_text:
             QMessageBox.warning(self, "Mode Error", "Sideload requires the device to be in ADB/Sideload mode.")
             return
-        self.run_command(f'adb sideload "{path}"')
+        self.set_ui_enabled(False)
+        self.progress.setMaximum(100)
+        self.progress.setValue(0)
+        thread = TaskThread(sideload_package, serial, path)
+        self.active_threads.append(thread)
+        thread.tag("sideload", serial)
+        thread.output_signal.connect(self.log)
+        thread.progress_signal.connect(lambda done, total: self.progress.setValue(done))
+        thread.item_signal.connect(self.update_sideload_stats)
+        def on_sideload_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+            self.set_ui_enabled(True)
+            # Clears a STALLED alert left by the last stats report
+            set_level(self.status_label, "ok")
+        thread.finished_signal.connect(on_sideload_done)
+        thread.start()
+
+    def update_sideload_stats(self, stats):
+        text = f"Sideload: ~{stats['percent']}% | {stats['mbps']:.1f} MB/s | {stats['requests']} blocks"
+        if stats["stalled"]:
+            self.status_label.setText(text + " | STALLED (check recovery screen)")
+            set_level(self.status_label, "alert")
+        else:
+            self.status_label.setText(text)
+            set_level(self.status_label, "ok")
 
     def load_presets(self):
+        catalog = PresetCatalog(get_resource_path("presets"), get_cache_path("preset_index.json"))
+        thread = TaskThread(catalog.scan)
+        self.active_threads.append(thread)
+        thread.tag("presets")
+        thread.output_signal.connect(self.log)
+        def on_indexed(catalog):
+            self.preset_catalog = catalog
+            for combo, field, label in [(self.preset_brand_combo, "brand", "All Brands"),
+                                        (self.preset_android_combo, "android", "All Android")]:
+                combo.blockSignals(True)
+                combo.clear()
+                combo.addItem(label, "")
+                for value in catalog.facets(field):
+                    combo.addItem(value, value)
+                combo.blockSignals(False)
+            self.filter_presets()
+        thread.result_signal.connect(on_indexed)
+        thread.finished_signal.connect(lambda code: self.active_threads.remove(thread) if thread in self.active_threads else None)
+        thread.start()
+
+    def filter_presets(self):
+        if not self.preset_catalog: return
+        results = self.preset_catalog.search(self.preset_search.text(),
+                                             brand=self.preset_brand_combo.currentData(),
+                                             android=self.preset_android_combo.currentData())
         self.preset_combo.clear()
-        self.preset_combo.addItem("Select Preset...")
-        presets_dir = get_resource_path("presets")
-        if os.path.exists(presets_dir):
-            for f in os.listdir(presets_dir):
-                if f.endswith(".prop"):
-                    name = f.replace(".prop", "").replace("_", " ")
-                    self.preset_combo.addItem(name, os.path.join(presets_dir, f))
+        self.preset_combo.addItem(f"Select Preset... ({len(results)} of {len(self.preset_catalog.entries)})")
+        for file_name, meta in results[:PRESET_RESULT_LIMIT]:
+            self.preset_combo.addItem(meta["name"], self.preset_catalog.path_for(file_name))
+            tooltip = f"{meta['brand']} {meta['model']} | Android {meta['android'] or '?'}\n{meta['fingerprint']}"
+            self.preset_combo.setItemData(self.preset_combo.count() - 1, tooltip, Qt.ToolTipRole)
 
     def apply_identity_preset(self):
         preset_name = self.preset_combo.currentText()
@@ -1013,8 +2469,8 @@ class MainWindow(QMainWindow):
                     QTimer.singleShot(2000, self.on_device_selected)
                 else:
                     self.tweak_console.append(f"<b>Failed with code {code}</b>")
-                    if code == 13: QMessageBox.critical(self, "Root Denied", "Grant 'Shell' root in Magisk.")
-            self.run_command(f"adb shell su -c '{full_script}'", callback=on_preset_done)
+                    if code == -1: QMessageBox.critical(self, "Root Denied", "Could not open a root shell. Grant 'Shell' root in Magisk.")
+            self.run_device_shell(full_script, callback=on_preset_done, root=True)
         except Exception as e: self.tweak_console.append(f"Error reading preset: {str(e)}")
 
     def install_magisk_fix(self):
@@ -1048,26 +2504,78 @@ class MainWindow(QMainWindow):
             target_path = "/data/adb/service.d/nat_fix.sh"
             push_cmd = f"adb -s {serial} push \"{local_script}\" /data/local/tmp/nat_fix.sh"
             full_su_cmd = f"mkdir -p /data/adb/service.d && cat /data/local/tmp/nat_fix.sh > {target_path} && chmod 755 {target_path} && rm /data/local/tmp/nat_fix.sh"
-            move_cmd = f"adb -s {serial} shell su -c \"{full_su_cmd}\""
             def on_install_done(code):
                 if code == 0:
                     self.tweak_console.append("<b>Permanent fix installed! REBOOT device.</b>")
                     QMessageBox.information(self, "Success", "Script installed to /data/adb/service.d/nat_fix.sh\\n\\nPlease REBOOT.")
                 else: self.tweak_console.append(f"Failed (Exit Code {code}). Check root.")
-            self.run_batch_command(push_cmd, lambda code: self.run_command(move_cmd, callback=on_install_done))
+            self.run_batch_command(push_cmd, lambda code: self.run_device_shell(full_su_cmd, callback=on_install_done, root=True))
         except Exception as e: self.tweak_console.append(f"Error: {str(e)}")
 
+    def open_boot_image(self):
+        last_dir = self.settings.get_last_dir("last_boot_image_dir")
+        path, _ = QFileDialog.getOpenFileName(self, "Select Boot Image", last_dir, "Images (*.img *.bin);;All Files (*)")
+        if not path: return
+        self.settings.set_last_dir(os.path.dirname(path), "last_boot_image_dir")
+        thread = TaskThread(read_boot_info, path)
+        self.active_threads.append(thread)
+        thread.output_signal.connect(self.tweak_console.append)
+        def on_info(info):
+            self.boot_image_input.setText(path)
+            self.boot_cmdline_input.setText(info["cmdline"])
+            sizes = ", ".join(f"{c['name']} {c['size'] / 1024:.0f} KB" for c in info["components"] if c["size"])
+            parts = [f"{info['kind']} v{info['header_version']} -> {info['partition']}", sizes, f"ramdisk: {info['ramdisk_format']}"]
+            if info["os_version"]: parts.append(f"Android {info['os_version']}, patch {info['os_patch_level']}")
+            if info["avb_footer"]: parts.append("AVB footer")
+            self.boot_info_lbl.setText("  |  ".join(parts))
+            self.btn_boot_repack.setEnabled(True)
+        thread.result_signal.connect(on_info)
+        def on_done(code):
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
+    def choose_boot_ramdisk(self):
+        last_dir = self.settings.get_last_dir("last_boot_image_dir")
+        path, _ = QFileDialog.getOpenFileName(self, "Select Ramdisk", last_dir, "Ramdisk (*.cpio *.gz *.lz4 *.img);;All Files (*)")
+        if path: self.boot_ramdisk_input.setText(path)
+
+    def repack_boot_to_queue(self):
+        source = self.boot_image_input.text()
+        if not source: return
+        out_path = os.path.splitext(source)[0] + "_repacked.img"
+        ramdisk = self.boot_ramdisk_input.text().strip() or None
+        self.btn_boot_repack.setEnabled(False)
+        thread = TaskThread(repack_boot_image, source, out_path, ramdisk=ramdisk, cmdline=self.boot_cmdline_input.text())
+        self.active_threads.append(thread)
+        thread.output_signal.connect(self.tweak_console.append)
+        def on_repacked(result):
+            self.add_queue_row(result["partition"], result["path"])
+            self.log(f"Queued {os.path.basename(result['path'])} for {result['partition']}")
+        thread.result_signal.connect(on_repacked)
+        def on_done(code):
+            self.btn_boot_repack.setEnabled(True)
+            if thread in self.active_threads: self.active_threads.remove(thread)
+        thread.finished_signal.connect(on_done)
+        thread.start()
+
     def read_all_props(self):
         serial = self.device_combo.currentData()
         if not serial: return
         self.tweak_console.append("Fetching system properties...")
         self.prop_table.setRowCount(0)
         self.set_ui_enabled(False)
-        self.thread = CommandThread(f"adb -s {serial} shell getprop")
-        self.thread.output_signal.connect(self.populate_props)
+        self.thread = TaskThread(shell, serial, "getprop")
+        self.thread.output_signal.connect(self.tweak_console.append)
+        self.thread.result_signal.connect(self.populate_all_props)
         self.thread.finished_signal.connect(lambda: self.set_ui_enabled(True))
         self.thread.start()
 
+    def populate_all_props(self, result):
+        self.prop_table.setUpdatesEnabled(False)
+        for line in result.output.splitlines(): self.populate_props(line)
+        self.prop_table.setUpdatesEnabled(True)
+
     def populate_props(self, line):
         if ":" in line:
             try:
@@ -1111,7 +2619,7 @@ class MainWindow(QMainWindow):
             self.tweak_console.append(f"<b>Starting batch write...</b>")
             commands = [f"resetprop -n {key} \"{val}\"" for key, val in self.modified_props.items()]
             full_script = " ; ".join(commands)
-            self.run_command(f"adb shell su -c '{full_script}'", callback=lambda code: self.tweak_console.append(f"Batch write status: {code}"))
+            self.run_device_shell(full_script, callback=lambda code: self.tweak_console.append(f"Batch write status: {code}"), root=True)
             self.modified_props = {}
             QTimer.singleShot(2000, self.read_all_props)
 
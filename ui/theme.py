@@ -220,4 +220,9 @@ class Theme:
             background: {cls.BG_INPUT}; 
             border-radius: 4px; 
         }}
+
+        /* Status colours are switched with the "level" dynamic property (see set_level) */
+        QLabel[level="ok"] {{ color: {cls.ACCENT}; font-weight: bold; }}
+        QLabel[level="warn"] {{ color: #FFC107; font-weight: bold; }}
+        QLabel[level="alert"] {{ color: {cls.DANGER}; font-weight: bold; }}
         """
@@ -1,23 +1,156 @@
 import datetime
 import os
+import re
+import json
+import glob
+import time
+import queue
+import threading
+from collections import deque
 
-def save_session_log(logs):
+# Only the formatting tags callers use; "< waiting for device >" and the like are real output
+MARKUP = re.compile(r"</?(?:b|i|u|br|font|span)\b[^>]*>", re.IGNORECASE)
+LEVELS = ("command", "success", "error", "info")
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+KEEP_SESSIONS = 10
+MEMORY_RECORDS = 5000
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 256
+
+def strip_markup(text):
+    return MARKUP.sub("", text)
+
+def classify(text):
+    """ Level of a console line; decided once when the line is logged """
+    if text.startswith(">"): return "command"
+    if "OKAY" in text or "Success" in text or "finished" in text: return "success"
+    if "FAILED" in text or "error" in text or "Error" in text: return "error"
+    return "info"
+
+def make_record(text, serial=None, source=None, level=None, job=None):
+    msg = strip_markup(text)
+    return {"ts": time.time(), "serial": serial, "source": source, "job": job, "level": level or classify(msg), "msg": msg}
+
+def format_record(record):
+    stamp = datetime.datetime.fromtimestamp(record["ts"]).strftime("%H:%M:%S")
+    device = f" [{record['serial']}]" if record.get("serial") else ""
+    job = f"{record['job']}: " if record.get("job") else ""
+    return f"{stamp}{device} {record['level'].upper():7} {job}{record['msg']}"
+
+class LogStore:
+    """ Session log records, kept in memory for the consoles and streamed to a rotating JSONL file.
+
+    ``append`` only queues; a background writer drains the queue in
+    batches (at most every FLUSH_INTERVAL seconds) and flushes once per
+    batch, so a crash loses at most the last half second. The in-memory
+    copy is capped at MEMORY_RECORDS; ``read_records`` reads the whole
+    session back from disk.
+    """
+    def __init__(self, directory, max_bytes=MAX_BYTES, backups=BACKUPS, memory=MEMORY_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        prune_sessions(directory)
+        self.path = os.path.join(directory, f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.recent = deque(maxlen=memory)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self.writer.start()
+
+    def append(self, record):
+        self.recent.append(record)
+        self.queue.put(record)
+        return record
+
+    def _rotate(self, out):
+        out.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _write_loop(self):
+        out = open(self.path, "a", encoding="utf-8")
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                try: batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            if None in batch:
+                running = False
+                batch = [r for r in batch if r is not None]
+            with self.lock:
+                try:
+                    out.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+                    out.flush()
+                    if out.tell() >= self.max_bytes: out = self._rotate(out)
+                except OSError:
+                    pass
+            for _ in batch: self.queue.task_done()
+        out.close()
+        self.queue.task_done()
+
+    def flush(self):
+        """ Blocks until everything appended so far is on disk """
+        self.queue.join()
+
+    def files(self):
+        """ The session's files, oldest first """
+        return [f"{self.path}.{i}" for i in range(self.backups, 0, -1) if os.path.exists(f"{self.path}.{i}")] + [self.path]
+
+    def read_records(self):
+        """ Every record of the session, oldest first; waits for the writer, so call it off the GUI thread """
+        self.flush()
+        # The lock only covers reading the files (so a rotation cannot happen mid-read); parsing runs after it
+        lines = []
+        with self.lock:
+            for path in self.files():
+                try:
+                    with open(path, "r", encoding="utf-8") as f: lines.extend(f)
+                except OSError:
+                    continue
+        records = []
+        for line in lines:
+            try: records.append(json.loads(line))
+            except ValueError: continue
+        return records
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join(timeout=5)
+
+def prune_sessions(directory, keep=KEEP_SESSIONS):
+    """ Removes the files of all but the newest ``keep`` sessions """
+    sessions = sorted(glob.glob(os.path.join(directory, "session_*.jsonl")))
+    for path in sessions[:-keep] if keep else sessions:
+        for old in glob.glob(glob.escape(path) + "*"):
+            try: os.remove(old)
+            except OSError: pass
+
+def save_session_log(store, log=None, progress=None, report=None):
+    """ Writes ``store``'s session as a readable text file; returns its name """
+    records = store.read_records()
     if not os.path.exists("logs"):
         os.makedirs("logs")
-    
+
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"logs/session_{timestamp}.txt"
-    
-    with open(filename, "w") as f:
-        for line in logs:
-            f.write(f"{line}\n")
+
+    with open(filename, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(f"{format_record(record)}\n")
     return filename
 
 def start_boot_monitor(serial):
     if not os.path.exists("logs"):
         os.makedirs("logs")
-    
+
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"logs/bootlog_{timestamp}.txt"
-    
+
     return filename
@@ -10,3 +10,13 @@ def get_resource_path(relative_path):
         base_path = os.path.abspath(".")
 
     return os.path.join(base_path, relative_path)
+
+def get_cache_path(*parts):
+    """ Writable per-user cache location (the bundled resource dir may be read-only) """
+    if sys.platform == "win32":
+        base_path = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base_path = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    cache_dir = os.path.join(base_path, "NazAndroidToolkit")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, *parts)